@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for torf
+
+Synthetic content is created in a work directory and reused between runs if
+--workdir is given. Results are written as JSON so that they can be compared
+between releases with --compare.
+
+Files are usually served from the page cache after the first read, so the
+hashing benchmarks measure CPU and pipeline overhead rather than disk speed
+unless the cache is dropped between runs.
+"""
+
+import argparse
+import datetime
+import fnmatch
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import torf  # noqa: E402
+from torf._torrent import NCORES  # noqa: E402
+
+MAGNET_URI = (
+    'magnet:?xt=urn:btih:e167b1fbb42ea72f051f4f50432703308efb8fd1'
+    '&dn=Some+Torrent+Name&xl=123456789'
+    '&tr=http%3A%2F%2Ftracker1.example.org%3A1234%2Fannounce'
+    '&tr=http%3A%2F%2Ftracker2.example.org%3A5678%2Fannounce'
+    '&tr=udp%3A%2F%2Ftracker3.example.org%3A9012%2Fannounce'
+    '&ws=http%3A%2F%2Fwebseed1.example.org%2Fpath'
+    '&ws=http%3A%2F%2Fwebseed2.example.org%2Fpath'
+    '&xs=http%3A%2F%2Fxs.example.org%2Ffoo.torrent'
+)
+
+
+class Suite:
+    def __init__(self, workdir, quick=False, repeat=3, patterns=(), single_file_size=None, tiny_file_count=None):
+        self.workdir = workdir
+        self.quick = quick
+        self.single_file_size = single_file_size or (32 if quick else 512) * 2**20
+        self.tiny_file_count = tiny_file_count or (500 if quick else 10_000)
+        self.repeat = repeat
+        self.patterns = patterns
+        self.results = []
+
+    def wants(self, name):
+        return not self.patterns or any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns)
+
+    def measure(self, name, params, func, amount, unit, setup=None):
+        """
+        Call `func` :attr:`repeat` times and record the median duration
+
+        `amount` is the number of `unit`s that are processed by each call
+        (e.g. bytes or operations).
+        """
+        if not self.wants(name):
+            return
+        runs = []
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - start)
+        seconds = statistics.median(runs)
+        result = {
+            'benchmark': name,
+            'params': params,
+            'runs': runs,
+            'seconds': seconds,
+            'amount': amount,
+            'unit': unit,
+            'rate': amount / seconds if seconds > 0 else None,
+        }
+        self.results.append(result)
+        print(f'{_format_key(result):<70} {_format_rate(result["rate"], unit):>16}', file=sys.stderr)
+
+    # Content
+
+    def single_file(self):
+        size = self.single_file_size
+        path = os.path.join(self.workdir, 'single_file')
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            print(f'Creating {path}', file=sys.stderr)
+            with open(path, 'wb') as f:
+                for pos in range(0, size, 2**20):
+                    f.write(os.urandom(min(2**20, size - pos)))
+        return path
+
+    def tiny_files(self):
+        count = self.tiny_file_count
+        path = os.path.join(self.workdir, f'tiny_files_{count}')
+        if not os.path.exists(path):
+            print(f'Creating {count} files in {path}', file=sys.stderr)
+            rnd = random.Random(0)
+            tmp_path = path + '.tmp'
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            for i in range(count):
+                dirpath = os.path.join(tmp_path, f'{i // 1000:03d}')
+                if i % 1000 == 0:
+                    os.makedirs(dirpath)
+                with open(os.path.join(dirpath, f'{i:06d}.dat'), 'wb') as f:
+                    f.write(os.urandom(rnd.randint(1, 10 * 1024)))
+            os.rename(tmp_path, path)
+        return path
+
+    # Benchmarks
+
+    def bench_hashing(self):
+        layouts = {'single_file': self.single_file, 'tiny_files': self.tiny_files}
+        piece_sizes = (2**18, 2**20) if self.quick else (2**16, 2**18, 2**20, 2**22)
+        thread_counts = sorted({1, NCORES}) if self.quick else sorted({1, 2, 4, NCORES})
+        for layout, get_path in layouts.items():
+            if not (self.wants(f'generate/{layout}') or self.wants(f'verify/{layout}')):
+                continue
+            path = get_path()
+            for piece_size in piece_sizes:
+                for threads in thread_counts:
+                    torrent = torf.Torrent(path, piece_size=piece_size)
+                    params = {'layout': layout, 'files': len(torrent.files),
+                              'piece_size': piece_size, 'threads': threads}
+                    self.measure(
+                        name=f'generate/{layout}', params=params, unit='bytes', amount=torrent.size,
+                        func=lambda: torrent.generate(threads=threads),
+                    )
+                    if not torrent.hashes:
+                        torrent.generate(threads=threads)
+                    self.measure(
+                        name=f'verify/{layout}', params=params, unit='bytes', amount=torrent.size,
+                        func=lambda: torrent.verify(path, threads=threads),
+                    )
+
+    def bench_get_piece(self):
+        count = 200 if self.quick else 2_000
+        for layout, get_path in (('single_file', self.single_file), ('tiny_files', self.tiny_files)):
+            name = f'get_piece/{layout}'
+            if not self.wants(name):
+                continue
+            torrent = torf.Torrent(get_path(), piece_size=2**18)
+            rnd = random.Random(0)
+            piece_indexes = [rnd.randrange(torrent.pieces) for _ in range(count)]
+
+            def get_pieces():
+                with torf.TorrentFileStream(torrent) as stream:
+                    for piece_index in piece_indexes:
+                        stream.get_piece(piece_index)
+
+            self.measure(
+                name=name, params={'layout': layout, 'files': len(torrent.files), 'piece_size': 2**18},
+                unit='pieces', amount=count, func=get_pieces,
+            )
+
+    def bench_metainfo(self):
+        if not (self.wants('dump') or self.wants('read')):
+            return
+        file_count = 1_000 if self.quick else 10_000
+        piece_size = 2**18
+        rnd = random.Random(0)
+        files = [
+            {'length': rnd.randint(1, 2**24), 'path': [f'{i // 1000:03d}', f'{i:06d}.dat']}
+            for i in range(file_count)
+        ]
+        piece_count = math.ceil(sum(file['length'] for file in files) / piece_size)
+        torrent = torf.Torrent(
+            trackers=[f'http://tracker{i}.example.org/announce' for i in range(10)],
+            comment='Benchmark',
+        )
+        torrent.metainfo['info'] = {
+            'name': 'content',
+            'piece length': piece_size,
+            'pieces': os.urandom(piece_count * 20),
+            'files': files,
+        }
+        params = {'files': file_count, 'pieces': piece_count}
+        data = torrent.dump(validate=False)
+        self.measure(name='dump', params=params, unit='bytes', amount=len(data),
+                     func=lambda: torrent.dump(validate=False))
+        self.measure(name='read', params=params, unit='bytes', amount=len(data),
+                     func=lambda: torf.Torrent.read_stream(data, validate=False))
+        self.measure(name='read', params={**params, 'validate': True}, unit='bytes', amount=len(data),
+                     func=lambda: torf.Torrent.read_stream(data, validate=True))
+
+    def bench_magnet(self):
+        count = 2_000 if self.quick else 20_000
+
+        def parse():
+            for _ in range(count):
+                torf.Magnet.from_string(MAGNET_URI)
+
+        self.measure(name='magnet/from_string', params={}, unit='uris', amount=count, func=parse)
+
+    def run(self):
+        self.bench_hashing()
+        self.bench_get_piece()
+        self.bench_metainfo()
+        self.bench_magnet()
+        return {
+            'torf_version': torf.__version__,
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': NCORES,
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'quick': self.quick,
+            'repeat': self.repeat,
+            'results': self.results,
+        }
+
+
+def _format_key(result):
+    params = ' '.join(f'{key}={value}' for key, value in result['params'].items())
+    return f'{result["benchmark"]} {params}'.strip()
+
+
+def _format_rate(rate, unit):
+    if rate is None:
+        return 'n/a'
+    elif unit == 'bytes':
+        return f'{rate / 2**20:.1f} MiB/s'
+    else:
+        return f'{rate:.1f} {unit}/s'
+
+
+def compare(old_report, new_report, threshold):
+    """
+    Print rate ratio of each benchmark in both reports and return the number of
+    benchmarks that got slower by more than `threshold` (e.g. 0.1 for 10 %)
+    """
+    old_rates = {_format_key(result): result['rate'] for result in old_report['results']}
+    regressions = 0
+    for result in new_report['results']:
+        key = _format_key(result)
+        old_rate = old_rates.get(key)
+        if old_rate and result['rate']:
+            ratio = result['rate'] / old_rate
+            marker = ''
+            if ratio < 1 - threshold:
+                marker = '  <-- REGRESSION'
+                regressions += 1
+            print(f'{key:<70} {ratio:6.2f}x{marker}', file=sys.stderr)
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', '-o', help='Write JSON results to this file instead of stdout')
+    parser.add_argument('--workdir', help='Directory for synthetic content (default: temporary directory)')
+    parser.add_argument('--quick', action='store_true', help='Use less content and fewer parameters')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs of each benchmark (default: 3)')
+    parser.add_argument('--single-file-size', type=int, metavar='MIB',
+                        help='Size of the single file in MiB (default: 512, quick: 32)')
+    parser.add_argument('--tiny-files', type=int, metavar='COUNT',
+                        help='Number of files of 1 to 10 KiB (default: 10000, quick: 500)')
+    parser.add_argument('--filter', '-k', action='append', default=[], metavar='PATTERN',
+                        help='Only run benchmarks whose name matches this glob pattern (may be repeated)')
+    parser.add_argument('--compare', metavar='FILE', help='Compare results to a previous JSON result file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative slowdown that counts as regression with --compare (default: 0.1)')
+    args = parser.parse_args(args)
+
+    def run(workdir):
+        return Suite(
+            workdir,
+            quick=args.quick,
+            repeat=args.repeat,
+            patterns=args.filter,
+            single_file_size=args.single_file_size * 2**20 if args.single_file_size else None,
+            tiny_file_count=args.tiny_files,
+        ).run()
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        report = run(args.workdir)
+    else:
+        with tempfile.TemporaryDirectory(prefix='torf-bench-') as workdir:
+            report = run(workdir)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old_report = json.load(f)
+        if compare(old_report, report, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
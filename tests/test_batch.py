@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import torf
+
+
+def _create_torrents(create_dir, random_seed, count):
+    torrents = []
+    with random_seed(0):
+        for i in range(count):
+            content_path = create_dir(f'content{i}',
+                                      ('a', 2**14 * (i % 3) + 123 * (i + 1)),
+                                      ('b', 2**14 * 2 + i))
+            torrents.append(torf.Torrent(content_path, piece_size=2**14))
+    return torrents
+
+
+def _get_exp_hashes(torrent):
+    exp_torrent = torf.Torrent(torrent.path, piece_size=torrent.piece_size)
+    assert exp_torrent.generate() is True
+    return exp_torrent.hashes
+
+
+@pytest.mark.parametrize('threads, readers', ((1, 1), (2, 1), (4, 3)))
+def test_generate(threads, readers, create_dir, random_seed):
+    torrents = _create_torrents(create_dir, random_seed, 10)
+    with torf.TorrentBatch(threads=threads, readers=readers) as batch:
+        results = list(batch.generate(torrents))
+    assert sorted(torrent.name for torrent, _ in results) == sorted(torrent.name for torrent in torrents)
+    assert all(exception is None for _, exception in results)
+    for torrent in torrents:
+        assert torrent.hashes == _get_exp_hashes(torrent)
+
+
+def test_generate_multiple_times(create_dir, random_seed):
+    torrents = _create_torrents(create_dir, random_seed, 6)
+    with torf.TorrentBatch(threads=2) as batch:
+        results1 = batch.generate(torrents[:3])
+        results2 = batch.generate(torrents[3:])
+        assert {torrent.name for torrent, _ in results2} == {torrent.name for torrent in torrents[3:]}
+        assert {torrent.name for torrent, _ in results1} == {torrent.name for torrent in torrents[:3]}
+    for torrent in torrents:
+        assert torrent.hashes == _get_exp_hashes(torrent)
+
+
+def test_generate_reports_exceptions(create_dir, random_seed):
+    torrents = _create_torrents(create_dir, random_seed, 3)
+    (torrents[1].path / 'b').write_bytes(b'foo')
+    with torf.TorrentBatch(threads=2) as batch:
+        results = dict((torrent.name, exception) for torrent, exception in batch.generate(torrents))
+    assert results[torrents[0].name] is None
+    assert isinstance(results[torrents[1].name], torf.TorfError)
+    assert results[torrents[2].name] is None
+    assert torrents[1].hashes == ()
+    assert torrents[2].hashes == _get_exp_hashes(torrents[2])
+
+
+def test_generate_validates_torrents(create_dir, random_seed):
+    with torf.TorrentBatch(threads=1) as batch:
+        with pytest.raises(RuntimeError, match=r'^generate\(\) called with no path specified$'):
+            batch.generate([torf.Torrent()])
+
+        content_path = create_dir('content', ('a', 1))
+        torrent = torf.Torrent(content_path)
+        (content_path / 'a').write_bytes(b'')
+        with pytest.raises(torf.PathError, match=r'Empty or all files excluded$'):
+            batch.generate([torrent])
+
+
+def test_generate_after_close(create_dir, random_seed):
+    torrents = _create_torrents(create_dir, random_seed, 1)
+    batch = torf.TorrentBatch(threads=1)
+    batch.close()
+    with pytest.raises(RuntimeError, match=r'^TorrentBatch is closed$'):
+        batch.generate(torrents)
+
+
+def test_stopping_iteration_cancels_unfinished_torrents(create_dir, random_seed):
+    torrents = _create_torrents(create_dir, random_seed, 20)
+    with torf.TorrentBatch(threads=1) as batch:
+        results = batch.generate(torrents)
+        torrent, exception = next(results)
+        assert exception is None
+        results.close()
+    # Unfinished torrents don't get any hashes
+    for torrent in torrents:
+        assert torrent.hashes in ((), _get_exp_hashes(torrent))
+
+
+def test_unclosed_batch_does_not_block_exit(create_dir, random_seed):
+    torrents = _create_torrents(create_dir, random_seed, 1)
+    script = (
+        'import sys, torf\n'
+        'batch = torf.TorrentBatch(threads=2, readers=2)\n'
+        'torrent = torf.Torrent(sys.argv[1], piece_size=2**14)\n'
+        'assert [exception for _, exception in batch.generate([torrent])] == [None]\n'
+    )
+    env = {**os.environ, 'PYTHONPATH': os.path.dirname(os.path.dirname(torf.__file__))}
+    proc = subprocess.run([sys.executable, '-c', script, str(torrents[0].path)], env=env, timeout=30)
+    assert proc.returncode == 0
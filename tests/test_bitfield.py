@@ -0,0 +1,144 @@
+import pytest
+
+from torf import Bitfield
+
+
+def test_invalid_number_of_pieces():
+    with pytest.raises(ValueError, match=r'^Invalid number of pieces: -1$'):
+        Bitfield(-1)
+
+
+@pytest.mark.parametrize('pieces', (0, 1, 3, 4, 5, 1000))
+def test_all_pieces_are_unseen_initially(pieces):
+    bitfield = Bitfield(pieces)
+    assert len(bitfield) == pieces
+    assert list(bitfield) == [Bitfield.UNSEEN] * pieces
+    assert bitfield.count(Bitfield.UNSEEN) == pieces
+    assert bitfield.seen == 0
+
+
+def test_setting_state_does_not_affect_neighbours():
+    bitfield = Bitfield(9)
+    bitfield[3] = Bitfield.MISSING
+    bitfield[4] = Bitfield.OK
+    bitfield[8] = Bitfield.FAILED
+    assert list(bitfield) == [0, 0, 0, 3, 1, 0, 0, 0, 2]
+    bitfield[3] = Bitfield.FAILED
+    assert list(bitfield) == [0, 0, 0, 2, 1, 0, 0, 0, 2]
+    bitfield[3] = Bitfield.UNSEEN
+    assert list(bitfield) == [0, 0, 0, 0, 1, 0, 0, 0, 2]
+
+
+def test_count_and_seen():
+    bitfield = Bitfield(6)
+    bitfield[0] = Bitfield.OK
+    bitfield[1] = Bitfield.OK
+    bitfield[2] = Bitfield.FAILED
+    bitfield[3] = Bitfield.MISSING
+    assert bitfield.count(Bitfield.UNSEEN) == 2
+    assert bitfield.count(Bitfield.OK) == 2
+    assert bitfield.count(Bitfield.FAILED) == 1
+    assert bitfield.count(Bitfield.MISSING) == 1
+    assert bitfield.seen == 4
+    bitfield[1] = Bitfield.FAILED
+    assert bitfield.count(Bitfield.OK) == 1
+    assert bitfield.count(Bitfield.FAILED) == 2
+    assert bitfield.seen == 4
+
+
+def test_indexes():
+    bitfield = Bitfield(6)
+    bitfield[1] = Bitfield.FAILED
+    bitfield[4] = Bitfield.FAILED
+    bitfield[5] = Bitfield.OK
+    assert list(bitfield.indexes(Bitfield.FAILED)) == [1, 4]
+    assert list(bitfield.indexes(Bitfield.OK)) == [5]
+    assert list(bitfield.indexes(Bitfield.UNSEEN)) == [0, 2, 3]
+    assert list(bitfield.indexes(Bitfield.MISSING)) == []
+
+
+def test_clear():
+    bitfield = Bitfield(5)
+    bitfield[0] = Bitfield.OK
+    bitfield[4] = Bitfield.MISSING
+    bitfield.clear()
+    assert list(bitfield) == [Bitfield.UNSEEN] * 5
+    assert bitfield.seen == 0
+
+
+@pytest.mark.parametrize('index', (-1, 5, 100))
+def test_invalid_index(index):
+    bitfield = Bitfield(5)
+    with pytest.raises(IndexError, match=rf'^Piece index out of range \(0 - 4\): {index}$'):
+        bitfield[index]
+    with pytest.raises(IndexError, match=rf'^Piece index out of range \(0 - 4\): {index}$'):
+        bitfield[index] = Bitfield.OK
+
+
+@pytest.mark.parametrize('state', (-1, 4, 'OK', None))
+def test_invalid_state(state):
+    bitfield = Bitfield(5)
+    with pytest.raises(ValueError, match=rf'^Invalid state: {state!r}$'):
+        bitfield[0] = state
+    with pytest.raises(ValueError, match=rf'^Invalid state: {state!r}$'):
+        bitfield.count(state)
+    with pytest.raises(ValueError, match=rf'^Invalid state: {state!r}$'):
+        list(bitfield.indexes(state))
+
+
+def test_equality():
+    a, b = Bitfield(5), Bitfield(5)
+    assert a == b
+    a[2] = Bitfield.OK
+    assert a != b
+    b[2] = Bitfield.OK
+    assert a == b
+    assert Bitfield(5) != Bitfield(6)
+    assert Bitfield(5) != [0, 0, 0, 0, 0]
+
+
+def test_ranges():
+    bitfield = Bitfield(10)
+    for index in (0, 1, 4, 5, 6, 9):
+        bitfield[index] = Bitfield.OK
+    bitfield[5] = Bitfield.FAILED
+    assert bitfield.ranges(Bitfield.OK) == [range(0, 2), range(4, 5), range(6, 7), range(9, 10)]
+    assert bitfield.ranges(Bitfield.OK, Bitfield.FAILED) == [range(0, 2), range(4, 7), range(9, 10)]
+    assert bitfield.ranges(Bitfield.UNSEEN) == [range(2, 4), range(7, 9)]
+    assert bitfield.ranges(Bitfield.MISSING) == []
+    with pytest.raises(ValueError, match=r'^Invalid state: 4$'):
+        bitfield.ranges(Bitfield.OK, 4)
+
+
+@pytest.mark.parametrize('pieces', (0, 1, 4, 7))
+def test_from_bytes(pieces):
+    bitfield = Bitfield(pieces)
+    for index in range(0, pieces, 3):
+        bitfield[index] = Bitfield.MISSING
+    bitfield2 = Bitfield.from_bytes(pieces, bytes(bitfield))
+    assert bitfield2 == bitfield
+    assert bitfield2.count(Bitfield.MISSING) == bitfield.count(Bitfield.MISSING)
+    assert bitfield2.seen == bitfield.seen
+
+
+def test_from_bytes_with_invalid_data():
+    with pytest.raises(ValueError, match=r'^Expected 2 bytes for 7 pieces, not 3$'):
+        Bitfield.from_bytes(7, b'\x00\x00\x00')
+    with pytest.raises(ValueError, match=r'^Invalid state after piece 6$'):
+        Bitfield.from_bytes(7, b'\x00\xc0')
+
+
+@pytest.mark.parametrize(
+    argnames='pieces, ok_indexes, exp_bytes',
+    argvalues=(
+        (0, (), b''),
+        (1, (0,), b'\x80'),
+        (8, (0, 7), b'\x81'),
+        (10, (1, 8, 9), b'\x40\xc0'),
+    ),
+)
+def test_to_have_bytes(pieces, ok_indexes, exp_bytes):
+    bitfield = Bitfield(pieces)
+    for index in range(pieces):
+        bitfield[index] = Bitfield.OK if index in ok_indexes else Bitfield.MISSING
+    assert bitfield.to_have_bytes() == exp_bytes
@@ -56,3 +56,11 @@ def test_metainfo_sort_order(create_torrent):
     exp_info_keys = sorted(bytes(key, encoding='utf-8', errors='replace')
                            for key in torrent.metainfo['info'])
     assert list(md_conv[b'info']) == exp_info_keys
+
+
+def test_binary_keys():
+    t = torf.Torrent(created_by=None)
+    t.metainfo['piece layers'] = {b'\xff\x00': b'foo', 'b': b'bar', b'a': b'baz'}
+    assert t.convert()[b'piece layers'] == OrderedDict([(b'a', b'baz'),
+                                                        (b'b', b'bar'),
+                                                        (b'\xff\x00', b'foo')])
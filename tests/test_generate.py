@@ -1,5 +1,9 @@
+import asyncio
 import base64
+import hashlib
+import json
 import os
+import time
 from collections import defaultdict
 from pathlib import Path
 from unittest import mock
@@ -7,6 +11,7 @@ from unittest import mock
 import pytest
 
 import torf
+from torf._checkpoint import Checkpoint
 
 from . import *  # noqa: F403
 
@@ -91,7 +96,50 @@ def test_unreadable_file_in_multifile_torrent(create_dir):
         os.chmod(content_path, mode=old_mode)
 
 
-def test_metainfo_with_singlefile_torrent(create_file, random_seed):
+def test_invalid_backend(create_file):
+    content_path = create_file('file.jpg', '<image data>')
+    t = torf.Torrent(content_path)
+    with pytest.raises(ValueError) as e:
+        t.generate(backend='foo')
+    assert str(e.value) == "Invalid backend: 'foo'"
+
+
+def test_exception_from_hasher_thread_is_raised(create_file, mocker):
+    content_path = create_file('content', 2**14 * 20)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    sha1_digest = torf._generate.sha1_digest
+    calls = []
+
+    def failing_sha1_digest(piece):
+        calls.append(piece)
+        if len(calls) == 3:
+            raise ValueError('Hashing failed')
+        return sha1_digest(piece)
+
+    mocker.patch('torf._generate.sha1_digest', side_effect=failing_sha1_digest)
+    with pytest.raises(ValueError, match=r'^Hashing failed$'):
+        t.generate(threads=3)
+
+
+def test_dead_worker_processes_are_reported(create_file, mocker):
+    content_path = create_file('content', 2**14 * 20)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    hash = torf._generate._HashProcess.hash
+
+    def killing_hash(self, piece):
+        self._process.kill()
+        self._process.join()
+        return hash(self, piece)
+
+    mocker.patch.object(torf._generate._HashProcess, 'hash', killing_hash)
+    with pytest.raises(RuntimeError, match=r'^hasher\d+-process terminated unexpectedly with exit code -9$'):
+        t.generate(threads=2, backend='process')
+
+
+@pytest.mark.parametrize('read_kwargs', ({}, {'reuse_buffers': True}, {'use_mmap': True}, {'readers': 3}),
+                         ids=('new buffers', 'reused buffers', 'mmap', 'multiple readers'))
+@pytest.mark.parametrize('backend', ('thread', 'process'))
+def test_metainfo_with_singlefile_torrent(backend, read_kwargs, create_file, random_seed):
     with random_seed(0):
         content_path = create_file('file.jpg', torf.Torrent.piece_size_min_default * 10.123)
     # exp_* values come from these commands:
@@ -104,9 +152,12 @@ def test_metainfo_with_singlefile_torrent(create_file, random_seed):
                   b"\xab\xa6'/D\xba\xd9\xf0d\x81\xe3\xf5C\x82JQ\xde\xb5\x17w\xda\xbc\xb7Ek"
                   b"\nHU\xcd\x1f\xd6C\xcb!\xb0CW\\\xc4\x8d\xad9\xbe\xb4V\x8a7\xdf\x9a\xabV"
                   b"\xa6\xe5\xee3\x81\xe5I\xa7\xfe#\xcb\xea\xc3\x8e\xc4\x00\x91\xdb\x00\xaf")
-    _check_metainfo(content_path, 2**15, exp_infohash, exp_pieces)
+    _check_metainfo(content_path, 2**15, exp_infohash, exp_pieces, backend=backend, **read_kwargs)
 
-def test_metainfo_with_multifile_torrent(create_dir, random_seed):
+@pytest.mark.parametrize('read_kwargs', ({}, {'reuse_buffers': True}, {'use_mmap': True}, {'readers': 3}),
+                         ids=('new buffers', 'reused buffers', 'mmap', 'multiple readers'))
+@pytest.mark.parametrize('backend', ('thread', 'process'))
+def test_metainfo_with_multifile_torrent(backend, read_kwargs, create_dir, random_seed):
     with random_seed(0):
         content_path = create_dir('content',
                                   ('a.jpg', torf.Torrent.piece_size_min_default * 1.123),
@@ -121,16 +172,37 @@ def test_metainfo_with_multifile_torrent(create_dir, random_seed):
                   b'\xf2\xc0\x0e\rXE\x85g\xe6k\x1dt\xa6\xca\x7f/\xb5)A"5!\xb9\xda\xe2'
                   b'"\x15c^\x0e\xf7\x91|\x06V\xdc}\xd9\xb0<./\x0fBe\xcb\xd8*\xae\xd1"'
                   b'\x05\n\x1b\xf3\x18\x1c\xd7u\xe3')
-    _check_metainfo(content_path, 2**15, exp_infohash, exp_pieces)
+    _check_metainfo(content_path, 2**15, exp_infohash, exp_pieces, backend=backend, **read_kwargs)
 
-def _check_metainfo(content_path, piece_size, exp_infohash, exp_pieces):
+def test_metainfo_with_files_on_multiple_devices(create_dir, random_seed, mocker):
+    with random_seed(0):
+        content_path = create_dir('content',
+                                  ('a.jpg', torf.Torrent.piece_size_min_default * 1.123),
+                                  ('b.jpg', torf.Torrent.piece_size_min_default * 2.456),
+                                  ('c.jpg', torf.Torrent.piece_size_min_default * 3.789))
+    t = torf.Torrent(content_path, piece_size=2**14)
+    t.generate(readers=1)
+    exp_hashes = t.hashes
+    assert len(exp_hashes) == 8
+
+    get_piece_ranges_by_device = mocker.patch(
+        'torf._stream.TorrentFileStream.get_piece_ranges_by_device',
+        return_value={1: [range(0, 1), range(3, 8)], 2: [range(1, 3)]},
+    )
+    t = torf.Torrent(content_path, piece_size=2**14)
+    t.generate()
+    assert get_piece_ranges_by_device.call_args_list == [mock.call(None)]
+    assert t.hashes == exp_hashes
+
+def _check_metainfo(content_path, piece_size, exp_infohash, exp_pieces, **generate_kwargs):
     exp_hashes = tuple(exp_pieces[i : i + 20]
                        for i in range(0, len(exp_pieces), 20))
     t = torf.Torrent(content_path)
     t.piece_size = piece_size
-    t.generate()
+    t.generate(**generate_kwargs)
     assert t.infohash == exp_infohash
     assert t.infohash_base32 == base64.b32encode(base64.b16decode(exp_infohash.upper()))
+    assert type(t.metainfo['info']['pieces']) is bytes
     assert t.metainfo['info']['pieces'] == exp_pieces
     assert t.hashes == exp_hashes
     assert t.piece_size == piece_size
@@ -234,3 +306,840 @@ def test_callback_raises_exception(piece_size, create_file, forced_piece_size):
             # The pool of hashers should be stopped before all pieces are hashed
             assert sha1_mock.call_count < t.pieces
             assert not t.is_ready
+
+
+def _generate_with_checkpoint(content_path, checkpoint, cancel_at=None):
+    # Return `(success, pieces_done)` where `pieces_done` is a list of
+    # `pieces_done` arguments from each callback call
+    pieces_done = []
+
+    def cb(torrent, filepath, pieces_done_, pieces_total):
+        pieces_done.append(pieces_done_)
+        if pieces_done_ == cancel_at:
+            return 'cancel'
+
+    t = torf.Torrent(content_path, piece_size=2**14)
+    success = t.generate(threads=1, callback=cb, checkpoint=checkpoint)
+    return t, success, pieces_done
+
+def test_checkpoint_is_used_to_resume(create_dir, tmp_path):
+    # Enough pieces that some are still unread after cancellation, even if the
+    # collector thread is slow
+    content_path = create_dir('content',
+                              ('a', 2**14 * 5 + 123),
+                              ('b', 2**14 * 100 + 456))
+    exp_t = torf.Torrent(content_path, piece_size=2**14)
+    exp_t.generate()
+
+    checkpoint = tmp_path / 'progress'
+    t, success, pieces_done = _generate_with_checkpoint(content_path, checkpoint, cancel_at=6)
+    assert success is False
+    # Pieces that were already queued are still hashed after cancellation
+    pieces_hashed = pieces_done[-1]
+    assert 6 <= pieces_hashed < t.pieces
+    assert checkpoint.exists()
+
+    t, success, pieces_done = _generate_with_checkpoint(content_path, checkpoint)
+    assert success is True
+    assert pieces_done == list(range(pieces_hashed + 1, t.pieces + 1))
+    assert t.hashes == exp_t.hashes
+    assert not checkpoint.exists()
+
+def test_checkpoint_is_ignored_if_content_changed(create_dir, tmp_path):
+    content_path = create_dir('content',
+                              ('a', 2**14 * 5 + 123),
+                              ('b', 2**14 * 10 + 456))
+    checkpoint = tmp_path / 'progress'
+    t, success, pieces_done = _generate_with_checkpoint(content_path, checkpoint, cancel_at=6)
+    assert success is False
+    assert checkpoint.exists()
+
+    stat = os.stat(content_path / 'b')
+    os.utime(content_path / 'b', ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    t, success, pieces_done = _generate_with_checkpoint(content_path, checkpoint)
+    assert success is True
+    assert pieces_done == list(range(1, t.pieces + 1))
+
+def test_checkpoint_with_all_pieces(create_dir, tmp_path):
+    content_path = create_dir('content', ('a', 2**14 * 3 + 123))
+    exp_t = torf.Torrent(content_path, piece_size=2**14)
+    exp_t.generate()
+    checkpoint = tmp_path / 'progress'
+    bitfield = torf.Bitfield(exp_t.pieces)
+    for piece_index in range(exp_t.pieces):
+        bitfield[piece_index] = torf.Bitfield.OK
+    Checkpoint(checkpoint, torrent=exp_t).save(bitfield, exp_t.metainfo['info']['pieces'])
+
+    callback = mock.Mock(return_value=None)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    assert t.generate(callback=callback, checkpoint=checkpoint) is True
+    assert callback.call_args_list == [mock.call(t, torf.File(content_path / 'a', 2**14 * 3 + 123), 4, 4)]
+    assert t.hashes == exp_t.hashes
+    assert not checkpoint.exists()
+
+@pytest.mark.parametrize('content', (b'', b'garbage', b'd3:foo3:bare'))
+def test_checkpoint_is_ignored_if_invalid(content, create_dir, tmp_path):
+    content_path = create_dir('content', ('a', 2**14 * 3 + 123))
+    checkpoint = tmp_path / 'progress'
+    checkpoint.write_bytes(content)
+    t, success, pieces_done = _generate_with_checkpoint(content_path, checkpoint)
+    assert success is True
+    assert pieces_done == list(range(1, t.pieces + 1))
+
+def test_checkpoint_is_not_writable(create_dir, tmp_path):
+    content_path = create_dir('content', ('a', 2**14 * 3 + 123))
+    checkpoint = tmp_path / 'no' / 'such' / 'directory' / 'progress'
+    with pytest.raises(torf.WriteError) as e:
+        _generate_with_checkpoint(content_path, checkpoint, cancel_at=2)
+    assert str(e.value) == f'{checkpoint}: No such file or directory'
+
+def test_checkpoint_failure_does_not_replace_exception(create_dir, tmp_path):
+    content_path = create_dir('content', ('a', 2**14 * 3 + 123))
+    checkpoint = tmp_path / 'no' / 'such' / 'directory' / 'progress'
+
+    def callback(torrent, filepath, pieces_done, pieces_total):
+        raise ValueError('Callback failed')
+
+    t = torf.Torrent(content_path, piece_size=2**14)
+    with pytest.raises(ValueError, match=r'^Callback failed$'):
+        t.generate(threads=1, callback=callback, checkpoint=checkpoint)
+
+
+def _generate_with_previous(content_path, previous, **kwargs):
+    # Return `(torrent, pieces_done)` where `pieces_done` is a list of
+    # `pieces_done` arguments from each callback call
+    pieces_done = []
+
+    def cb(torrent, filepath, pieces_done_, pieces_total):
+        pieces_done.append(pieces_done_)
+
+    t = torf.Torrent(content_path, piece_size=2**14, **kwargs)
+    assert t.generate(threads=1, callback=cb, previous=previous) is True
+    exp_t = torf.Torrent(content_path, piece_size=2**14)
+    exp_t.generate()
+    assert t.hashes == exp_t.hashes
+    return t, pieces_done
+
+def _set_mtime(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+@pytest.fixture
+def previous_content(create_dir):
+    content_path = create_dir('content',
+                              ('a', 2**14 * 3 + 100),
+                              ('b', 2**14 * 2 + 200),
+                              ('c', 2**14 * 4 + 300))
+    now = time.time()
+    for name in ('a', 'b', 'c'):
+        _set_mtime(content_path / name, now - 100)
+    previous = torf.Torrent(content_path, piece_size=2**14, creation_date=now - 50)
+    previous.generate()
+    return content_path, previous
+
+def test_previous_with_modified_file(previous_content):
+    content_path, previous = previous_content
+    (content_path / 'b').write_bytes(b'x' * (2**14 * 2 + 200))
+    t, pieces_done = _generate_with_previous(content_path, previous)
+    # Only the pieces that contain "b" are read
+    assert t.pieces == 10
+    assert pieces_done == [8, 9, 10]
+
+def test_previous_with_resized_file(previous_content):
+    content_path, previous = previous_content
+    (content_path / 'b').write_bytes(b'x' * (2**14 * 2 + 201))
+    t, pieces_done = _generate_with_previous(content_path, previous)
+    # All pieces that contain "b" or "c" are read
+    assert t.pieces == 10
+    assert pieces_done == [4, 5, 6, 7, 8, 9, 10]
+
+def test_previous_with_unchanged_content(previous_content):
+    content_path, previous = previous_content
+    t, pieces_done = _generate_with_previous(content_path, previous)
+    # Nothing is read, but completion is reported
+    assert pieces_done == [t.pieces]
+
+def test_previous_with_removed_last_file(previous_content):
+    content_path, previous = previous_content
+    os.remove(content_path / 'c')
+    t, pieces_done = _generate_with_previous(content_path, previous)
+    # Final piece is shorter than before
+    assert t.pieces == 6
+    assert pieces_done == [6]
+
+def test_previous_without_creation_date(previous_content):
+    content_path, previous = previous_content
+    previous.creation_date = None
+    t, pieces_done = _generate_with_previous(content_path, previous)
+    # Files may have been modified without changing their size
+    assert pieces_done == list(range(1, t.pieces + 1))
+
+def test_previous_without_creation_date_and_same_size_rewrite(previous_content):
+    content_path, previous = previous_content
+    previous.creation_date = None
+    (content_path / 'b').write_bytes(b'x' * (2**14 * 2 + 200))
+    t, pieces_done = _generate_with_previous(content_path, previous)
+    assert t.hashes != previous.hashes
+
+def test_previous_with_different_piece_size(previous_content):
+    content_path, previous = previous_content
+    previous.piece_size = 2**15
+    t, pieces_done = _generate_with_previous(content_path, previous)
+    assert pieces_done == list(range(1, t.pieces + 1))
+
+
+def _generate_with_cache(content_path, cache, piece_size=2**14):
+    # Return `(torrent, pieces_done)` where `pieces_done` is a list of
+    # `pieces_done` arguments from each callback call
+    pieces_done = []
+
+    def cb(torrent, filepath, pieces_done_, pieces_total):
+        pieces_done.append(pieces_done_)
+
+    t = torf.Torrent(content_path, piece_size=piece_size)
+    assert t.generate(threads=1, callback=cb, cache=cache) is True
+    exp_t = torf.Torrent(content_path, piece_size=piece_size)
+    exp_t.generate()
+    assert t.hashes == exp_t.hashes
+    return t, pieces_done
+
+@pytest.fixture
+def cache_content(create_dir):
+    return create_dir('content',
+                      ('a', 2**14 * 3 + 100),
+                      ('b', 2**14 * 2 + 200),
+                      ('c', 2**14 * 4 + 300))
+
+def test_cache_with_unchanged_content(cache_content, tmp_path):
+    cache = tmp_path / 'cache'
+    t, pieces_done = _generate_with_cache(cache_content, cache)
+    assert pieces_done == list(range(1, t.pieces + 1))
+    t, pieces_done = _generate_with_cache(cache_content, cache)
+    assert pieces_done == [t.pieces]
+
+def test_cache_with_modified_file(cache_content, tmp_path):
+    cache = tmp_path / 'cache'
+    _generate_with_cache(cache_content, cache)
+    stat = os.stat(cache_content / 'b')
+    (cache_content / 'b').write_bytes(b'x' * (2**14 * 2 + 200))
+    os.utime(cache_content / 'b', ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    t, pieces_done = _generate_with_cache(cache_content, cache)
+    # Only the pieces that contain "b" are read
+    assert t.pieces == 10
+    assert pieces_done == [8, 9, 10]
+    t, pieces_done = _generate_with_cache(cache_content, cache)
+    assert pieces_done == [t.pieces]
+
+def test_cache_with_different_piece_size(cache_content, tmp_path):
+    cache = tmp_path / 'cache'
+    _generate_with_cache(cache_content, cache, piece_size=2**14)
+    t, pieces_done = _generate_with_cache(cache_content, cache, piece_size=2**15)
+    assert pieces_done == list(range(1, t.pieces + 1))
+    t, pieces_done = _generate_with_cache(cache_content, cache, piece_size=2**14)
+    assert pieces_done == [t.pieces]
+
+def test_cache_is_not_writable(cache_content, tmp_path):
+    cache = tmp_path / 'no' / 'such' / 'directory' / 'cache'
+    t = torf.Torrent(cache_content, piece_size=2**14)
+    with pytest.raises(torf.WriteError) as e:
+        t.generate(cache=cache)
+    assert str(e.value).startswith(f'{cache}: ')
+
+def test_cache_is_not_a_database(cache_content, tmp_path):
+    cache = tmp_path / 'cache'
+    cache.write_bytes(b'not a database')
+    t = torf.Torrent(cache_content, piece_size=2**14)
+    with pytest.raises(torf.WriteError) as e:
+        t.generate(cache=cache)
+    assert str(e.value) == f'{cache}: Invalid argument'
+
+
+@pytest.mark.parametrize('read_kwargs', ({}, {'reuse_buffers': True}, {'use_mmap': True}, {'readers': 3}),
+                         ids=lambda v: ','.join(f'{k}={v}' for k, v in v.items()) or 'default')
+@pytest.mark.parametrize('backend', ('thread', 'process'))
+def test_generate_piece_sizes(backend, read_kwargs, create_dir, random_seed):
+    with random_seed(0):
+        content_path = create_dir('content',
+                                  ('a', 2**14 * 7 + 123),
+                                  ('b', 2**16 + 1),
+                                  ('c', 2**15 * 5 + 456))
+    t = torf.Torrent(content_path, comment='foo')
+    piece_sizes = (2**15, 2**14, 2**16)
+    torrents = t.generate_piece_sizes(piece_sizes, backend=backend, **read_kwargs)
+    assert [torrent.piece_size for torrent in torrents] == list(piece_sizes)
+    for torrent, piece_size in zip(torrents, piece_sizes):
+        exp_torrent = torf.Torrent(content_path, piece_size=piece_size, comment='foo')
+        assert exp_torrent.generate() is True
+        assert torrent.hashes == exp_torrent.hashes
+        assert torrent.infohash == exp_torrent.infohash
+        assert torrent.path == t.path
+    assert t.hashes == ()
+
+def test_generate_piece_sizes_with_invalid_piece_size(create_file):
+    content_path = create_file('content', 2**16)
+    t = torf.Torrent(content_path)
+    with pytest.raises(torf.PieceSizeError):
+        t.generate_piece_sizes((2**15, 12345))
+    with pytest.raises(ValueError, match=r'^No piece sizes specified$'):
+        t.generate_piece_sizes(())
+
+def test_generate_piece_sizes_callback_cancels(create_file):
+    content_path = create_file('content', 2**16 * 10)
+    t = torf.Torrent(content_path)
+    calls = []
+
+    def cb(torrent, filepath, pieces_done, pieces_total):
+        assert torrent is t
+        calls.append((pieces_done, pieces_total))
+        return 'cancel'
+
+    assert t.generate_piece_sizes((2**14, 2**16), threads=1, callback=cb) is None
+    assert calls[0] == (1, 10)
+
+
+def _get_v2_reference(files, piece_size):
+    # Straightforward BEP 52 implementation: Build the complete merkle tree of
+    # each file and take the piece layer from it
+    def reduce_layer(layer):
+        return [hashlib.sha256(layer[i] + layer[i + 1]).digest() for i in range(0, len(layer), 2)]
+
+    blocks_per_piece = piece_size // 2**14
+    file_tree, piece_layers = {}, {}
+    for path, content in files:
+        leaves = [hashlib.sha256(content[pos:pos + 2**14]).digest()
+                  for pos in range(0, len(content), 2**14)]
+        width = 1
+        while width < len(leaves):
+            width *= 2
+        if len(content) > piece_size:
+            width = max(width, blocks_per_piece)
+        layer = leaves + [bytes(32)] * (width - len(leaves))
+        piece_layer = None
+        while len(layer) > 1:
+            if len(layer) == width // blocks_per_piece:
+                piece_layer = layer
+            layer = reduce_layer(layer)
+        fileinfo = {'length': len(content), 'pieces root': layer[0]}
+        if len(content) > piece_size:
+            pieces = -(-len(content) // piece_size)
+            piece_layers[layer[0]] = b''.join(piece_layer[:pieces])
+        node = file_tree
+        for part in path:
+            node = node.setdefault(part, {})
+        node[''] = fileinfo
+    return file_tree, piece_layers
+
+@pytest.mark.parametrize('read_kwargs', ({}, {'reuse_buffers': True}, {'use_mmap': True}, {'readers': 3}),
+                         ids=lambda v: ','.join(f'{k}={v}' for k, v in v.items()) or 'default')
+@pytest.mark.parametrize('backend', ('thread', 'process'))
+def test_hybrid_with_multifile_torrent(backend, read_kwargs, create_dir, random_seed, tmp_path):
+    piece_size = 2**15
+    with random_seed(0):
+        content_path = create_dir('content',
+                                  ('a', 2**15 * 3 + 123),
+                                  ('b', 2**14),
+                                  ('sub/c', 2**15 * 2),
+                                  ('sub/d', 2**14 * 5 + 1))
+    files = [(['a'], (content_path / 'a').read_bytes()),
+             (['b'], (content_path / 'b').read_bytes()),
+             (['sub', 'c'], (content_path / 'sub' / 'c').read_bytes()),
+             (['sub', 'd'], (content_path / 'sub' / 'd').read_bytes())]
+
+    t = torf.Torrent(content_path, piece_size=piece_size)
+    assert t.generate(hybrid=True, backend=backend, **read_kwargs) is True
+
+    # v1 pieces are calculated from the stream with padding files
+    exp_files_info = []
+    stream = b''
+    for i, (path, content) in enumerate(files):
+        exp_files_info.append({'length': len(content), 'path': path})
+        stream += content
+        padding = -len(content) % piece_size
+        if padding and i < len(files) - 1:
+            exp_files_info.append({'attr': 'p', 'length': padding, 'path': ['.pad', str(padding)]})
+            stream += bytes(padding)
+    assert t.metainfo['info']['files'] == exp_files_info
+    assert t.hashes == tuple(hashlib.sha1(stream[pos:pos + piece_size]).digest()
+                             for pos in range(0, len(stream), piece_size))
+
+    exp_file_tree, exp_piece_layers = _get_v2_reference(files, piece_size)
+    assert t.metainfo['info']['meta version'] == 2
+    assert t.metainfo['info']['file tree'] == exp_file_tree
+    assert t.metainfo['piece layers'] == exp_piece_layers
+
+    # Padding files don't exist
+    t.write(tmp_path / 'hybrid.torrent')
+    t2 = torf.Torrent.read(tmp_path / 'hybrid.torrent')
+    assert t2.metainfo == t.metainfo
+
+@pytest.mark.parametrize('read_kwargs', ({}, {'reuse_buffers': True}, {'use_mmap': True}, {'readers': 3}),
+                         ids=lambda v: ','.join(f'{k}={v}' for k, v in v.items()) or 'default')
+def test_hybrid_torrent_is_verified(read_kwargs, create_dir, random_seed, tmp_path):
+    with random_seed(0):
+        content_path = create_dir('content',
+                                  ('a', 2**15 * 3 + 123),
+                                  ('b', 2**14),
+                                  ('sub/c', 2**15 * 2 + 1))
+    t = torf.Torrent(content_path, piece_size=2**15)
+    assert t.generate(hybrid=True) is True
+    exp_files = [torf.File('content/a', 2**15 * 3 + 123),
+                 torf.File('content/b', 2**14),
+                 torf.File('content/sub/c', 2**15 * 2 + 1)]
+    assert t.files == exp_files
+    assert t.verify_filesize(content_path) is True
+    assert t.verify(content_path, **read_kwargs) is True
+
+    t.write(tmp_path / 'hybrid.torrent')
+    t2 = torf.Torrent.read(tmp_path / 'hybrid.torrent')
+    assert t2.files == exp_files
+    assert t2.verify_filesize(content_path) is True
+    assert t2.verify(content_path, **read_kwargs) is True
+    assert t2.verify_sample(content_path, sample_size=3, seed=0).success is True
+
+    # Pieces after a missing file are still found
+    os.remove(content_path / 'a')
+    bitfield = torf.Bitfield(t2.pieces)
+    assert t2.verify(content_path, callback=lambda *_: None, bitfield=bitfield, **read_kwargs) is False
+    assert list(bitfield.indexes(torf.Bitfield.MISSING)) == [0, 1, 2, 3]
+    assert list(bitfield.indexes(torf.Bitfield.OK)) == list(range(4, t2.pieces))
+
+def test_hybrid_with_empty_last_file(create_dir, random_seed):
+    piece_size = 2**15
+    with random_seed(0):
+        content_path = create_dir('content', ('a', 2**15 + 123), ('b', 2**14 + 5))
+    (content_path / 'c').write_bytes(b'')
+    a, b = (content_path / 'a').read_bytes(), (content_path / 'b').read_bytes()
+    t = torf.Torrent(content_path, piece_size=piece_size)
+    t.metainfo['info']['files'] = [{'length': len(a), 'path': ['a']},
+                                   {'length': len(b), 'path': ['b']},
+                                   {'length': 0, 'path': ['c']}]
+    assert t.generate(hybrid=True) is True
+
+    # "b" is padded because it is not the last file
+    stream = a + bytes(-len(a) % piece_size) + b + bytes(-len(b) % piece_size)
+    assert t.hashes == tuple(hashlib.sha1(stream[pos:pos + piece_size]).digest()
+                             for pos in range(0, len(stream), piece_size))
+    assert t.verify(content_path) is True
+
+def test_hybrid_with_singlefile_torrent(create_file, random_seed):
+    piece_size = 2**16
+    with random_seed(0):
+        content_path = create_file('content', 2**16 * 3 + 2**14 + 5)
+    content = content_path.read_bytes()
+    t = torf.Torrent(content_path, piece_size=piece_size)
+    assert t.generate(hybrid=True) is True
+    assert t.hashes == tuple(hashlib.sha1(content[pos:pos + piece_size]).digest()
+                             for pos in range(0, len(content), piece_size))
+    exp_file_tree, exp_piece_layers = _get_v2_reference([(['content'], content)], piece_size)
+    assert t.metainfo['info']['file tree'] == exp_file_tree
+    assert t.metainfo['piece layers'] == exp_piece_layers
+
+def test_hybrid_metainfo_is_removed_by_generate(create_dir):
+    content_path = create_dir('content', ('a', 2**14 + 1), ('b', 2**14))
+    t = torf.Torrent(content_path, piece_size=2**14)
+    assert t.generate(hybrid=True) is True
+    assert len(t.metainfo['info']['files']) == 3
+    assert t.generate() is True
+    exp_t = torf.Torrent(content_path, piece_size=2**14)
+    exp_t.generate()
+    assert t.metainfo == exp_t.metainfo
+
+@pytest.mark.parametrize('kwargs', ({'checkpoint': 'foo'}, {'previous': torf.Torrent()}, {'cache': 'foo'}))
+def test_hybrid_with_incompatible_arguments(kwargs, create_file):
+    content_path = create_file('content', 2**16)
+    t = torf.Torrent(content_path)
+    with pytest.raises(ValueError, match=r'^hybrid can not be combined with checkpoint, previous or cache$'):
+        t.generate(hybrid=True, **kwargs)
+
+
+@pytest.mark.parametrize('read_kwargs', ({}, {'reuse_buffers': True}, {'use_mmap': True}, {'readers': 3},
+                                         {'hybrid': True}),
+                         ids=lambda v: ','.join(f'{k}={v}' for k, v in v.items()) or 'default')
+@pytest.mark.parametrize('backend', ('thread', 'process'))
+def test_md5sum_with_multifile_torrent(backend, read_kwargs, create_dir, random_seed, tmp_path):
+    with random_seed(0):
+        content_path = create_dir('content',
+                                  ('a', 2**15 * 3 + 123),
+                                  ('b', 2**14),
+                                  ('sub/c', 100),
+                                  ('sub/d', 2**14 * 5 + 1))
+    t = torf.Torrent(content_path, piece_size=2**15)
+    assert t.generate(md5sum=True, backend=backend, **read_kwargs) is True
+    exp_t = torf.Torrent(content_path, piece_size=2**15)
+    assert exp_t.generate(backend=backend, **read_kwargs) is True
+    assert t.hashes == exp_t.hashes
+    md5sums = {
+        tuple(fileinfo['path']): fileinfo['md5sum']
+        for fileinfo in t.metainfo['info']['files']
+        if 'attr' not in fileinfo
+    }
+    assert md5sums == {
+        (name,) if name in ('a', 'b') else ('sub', name): hashlib.md5(
+            (content_path / ('' if name in ('a', 'b') else 'sub') / name).read_bytes()
+        ).hexdigest()
+        for name in ('a', 'b', 'c', 'd')
+    }
+    t.write(tmp_path / 'md5sum.torrent')
+    assert torf.Torrent.read(tmp_path / 'md5sum.torrent').metainfo == t.metainfo
+
+def test_md5sum_with_singlefile_torrent(create_file, random_seed):
+    with random_seed(0):
+        content_path = create_file('content', 2**16 * 3 + 2**14 + 5)
+    t = torf.Torrent(content_path, piece_size=2**16)
+    assert t.generate(md5sum=True) is True
+    assert t.metainfo['info']['md5sum'] == hashlib.md5(content_path.read_bytes()).hexdigest()
+
+def test_md5sum_is_not_set_if_cancelled(create_file):
+    content_path = create_file('content', 2**14 * 100)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    assert t.generate(md5sum=True, threads=1, callback=lambda *_: 'cancel') is False
+    assert 'md5sum' not in t.metainfo['info']
+
+@pytest.mark.parametrize('kwargs', ({'checkpoint': 'foo'}, {'previous': torf.Torrent()}, {'cache': 'foo'}))
+def test_md5sum_with_incompatible_arguments(kwargs, create_file):
+    content_path = create_file('content', 2**16)
+    t = torf.Torrent(content_path)
+    with pytest.raises(ValueError, match=r'^md5sum can not be combined with checkpoint, previous or cache$'):
+        t.generate(md5sum=True, **kwargs)
+
+
+def test_agenerate(create_dir, random_seed):
+    with random_seed(0):
+        content_path = create_dir('content', ('a', 2**14 * 3 + 12), ('b', 2**15 + 34))
+    t = torf.Torrent(content_path, piece_size=2**14)
+
+    async def main():
+        return await t.agenerate(threads=2)
+
+    assert asyncio.run(main()) is True
+    exp_t = torf.Torrent(content_path, piece_size=2**14)
+    assert exp_t.generate() is True
+    assert t.hashes == exp_t.hashes
+
+def test_agenerate_iterates_over_callback_arguments(create_file):
+    content_path = create_file('content', 2**14 * 5)
+    t = torf.Torrent(content_path, piece_size=2**14)
+
+    async def main():
+        job = t.agenerate(threads=1)
+        events = [event async for event in job]
+        return events, await job
+
+    events, result = asyncio.run(main())
+    assert result is True
+    assert events == [(t, content_path, pieces_done, 5) for pieces_done in range(1, 6)]
+
+def test_agenerate_raises_exception(create_file):
+    content_path = create_file('content', 2**14 * 5)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    os.remove(content_path)
+
+    async def main():
+        return await t.agenerate()
+
+    with pytest.raises(torf.ReadError):
+        asyncio.run(main())
+
+def test_agenerate_stops_hashing_when_task_is_cancelled(create_file, mocker):
+    content_path = create_file('content', 2**14 * 100)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    sha1_digest = torf._generate.sha1_digest
+
+    def slow_sha1_digest(piece):
+        time.sleep(0.01)
+        return sha1_digest(piece)
+
+    mocker.patch('torf._generate.sha1_digest', slow_sha1_digest)
+    events = []
+
+    async def consume(job):
+        async for event in job:
+            events.append(event)
+            asyncio.current_task().cancel()
+
+    async def main():
+        job = t.agenerate(threads=1)
+        with pytest.raises(asyncio.CancelledError):
+            await consume(job)
+        return await job
+
+    assert asyncio.run(main()) is False
+    assert 1 <= len(events) < 100
+    assert 'pieces' not in t.metainfo['info']
+
+def test_agenerate_in_task(create_file, mocker):
+    content_path = create_file('content', 2**14 * 100)
+    t = torf.Torrent(content_path, piece_size=2**14)
+
+    async def main():
+        return await asyncio.ensure_future(t.agenerate(threads=1))
+
+    assert asyncio.run(main()) is True
+    assert len(t.hashes) == 100
+
+    sha1_digest = torf._generate.sha1_digest
+    calls = []
+
+    def slow_sha1_digest(piece):
+        calls.append(piece)
+        time.sleep(0.01)
+        return sha1_digest(piece)
+
+    mocker.patch('torf._generate.sha1_digest', slow_sha1_digest)
+    t = torf.Torrent(content_path, piece_size=2**14)
+
+    async def main():
+        job = t.agenerate(threads=1)
+        task = asyncio.ensure_future(job)
+        while not calls:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The thread is joined before the task is cancelled
+        return len(calls)
+
+    calls_after_cancelling = asyncio.run(main())
+    assert 1 <= calls_after_cancelling < 100
+    assert len(calls) == calls_after_cancelling
+    assert 'pieces' not in t.metainfo['info']
+
+def test_agenerate_can_not_iterate_after_awaiting(create_file):
+    content_path = create_file('content', 2**14)
+    t = torf.Torrent(content_path, piece_size=2**14)
+
+    async def main():
+        job = t.agenerate()
+        await job
+        with pytest.raises(RuntimeError, match=r'^Iteration must start before awaiting$'):
+            job.__aiter__()
+
+    asyncio.run(main())
+
+
+def test_iter_generate(create_dir, random_seed):
+    with random_seed(0):
+        content_path = create_dir('content', ('a', 2**14 * 6 + 12), ('b', 2**14 * 3 + 34))
+    t = torf.Torrent(content_path, piece_size=2**14)
+    reports = list(t.iter_generate(batch_pieces=4, threads=1))
+    # Reports are merged if they are not consumed fast enough
+    assert {p.pieces_done for p in reports} <= {4, 8, 10}
+    assert all(p.pieces_total == 10 for p in reports)
+    assert [p.result for p in reports] == [None] * (len(reports) - 1) + [True]
+    assert reports[-1].bytes_done == reports[-1].bytes_total == t.size
+    assert all(p.torrent is t and p.errors == () for p in reports)
+    exp_t = torf.Torrent(content_path, piece_size=2**14)
+    assert exp_t.generate() is True
+    assert t.hashes == exp_t.hashes
+
+@pytest.mark.parametrize(
+    argnames='batch_pieces, batch_bytes, exp_pieces_done',
+    argvalues=(
+        (None, None, list(range(2, 201, 2)) + [200]),
+        (None, 2**14 * 50 + 1, [51, 102, 153, 200]),
+        (60, 2**14 * 50 + 1, [51, 102, 153, 200]),
+        (40, 2**14 * 50 + 1, [40, 80, 120, 160, 200]),
+    ),
+)
+def test_iter_generate_batch_size(batch_pieces, batch_bytes, exp_pieces_done, create_file):
+    content_path = create_file('content', 2**14 * 200)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    reports = [progress.pieces_done
+               for progress in t.iter_generate(batch_pieces=batch_pieces, batch_bytes=batch_bytes, threads=1)]
+    assert reports[-1] == 200
+    assert set(reports) <= set(exp_pieces_done)
+
+def test_iter_generate_only_reports_batches(create_file, mocker):
+    content_path = create_file('content', 2**14 * 200)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    call = mocker.patch.object(torf._progress.ProgressBatcher, '__call__', autospec=True,
+                               side_effect=torf._progress.ProgressBatcher.__call__)
+    reports = list(t.iter_generate(batch_pieces=50, threads=1))
+    assert reports[-1].result is True
+    assert [c.args[3] for c in call.call_args_list] == [50, 100, 150, 200]
+
+def test_iter_generate_reports_final_batch_once(create_file, mocker):
+    content_path = create_file('content', 2**14 * 200)
+    t = torf.Torrent(content_path, piece_size=2**14)
+
+    # Don't make another report before the previous one is consumed
+    def call(self, *args, _call=torf._progress.ProgressBatcher.__call__, **kwargs):
+        return_value = _call(self, *args, **kwargs)
+        while self._state is not None:
+            time.sleep(0.001)
+        return return_value
+
+    mocker.patch.object(torf._progress.ProgressBatcher, '__call__', autospec=True, side_effect=call)
+    reports = [(p.pieces_done, p.result) for p in t.iter_generate(batch_pieces=50, threads=1)]
+    assert reports == [(50, None), (100, None), (150, None), (200, True)]
+
+def test_iter_generate_raises_exception(create_file):
+    content_path = create_file('content', 2**14 * 5)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    os.remove(content_path)
+    with pytest.raises(torf.ReadError):
+        list(t.iter_generate())
+
+def test_iter_generate_cancels_when_iteration_stops(create_file):
+    content_path = create_file('content', 2**14 * 1000)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    iterator = t.iter_generate(batch_pieces=1, threads=1)
+    assert next(iterator).pieces_done >= 1
+    iterator.close()
+    assert 'pieces' not in t.metainfo['info']
+
+
+@pytest.mark.parametrize('backend', ('thread', 'process'))
+def test_stats(backend, create_dir, random_seed):
+    with random_seed(0):
+        content_path = create_dir('content', ('a', 2**14 * 6 + 12), ('b', 2**14 * 3 + 34))
+    t = torf.Torrent(content_path, piece_size=2**14)
+    stats = torf.Stats()
+    calls = []
+    assert t.generate(threads=2, backend=backend, stats=stats, callback=lambda *args: calls.append(args)) is True
+    assert stats.bytes_read == t.size
+    assert stats.pieces_read == t.pieces
+    assert 0 < stats.read_latency(0) <= stats.read_latency(50) <= stats.read_latency(100)
+    assert all(0 < seconds < stats.seconds_elapsed for seconds in stats.hash_seconds.values())
+    assert set(stats.hash_seconds) <= {'hasher1', 'hasher2'}
+    assert 1 <= stats.piece_queue_max <= 2 * 3
+    # The hash queue may also contain the item that closes it
+    assert 1 <= stats.hash_queue_max <= t.pieces + 1
+    assert 0 < stats.callback_seconds < stats.seconds_elapsed
+    assert stats.piece_queue_get_seconds >= 0
+    assert stats.piece_queue_put_seconds >= 0
+    assert stats.hash_queue_get_seconds > 0
+    assert stats.bytes_per_second == stats.bytes_read / stats.seconds_elapsed
+    assert len(calls) == t.pieces
+    assert json.loads(json.dumps(stats.as_dict())) == stats.as_dict()
+
+def test_stats_hash_seconds_is_cpu_time(create_file, mocker):
+    content_path = create_file('content', 2**14 * 5)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    sha1_digest = torf._generate.sha1_digest
+
+    def sleepy_sha1_digest(piece):
+        time.sleep(0.1)
+        return sha1_digest(piece)
+
+    mocker.patch('torf._generate.sha1_digest', side_effect=sleepy_sha1_digest)
+    stats = torf.Stats()
+    assert t.generate(threads=1, stats=stats) is True
+    assert stats.seconds_elapsed >= 0.5
+    assert 0 < stats.hash_seconds['hasher1'] < 0.25
+
+def test_stats_are_accumulated(create_file):
+    content_path = create_file('content', 2**14 * 5)
+    stats = torf.Stats()
+    for _ in range(2):
+        assert torf.Torrent(content_path, piece_size=2**14).generate(stats=stats) is True
+    assert stats.bytes_read == 2 * 2**14 * 5
+    assert stats.pieces_read == 10
+
+def test_stats_without_pieces():
+    stats = torf.Stats()
+    assert stats.read_latency(50) is None
+    assert stats.bytes_per_second == 0
+    with pytest.raises(ValueError, match=r'^Invalid percentile: 101$'):
+        stats.read_latency(101)
+
+def test_throttle(create_file):
+    content_path = create_file('content', 2**14 * 10)
+    t = torf.Torrent(content_path, piece_size=2**14)
+    throttle = torf.Throttle(max_bytes_per_second=2**14 * 20, max_reads_per_second=20)
+    start = time.monotonic()
+    assert t.generate(throttle=throttle) is True
+    assert time.monotonic() - start < 2
+    throttle.max_reads_per_second = 5
+    start = time.monotonic()
+    assert t.generate(throttle=throttle) is True
+    # The bucket is full after the previous call
+    assert 1 <= time.monotonic() - start < 3
+
+@pytest.mark.parametrize(
+    argnames='max_memory, exp_max_pieces',
+    argvalues=((1, 1), (2**14 * 3 - 1, 2), (2**14 * 3, 3)),
+)
+@pytest.mark.parametrize('reuse_buffers', (False, True))
+def test_max_memory(max_memory, exp_max_pieces, reuse_buffers, create_dir, random_seed, mocker):
+    with random_seed(0):
+        content_path = create_dir('content', ('a', 2**14 * 20 + 12), ('b', 2**14 * 13 + 34))
+    t = torf.Torrent(content_path, piece_size=2**14)
+
+    pieces_in_use = []
+    acquire = torf._generate.MemoryBudget.acquire
+
+    def tracking_acquire(self, *args, **kwargs):
+        acquired = acquire(self, *args, **kwargs)
+        pieces_in_use.append(self.pieces - self._available)
+        return acquired
+
+    mocker.patch('torf._generate.MemoryBudget.acquire', tracking_acquire)
+    assert t.generate(threads=4, readers=2, max_memory=max_memory, reuse_buffers=reuse_buffers) is True
+    assert max(pieces_in_use) == exp_max_pieces
+    exp_t = torf.Torrent(content_path, piece_size=2**14)
+    assert exp_t.generate() is True
+    assert t.hashes == exp_t.hashes
+
+    assert t.verify(content_path, threads=4, max_memory=max_memory, reuse_buffers=reuse_buffers) is True
+    assert max(pieces_in_use) == exp_max_pieces
+
+def test_max_memory_with_missing_file(create_dir):
+    content_path = create_dir('content', ('a', 2**14 * 5 + 12), ('b', 2**14 * 3 + 34), ('c', 2**14 * 2))
+    t = torf.Torrent(content_path, piece_size=2**14)
+    assert t.generate() is True
+    t = torf.Torrent.read_stream(t.dump())
+    os.remove(content_path / 'b')
+    callback = mock.Mock(return_value=None)
+    assert t.verify(content_path, threads=2, max_memory=2**14, callback=callback) is False
+    assert callback.call_args_list[-1][0][2:4] == (t.pieces, t.pieces)
+
+
+@pytest.mark.parametrize('readers', (1, 2), ids=lambda v: f'readers={v}')
+def test_files_are_listed_once(readers, create_dir, mocker):
+    content_path = create_dir('content', ('a', 2**14 * 3 + 123), ('b', 2**14 * 2), ('c', 456))
+    t = torf.Torrent(content_path, piece_size=2**14)
+    get_files_with_padding = mocker.spy(torf.TorrentFileStream, '_get_files_with_padding')
+    assert t.generate(readers=readers) is True
+    assert get_files_with_padding.call_count == 1
+
+
+@pytest.mark.parametrize('backend', torf._generate.BACKENDS)
+def test_zero_pieces_are_not_read(backend, tmp_path):
+    piece_size = 2**16
+    content_path = tmp_path / 'content'
+    content_path.mkdir()
+    with open(content_path / 'a', 'wb') as f:
+        f.truncate(piece_size * 10 + 123)
+        f.seek(piece_size * 3 + 5)
+        f.write(b'foo')
+    (content_path / 'b').write_bytes(os.urandom(piece_size * 2 + 456))
+    if not hasattr(os, 'SEEK_HOLE') or os.stat(content_path / 'a').st_blocks * 512 >= piece_size * 10:
+        pytest.skip('File system does not support sparse files')
+
+    stats = torf.Stats()
+    t = torf.Torrent(content_path, piece_size=piece_size)
+    assert t.generate(backend=backend, stats=stats) is True
+    content = (content_path / 'a').read_bytes() + (content_path / 'b').read_bytes()
+    exp_hashes = tuple(
+        hashlib.sha1(content[pos:pos + piece_size]).digest()
+        for pos in range(0, len(content), piece_size)
+    )
+    assert t.hashes == exp_hashes
+    # Pieces 0-2 and 4-9 are in holes
+    assert stats.pieces_read == t.pieces - 9
+
+    # Non-sparse copy with the same content
+    copy_path = tmp_path / 'copy'
+    copy_path.mkdir()
+    (copy_path / 'a').write_bytes((content_path / 'a').read_bytes())
+    (copy_path / 'b').write_bytes((content_path / 'b').read_bytes())
+    assert t.verify(copy_path, backend=backend) is True
+
+    # Piece 5 is not in a hole
+    with open(content_path / 'a', 'r+b') as f:
+        f.seek(piece_size * 5 + 10)
+        f.write(b'bar')
+    callback = mock.Mock(return_value=None)
+    assert t.verify(content_path, backend=backend, callback=callback) is False
+    failed = [args[0][4] for args in callback.call_args_list if args[0][5] != exp_hashes[args[0][4]]]
+    assert failed == [5]
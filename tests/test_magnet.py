@@ -1,6 +1,8 @@
+import asyncio
 import base64
 import binascii
 import hashlib
+import threading
 import time
 import urllib
 from unittest import mock
@@ -436,6 +438,48 @@ def test_getting_info__xs_succeeds__as_fails(generated_singlefile_torrent, https
     torrent_ = magnet.torrent()
     assert torrent_.metainfo['info'] == torrent.metainfo['info']
 
+def test_getting_info_asynchronously(generated_singlefile_torrent, httpserver):
+    torrent = generated_singlefile_torrent
+    magnet = torf.Magnet(torrent.infohash,
+                         xs='asdf://xs.foo:123/torrent', as_=httpserver.url_for('/torrent'))
+    httpserver.expect_request('/torrent').respond_with_data(torrent.dump())
+    cb_calls = []
+
+    async def main():
+        def cb(exception):
+            assert asyncio.get_running_loop()
+            cb_calls.append(exception)
+        return await magnet.aget_info(callback=cb)
+
+    assert asyncio.run(main()) is True
+    assert cb_calls == [ComparableException(torf.ConnectionError('asdf://xs.foo:123/torrent', 'Unsupported protocol'))]
+    assert magnet.torrent().metainfo['info'] == torrent.metainfo['info']
+
+def test_cancelling_async_info_download_stops_trying_sources(generated_singlefile_torrent, mocker):
+    torrent = generated_singlefile_torrent
+    magnet = torf.Magnet(torrent.infohash, xs='http://xs.foo/torrent', as_='http://as.foo/torrent')
+    started, release = threading.Event(), threading.Event()
+    urls = []
+
+    def download(url, timeout):
+        urls.append(url)
+        started.set()
+        release.wait()
+        raise torf.ConnectionError(url, 'Nope')
+
+    mocker.patch('torf._utils.download', side_effect=download)
+
+    async def main():
+        task = asyncio.ensure_future(magnet.aget_info())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        release.set()
+
+    asyncio.run(main())
+    assert urls == ['http://xs.foo/torrent']
+
 def test_getting_info__xs_fails__as_succeeds(generated_singlefile_torrent, httpserver, monkeypatch):
     torrent = generated_singlefile_torrent
     total_timeout = 100
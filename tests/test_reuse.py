@@ -733,3 +733,22 @@ def test_reuse_copies_file_order(with_callback, existing_torrents):
         # Confirm everything happened as expected
         assert return_value is True
         assert new_torrent.metainfo == exp_joined_metainfo
+
+
+@pytest.mark.parametrize('use_mmap', (False, True), ids=('read', 'mmap'))
+def test_reuse_only_maps_files_if_requested(use_mmap, existing_torrents, mocker):
+    existing_torrents = existing_torrents(
+        my_torrents=(
+            ('a', (
+                ('this.jpg', 16380 * 30),
+                ('that.txt', 'text data'),
+            ), {'creation_date': 123}),
+        ),
+    )
+    reused = existing_torrents.my_torrents[0]
+    new_torrent = torf.Torrent(reused.content_path)
+    TorrentFileStream_mock = mocker.patch('torf._stream.TorrentFileStream', wraps=torf.TorrentFileStream)
+
+    assert new_torrent.reuse(existing_torrents.location_paths, use_mmap=use_mmap) is True
+    assert new_torrent.metainfo['info']['pieces'] == reused.torrent.metainfo['info']['pieces']
+    assert [c.kwargs['use_mmap'] for c in TorrentFileStream_mock.call_args_list] == [use_mmap]
@@ -7,6 +7,7 @@ from unittest.mock import Mock, PropertyMock, call
 import pytest
 
 from torf import MemoryError, ReadError, TorrentFileStream, VerifyFileSizeError
+from torf._stream import BufferPool
 
 from . import ComparableException
 
@@ -75,6 +76,10 @@ class Torrent:
         else:
             return 'multifile'
 
+    @property
+    def metainfo(self):
+        return {'info': {'files': [{'length': f.size, 'path': f.parts[1:]} for f in self.files]}}
+
 
 @pytest.mark.parametrize('file', (None, File('MyTorrent/foo.txt', 123)))
 @pytest.mark.parametrize('none_ok', (True, False))
@@ -169,6 +174,22 @@ def test_close():
     assert tfs._open_files == {}
 
 
+def test_from_stream(tmp_path):
+    files = [File('t/a', 12), File('t/b', 7)]
+    for f in files:
+        f.write_at(tmp_path)
+    torrent = Torrent(piece_size=6, files=files)
+    tfs = TorrentFileStream(torrent, content_path=tmp_path / 't', use_mmap=True)
+    with TorrentFileStream.from_stream(tfs) as tfs_copy:
+        assert tfs_copy._torrent is torrent
+        assert tfs_copy._content_path == tmp_path / 't'
+        assert tfs_copy._use_mmap is True
+        assert tfs_copy._get_layout() is tfs._get_layout()
+        assert tfs_copy.get_piece(2) == files[1].content[:6]
+        assert tfs_copy._open_maps
+        assert not tfs._open_maps
+
+
 @pytest.mark.parametrize(
     argnames='chunk_size, files, exp_max_piece_index',
     argvalues=(
@@ -385,6 +406,97 @@ def test_get_piece_indexes_of_file_exclusive(chunk_size, files, exp_piece_indexe
         assert tfs.get_piece_indexes_of_file(file, exclusive=True) == exp_indexes
 
 
+@pytest.mark.parametrize(
+    argnames='chunk_size, files, devices, exp_ranges',
+    argvalues=(
+        # 0   1   2   3   4   5
+        # aaabbbbbccccccccdddd
+        (4, [File('t/a', 3), File('t/b', 5), File('t/c', 8), File('t/d', 4)],
+         {'a': 1, 'b': 1, 'c': 1, 'd': 1},
+         {1: [range(0, 5)]}),
+        (4, [File('t/a', 3), File('t/b', 5), File('t/c', 8), File('t/d', 4)],
+         {'a': 1, 'b': 2, 'c': 1, 'd': 2},
+         {1: [range(0, 1), range(2, 4)], 2: [range(1, 2), range(4, 5)]}),
+        (4, [File('t/a', 3), File('t/b', 5), File('t/c', 8), File('t/d', 4)],
+         {'a': 1, 'b': 1, 'c': 2, 'd': 2},
+         {1: [range(0, 2)], 2: [range(2, 5)]}),
+        (4, [File('t/a', 3), File('t/b', 5), File('t/c', 8), File('t/d', 4)],
+         {'a': 1, 'b': 1, 'd': 2},
+         {1: [range(0, 4)], 2: [range(4, 5)]}),
+        (4, [File('t/a', 3), File('t/b', 5), File('t/c', 8), File('t/d', 4)],
+         {'c': 1, 'd': 2},
+         {1: [range(0, 4)], 2: [range(4, 5)]}),
+        (4, [File('t/a', 3), File('t/b', 5), File('t/c', 8), File('t/d', 4)],
+         {'a': 1, 'c': 2},
+         {1: [range(0, 2)], 2: [range(2, 5)]}),
+        (4, [File('t/a', 3), File('t/b', 5), File('t/c', 8), File('t/d', 4)],
+         {},
+         {None: [range(0, 5)]}),
+        # File "b" doesn't contain the first byte of any piece
+        (4, [File('t/a', 5), File('t/b', 2), File('t/c', 5)],
+         {'a': 1, 'b': 2, 'c': 1},
+         {1: [range(0, 3)]}),
+    ),
+    ids=lambda v: repr(v),
+)
+def test_get_piece_ranges_by_device(chunk_size, files, devices, exp_ranges, mocker):
+    def stat(path):
+        name = os.path.basename(path)
+        if name in devices:
+            return mocker.Mock(st_dev=devices[name])
+        else:
+            raise FileNotFoundError(path)
+
+    mocker.patch('os.stat', side_effect=stat)
+    torrent = Torrent(piece_size=chunk_size, files=files)
+    tfs = TorrentFileStream(torrent, content_path='path/to/t')
+    assert tfs.get_piece_ranges_by_device() == exp_ranges
+
+
+def _create_sparse_file(path, size, data_positions=()):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.truncate(size)
+        for pos in data_positions:
+            f.seek(pos)
+            f.write(b'x')
+    if not hasattr(os, 'SEEK_HOLE') or os.stat(path).st_blocks * 512 >= size:
+        pytest.skip('File system does not support sparse files')
+
+
+def test_get_zero_piece_ranges(tmp_path):
+    chunk_size = 2**16
+    files = [
+        File('t/a', bytes(chunk_size * 10 + 123)),
+        File('t/b', bytes(chunk_size * 3)),
+        File('t/c', bytes(chunk_size * 4)),
+        File('t/d', bytes(100)),
+    ]
+    _create_sparse_file(tmp_path / 't' / 'a', files[0].size, data_positions=[chunk_size * 3 + 5])
+    (tmp_path / 't' / 'b').write_bytes(os.urandom(files[1].size))
+    _create_sparse_file(tmp_path / 't' / 'c', files[2].size)
+    _create_sparse_file(tmp_path / 't' / 'd', files[3].size)
+    torrent = Torrent(piece_size=chunk_size, files=files)
+    tfs = TorrentFileStream(torrent, content_path=tmp_path / 't')
+    assert tfs.get_zero_piece_ranges() == [range(0, 3), range(4, 10), range(14, 17)]
+
+
+def test_get_zero_piece_ranges_ignores_unexpected_file_size(tmp_path):
+    chunk_size = 2**16
+    files = [File('t/a', bytes(chunk_size * 4))]
+    _create_sparse_file(tmp_path / 't' / 'a', chunk_size * 5)
+    torrent = Torrent(piece_size=chunk_size, files=files)
+    tfs = TorrentFileStream(torrent, content_path=tmp_path / 't')
+    assert tfs.get_zero_piece_ranges() == []
+
+
+def test_get_zero_piece_ranges_ignores_missing_file(tmp_path):
+    files = [File('t/a', bytes(2**16 * 4))]
+    torrent = Torrent(piece_size=2**16, files=files)
+    tfs = TorrentFileStream(torrent, content_path=tmp_path / 't')
+    assert tfs.get_zero_piece_ranges() == []
+
+
 @pytest.mark.parametrize(
     argnames='chunk_size, files, first_byte_indexes, last_byte_indexes, exp_files',
     argvalues=(
@@ -780,7 +892,9 @@ def test_get_relative_piece_indexes(file, relative_piece_indexes, exp_indexes,
         (None, None, None, None),
     ),
 )
+@pytest.mark.parametrize('use_mmap', (False, True), ids=('without mmap', 'with mmap'))
 def test_get_piece_returns_piece_from_files(
+        use_mmap,
         torrent_content_path, stream_content_path, custom_content_path, exp_content_path,
         chunk_size, files, piece_index,
         tmp_path, mocker,
@@ -815,12 +929,13 @@ def test_get_piece_returns_piece_from_files(
     assert len(exp_piece) == exp_piece_length
 
     torrent = Torrent(piece_size=chunk_size, files=files, path=torrent_content_path)
-    with TorrentFileStream(torrent, content_path=stream_content_path) as tfs:
+    with TorrentFileStream(torrent, content_path=stream_content_path, use_mmap=use_mmap) as tfs:
         if exp_content_path is None:
             with pytest.raises(ValueError, match=r'^Missing content_path argument and torrent has no path specified$'):
                 tfs.get_piece(piece_index, content_path=custom_content_path)
         else:
             piece = tfs.get_piece(piece_index, content_path=custom_content_path)
+            assert type(piece) is bytes
             assert piece == exp_piece
 
 
@@ -986,7 +1101,8 @@ def test_get_piece_with_piece_index_out_of_bounds(chunk_size, files, piece_index
     ),
     ids=lambda v: str(v),
 )
-def test_get_piece_with_missing_file(chunk_size, files, missing_files, piece_index, exp_missing_file, tmp_path):
+@pytest.mark.parametrize('use_mmap', (False, True), ids=('without mmap', 'with mmap'))
+def test_get_piece_with_missing_file(use_mmap, chunk_size, files, missing_files, piece_index, exp_missing_file, tmp_path):
     torrent_name = files[0].parts[0]
     for file in files:
         if file not in missing_files:
@@ -998,7 +1114,7 @@ def test_get_piece_with_missing_file(chunk_size, files, missing_files, piece_ind
             print(f'not writing {file}: {file.size} bytes: {file.content}')
 
     torrent = Torrent(piece_size=chunk_size, files=files)
-    tfs = TorrentFileStream(torrent)
+    tfs = TorrentFileStream(torrent, use_mmap=use_mmap)
 
     if exp_missing_file:
         exp_exception = ReadError(errno.ENOENT, tmp_path / exp_missing_file)
@@ -1032,7 +1148,8 @@ def test_get_piece_with_missing_file(chunk_size, files, missing_files, piece_ind
     ),
     ids=lambda v: str(v),
 )
-def test_get_piece_with_wrong_file_size(chunk_size, files, contents, piece_index, exp_result, tmp_path):
+@pytest.mark.parametrize('use_mmap', (False, True), ids=('without mmap', 'with mmap'))
+def test_get_piece_with_wrong_file_size(use_mmap, chunk_size, files, contents, piece_index, exp_result, tmp_path):
     for file in files:
         filepath = tmp_path / file
         filepath.parent.mkdir(parents=True, exist_ok=True)
@@ -1051,7 +1168,7 @@ def test_get_piece_with_wrong_file_size(chunk_size, files, contents, piece_index
         actual_file_size = os.path.getsize(tmp_path / exp_filepath_rel)
         exp_exception = VerifyFileSizeError(exp_filepath, actual_file_size, exp_filesize)
 
-        with TorrentFileStream(torrent) as tfs:
+        with TorrentFileStream(torrent, use_mmap=use_mmap) as tfs:
             with pytest.raises(type(exp_exception), match=rf'^{re.escape(str(exp_exception))}$'):
                 tfs.get_piece(piece_index, content_path=tmp_path / 't')
 
@@ -1065,7 +1182,7 @@ def test_get_piece_with_wrong_file_size(chunk_size, files, contents, piece_index
         exp_piece_length = stop - start
         assert len(exp_piece) == exp_piece_length
 
-        with TorrentFileStream(torrent) as tfs:
+        with TorrentFileStream(torrent, use_mmap=use_mmap) as tfs:
             assert tfs.get_piece(piece_index, content_path=tmp_path / 't') == exp_piece
 
 
@@ -1257,7 +1374,9 @@ def test_get_open_file_respects_max_open_files(mocker):
         (None, None, None, None),
     ),
 )
+@pytest.mark.parametrize('read_mode', ('read', 'buffer_pool', 'mmap'))
 def test_iter_pieces_without_missing_files(
+    read_mode,
     torrent_content_path, stream_content_path, custom_content_path, exp_content_path,
     chunk_size, files, exp_chunks,
     tmp_path, mocker,
@@ -1291,12 +1410,20 @@ def test_iter_pieces_without_missing_files(
         exp_chunks_fixed.append((chunk, filepath, exceptions))
 
     torrent = Torrent(piece_size=chunk_size, files=files, path=torrent_content_path)
-    with TorrentFileStream(torrent, content_path=stream_content_path) as tfs:
+    buffer_pool = BufferPool(count=2, size=chunk_size) if read_mode == 'buffer_pool' else None
+    with TorrentFileStream(torrent, content_path=stream_content_path, use_mmap=read_mode == 'mmap') as tfs:
         if exp_content_path is None:
             with pytest.raises(ValueError, match=r'^Missing content_path argument and torrent has no path specified$'):
-                list(tfs.iter_pieces(content_path=custom_content_path))
+                list(_iter_pieces(tfs, buffer_pool, content_path=custom_content_path))
         else:
-            assert list(tfs.iter_pieces(content_path=custom_content_path)) == exp_chunks_fixed
+            assert list(_iter_pieces(tfs, buffer_pool, content_path=custom_content_path)) == exp_chunks_fixed
+
+            # Any piece range yields the same pieces
+            for start in range(len(exp_chunks_fixed) + 1):
+                for stop in range(start, len(exp_chunks_fixed) + 1):
+                    chunks = list(_iter_pieces(tfs, buffer_pool, content_path=custom_content_path,
+                                               start=start, stop=stop))
+                    assert chunks == exp_chunks_fixed[start:stop], (start, stop)
 
 
 @pytest.mark.parametrize(
@@ -1617,7 +1744,8 @@ def test_iter_pieces_without_missing_files(
     ),
     ids=lambda v: str(v),
 )
-def test_iter_pieces_with_missing_files(chunk_size, files, missing_files, exp_chunks, tmp_path):
+@pytest.mark.parametrize('read_mode', ('read', 'buffer_pool', 'mmap'))
+def test_iter_pieces_with_missing_files(read_mode, chunk_size, files, missing_files, exp_chunks, tmp_path):
     torrent_name = files[0].parts[0]
     content_path = tmp_path / torrent_name
     content_path.mkdir(parents=True, exist_ok=True)
@@ -1637,8 +1765,9 @@ def test_iter_pieces_with_missing_files(chunk_size, files, missing_files, exp_ch
         exp_chunks_fixed.append((chunk, filepath, exceptions))
 
     torrent = Torrent(piece_size=chunk_size, files=files)
-    tfs = TorrentFileStream(torrent)
-    chunks = list(tfs.iter_pieces(content_path=content_path))
+    tfs = TorrentFileStream(torrent, use_mmap=read_mode == 'mmap')
+    buffer_pool = BufferPool(count=2, size=chunk_size) if read_mode == 'buffer_pool' else None
+    chunks = list(_iter_pieces(tfs, buffer_pool, content_path=content_path))
 
     def compare(x, y):
         if chunks[x][y] != exp_chunks_fixed[x][y]:
@@ -1651,6 +1780,133 @@ def test_iter_pieces_with_missing_files(chunk_size, files, missing_files, exp_ch
 
     assert chunks == exp_chunks_fixed
 
+    # Splitting the stream into two piece ranges yields the same pieces and
+    # reports every exception at least once
+    exp_exceptions = {str(e) for chunk in exp_chunks_fixed for e in chunk[2]}
+    for split in range(1, len(exp_chunks_fixed)):
+        chunks = (list(_iter_pieces(tfs, buffer_pool, content_path=content_path, stop=split))
+                  + list(_iter_pieces(tfs, buffer_pool, content_path=content_path, start=split)))
+        assert [chunk[:2] for chunk in chunks] == [chunk[:2] for chunk in exp_chunks_fixed]
+        assert {str(e) for chunk in chunks for e in chunk[2]} == exp_exceptions
+
+
+@pytest.mark.parametrize(
+    argnames='start, stop, exp_error',
+    argvalues=(
+        (-1, None, 'Invalid piece range (0 - 3): -1 - 3'),
+        (0, 4, 'Invalid piece range (0 - 3): 0 - 4'),
+        (2, 1, 'Invalid piece range (0 - 3): 2 - 1'),
+    ),
+)
+def test_iter_pieces_with_invalid_piece_range(start, stop, exp_error):
+    torrent = Torrent(piece_size=4, files=(File('t/a', 10),))
+    tfs = TorrentFileStream(torrent)
+    with pytest.raises(ValueError, match=rf'^{re.escape(exp_error)}$'):
+        tfs.iter_pieces(start=start, stop=stop)
+
+
+def _iter_pieces(tfs, buffer_pool, aligned=False, **kwargs):
+    # Copy each piece and release its buffer like a hasher would
+    iter_pieces = tfs.iter_aligned_pieces if aligned else tfs.iter_pieces
+    for piece, filepath, exceptions in iter_pieces(buffer_pool=buffer_pool, **kwargs):
+        if buffer_pool is not None and piece is not None:
+            assert isinstance(piece, memoryview)
+            chunk = bytes(piece)
+            buffer_pool.release(piece)
+            yield (chunk, filepath, exceptions)
+        elif piece is not None:
+            yield (bytes(piece), filepath, exceptions)
+        else:
+            yield (piece, filepath, exceptions)
+
+
+@pytest.mark.parametrize('read_mode', ('read', 'buffer_pool', 'mmap'))
+def test_iter_aligned_pieces(read_mode, tmp_path):
+    files = (File('t/a', b'abcdefghij'), File('t/b', b''), File('t/c', b'klm'), File('t/d', b'nopqrstu'))
+    for file in files:
+        file.write_at(tmp_path)
+    torrent = Torrent(piece_size=4, files=files)
+    buffer_pool = BufferPool(count=2, size=4) if read_mode == 'buffer_pool' else None
+    exp_chunks = [
+        (b'abcd', 't/a', ()),
+        (b'efgh', 't/a', ()),
+        (b'ij', 't/a', ()),
+        (b'klm', 't/c', ()),
+        (b'nopq', 't/d', ()),
+        (b'rstu', 't/d', ()),
+    ]
+    with TorrentFileStream(torrent, content_path=tmp_path / 't', use_mmap=read_mode == 'mmap') as tfs:
+        assert tfs.aligned_pieces == 6
+        chunks = [(piece, os.path.relpath(filepath, tmp_path), exceptions)
+                  for piece, filepath, exceptions in _iter_pieces(tfs, buffer_pool, aligned=True)]
+        assert chunks == exp_chunks
+
+        # Any piece range yields the same pieces
+        for start in range(len(exp_chunks) + 1):
+            for stop in range(start, len(exp_chunks) + 1):
+                chunks = [(piece, os.path.relpath(filepath, tmp_path), exceptions)
+                          for piece, filepath, exceptions
+                          in _iter_pieces(tfs, buffer_pool, aligned=True, start=start, stop=stop)]
+                assert chunks == exp_chunks[start:stop], (start, stop)
+
+        with pytest.raises(ValueError, match=r'^Invalid piece range \(0 - 6\): 0 - 7$'):
+            tfs.iter_aligned_pieces(stop=7)
+
+def test_iter_aligned_pieces_with_missing_file(tmp_path):
+    files = (File('t/a', b'abcdefghij'), File('t/b', b'klmnopqrstu'), File('t/c', b'vw'))
+    for file in (files[0], files[2]):
+        file.write_at(tmp_path)
+    torrent = Torrent(piece_size=4, files=files)
+    with TorrentFileStream(torrent, content_path=tmp_path / 't') as tfs:
+        chunks = [(piece, os.path.relpath(filepath, tmp_path), exceptions)
+                  for piece, filepath, exceptions in tfs.iter_aligned_pieces()]
+    assert chunks == [
+        (b'abcd', 't/a', ()),
+        (b'efgh', 't/a', ()),
+        (b'ij', 't/a', ()),
+        (None, 't/b', (ComparableException(ReadError(errno.ENOENT, str(tmp_path / 't' / 'b'))),)),
+        (None, 't/b', ()),
+        (None, 't/b', ()),
+        (b'vw', 't/c', ()),
+    ]
+
+
+def test_close_closes_memory_maps(tmp_path):
+    files = (File('t/a', b'abc'), File('t/b', b'defgh'))
+    for file in files:
+        file.write_at(tmp_path)
+    torrent = Torrent(piece_size=4, files=files)
+    tfs = TorrentFileStream(torrent, content_path=tmp_path / 't', use_mmap=True)
+    pieces = [piece for piece, _, _ in tfs.iter_pieces()]
+    assert [bytes(piece) for piece in pieces] == [b'abcd', b'efgh']
+    maps = list(tfs._open_maps.values())
+    assert len(maps) == 2
+
+    # Map of "b" is still referenced by the last piece
+    tfs.close()
+    assert tfs._open_maps == {}
+    assert tfs._open_files == {}
+    assert maps[0].closed
+    assert not maps[1].closed
+    assert bytes(pieces[-1]) == b'efgh'
+
+
+def test_buffer_pool_with_invalid_count():
+    with pytest.raises(ValueError, match=r'^count must be positive: 0$'):
+        BufferPool(count=0, size=123)
+
+def test_buffer_pool_reuses_buffers():
+    pool = BufferPool(count=2, size=123)
+    assert pool.size == 123
+    a = pool.acquire()
+    b = pool.acquire()
+    assert a is not b
+    assert len(a) == len(b) == 123
+    pool.release(memoryview(a)[:10])
+    assert pool.acquire() is a
+    pool.release(b)
+    assert pool.acquire() is b
+
 
 class OOMCallback:
     def __init__(self, attempts):
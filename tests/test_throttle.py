@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+import torf
+
+
+@pytest.mark.parametrize('name', ('max_bytes_per_second', 'max_reads_per_second'))
+@pytest.mark.parametrize('value', (0, -1, 'foo', [1]))
+def test_invalid_limit(name, value):
+    exp_msg = rf'^{name} must be a positive number or None: {value!r}$'.replace('[', r'\[').replace(']', r'\]')
+    with pytest.raises(ValueError, match=exp_msg):
+        torf.Throttle(**{name: value})
+    throttle = torf.Throttle()
+    with pytest.raises(ValueError, match=exp_msg):
+        setattr(throttle, name, value)
+
+
+def test_no_limits():
+    throttle = torf.Throttle()
+    start = time.monotonic()
+    for _ in range(1000):
+        throttle.consume(2**20)
+    assert time.monotonic() - start < 0.5
+
+
+def test_max_bytes_per_second():
+    throttle = torf.Throttle(max_bytes_per_second=1000)
+    start = time.monotonic()
+    # First 1000 bytes are in the bucket
+    for _ in range(5):
+        throttle.consume(300)
+    assert 0.45 <= time.monotonic() - start < 1.5
+
+
+def test_max_reads_per_second():
+    throttle = torf.Throttle(max_reads_per_second=10)
+    start = time.monotonic()
+    # First 10 reads are in the bucket
+    for _ in range(15):
+        throttle.consume(2**20)
+    assert 0.45 <= time.monotonic() - start < 1.5
+
+
+def test_changing_limit_wakes_up_blocked_consumer():
+    throttle = torf.Throttle(max_bytes_per_second=1)
+    durations = []
+
+    def consume():
+        start = time.monotonic()
+        throttle.consume(100)
+        durations.append(time.monotonic() - start)
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+    time.sleep(0.2)
+    throttle.max_bytes_per_second = None
+    thread.join(timeout=5)
+    assert throttle.max_bytes_per_second is None
+    assert 0.2 <= durations[0] < 2
+
+
+def test_is_stopped():
+    throttle = torf.Throttle(max_bytes_per_second=1)
+    start = time.monotonic()
+    throttle.consume(100, is_stopped=lambda: time.monotonic() - start > 0.2)
+    assert 0.2 <= time.monotonic() - start < 2
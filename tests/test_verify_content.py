@@ -1,10 +1,14 @@
+import asyncio
 import collections
 import errno
 import itertools
 import os
 import random
+import re
+from pathlib import Path
 from unittest import mock
 
+import flatbencode as bencode
 import pytest
 
 import torf
@@ -105,7 +109,7 @@ class _TestCaseBase():
             if hasattr(self, attr):
                 delattr(self, attr)
 
-    def run(self, *_, with_callback, exp_return_value=None, skip_on_error=False):
+    def run(self, *_, with_callback, exp_return_value=None, skip_on_error=False, **verify_kwargs):
         debug(f'Original stream: {self.stream_original.hex()}')
         debug(f' Corrupt stream: {self.stream_corrupt.hex()}')
         debug(f'Corruption positions: {sorted(self.corruption_positions)}')
@@ -115,6 +119,7 @@ class _TestCaseBase():
         kwargs = {
             # 'skip_on_error': skip_on_error,
             'exp_return_value': exp_return_value,
+            **verify_kwargs,
         }
         if not with_callback:
             exp_exceptions = self.exp_exceptions
@@ -629,7 +634,9 @@ def test_verify_content_with_changed_file_size_and_no_skipping(mktestcase, piece
 #            skip_on_error=True,
 #            exp_return_value=False)
 
-def test_verify_content_with_multiple_error_types(mktestcase, piece_size, callback, filespecs):
+@pytest.mark.parametrize('read_kwargs', ({}, {'reuse_buffers': True}, {'use_mmap': True}, {'readers': 3}),
+                         ids=('new buffers', 'reused buffers', 'mmap', 'multiple readers'))
+def test_verify_content_with_multiple_error_types(read_kwargs, mktestcase, piece_size, callback, filespecs):
     display_filespecs(filespecs, piece_size)  # noqa: F405
     tc = mktestcase(filespecs, piece_size)
     # Introduce 2 or 3 errors in random order
@@ -639,4 +646,339 @@ def test_verify_content_with_multiple_error_types(mktestcase, piece_size, callba
         errorizer()
     tc.run(with_callback=callback['enabled'],
            # skip_on_error=random.choice((True, False)),
-           exp_return_value=False)
+           exp_return_value=False,
+           **read_kwargs)
+
+def test_verify_content_with_invalid_backend(generated_multifile_torrent, multifile_content):
+    with pytest.raises(ValueError) as excinfo:
+        generated_multifile_torrent.verify(multifile_content.path, backend='foo')
+    assert str(excinfo.value) == "Invalid backend: 'foo'"
+
+def test_verify_content_with_process_backend(create_dir):
+    content_path = create_dir('content',
+                              ('a', 123456),
+                              ('b', 234567))
+    torrent = torf.Torrent(content_path, piece_size=2**14)
+    torrent.generate(backend='process')
+    assert torrent.verify(content_path, backend='process') is True
+
+    with open(content_path / 'b', 'r+b') as f:
+        f.seek(200000)
+        byte = f.read(1)
+        f.seek(200000)
+        f.write(bytes([(byte[0] + 1) % 256]))
+    with pytest.raises(torf.VerifyContentError) as excinfo:
+        torrent.verify(content_path, backend='process')
+    assert excinfo.value.piece_index == (123456 + 200000) // 2**14
+
+def test_verify_content_with_bitfield(create_dir):
+    content_path = create_dir('content',
+                              ('a', 2**14 * 3),
+                              ('b', 2**14 * 2),
+                              ('c', 2**14 * 3 + 123))
+    torrent = torf.Torrent(content_path, piece_size=2**14)
+    torrent.generate()
+    torrent = torf.Torrent.read_stream(torrent.dump())
+    bitfield = torf.Bitfield(torrent.pieces)
+    assert torrent.verify(content_path, bitfield=bitfield) is True
+    assert list(bitfield) == [torf.Bitfield.OK] * 9
+
+    with open(content_path / 'a', 'r+b') as f:
+        f.seek(2**14 + 1)
+        f.write(b'x')
+    os.remove(content_path / 'b')
+    cb = mock.Mock(return_value=None)
+    assert torrent.verify(content_path, callback=cb, bitfield=bitfield) is False
+    assert list(bitfield) == [
+        torf.Bitfield.OK, torf.Bitfield.FAILED, torf.Bitfield.OK,
+        torf.Bitfield.MISSING, torf.Bitfield.MISSING,
+        torf.Bitfield.OK, torf.Bitfield.OK, torf.Bitfield.OK, torf.Bitfield.OK,
+    ]
+
+def test_verify_content_with_bitfield_of_wrong_size(generated_multifile_torrent, multifile_content):
+    bitfield = torf.Bitfield(generated_multifile_torrent.pieces + 1)
+    with pytest.raises(ValueError) as excinfo:
+        generated_multifile_torrent.verify(multifile_content.path, bitfield=bitfield)
+    assert str(excinfo.value) == (f'Expected bitfield with {generated_multifile_torrent.pieces} pieces, '
+                                  f'not {generated_multifile_torrent.pieces + 1}')
+
+def test_averify(create_dir):
+    content_path = create_dir('content',
+                              ('a', 2**14 * 3),
+                              ('b', 2**14 * 2 + 123))
+    torrent = torf.Torrent(content_path, piece_size=2**14)
+    torrent.generate()
+    torrent = torf.Torrent.read_stream(torrent.dump())
+
+    async def main():
+        job = torrent.averify(content_path, threads=1)
+        events = [event async for event in job]
+        return events, await job
+
+    events, result = asyncio.run(main())
+    assert result is True
+    assert [event[2:5] for event in events] == [(i + 1, 6, i) for i in range(6)]
+
+    with open(content_path / 'b', 'r+b') as f:
+        f.write(b'x')
+
+    async def main():
+        return await torrent.averify(content_path)
+
+    with pytest.raises(torf.VerifyContentError):
+        asyncio.run(main())
+
+    async def main():
+        job = torrent.averify(content_path)
+        events = [event async for event in job]
+        return events, await job
+
+    events, result = asyncio.run(main())
+    assert result is False
+    assert any(isinstance(event[-1], torf.VerifyContentError) for event in events)
+
+    os.remove(content_path / 'b')
+
+    async def main():
+        return await torrent.averify(content_path)
+
+    with pytest.raises(torf.ReadError):
+        asyncio.run(main())
+
+def test_iter_verify(create_dir):
+    content_path = create_dir('content',
+                              ('a', 2**14 * 3),
+                              ('b', 2**14 * 2 + 123))
+    torrent = torf.Torrent(content_path, piece_size=2**14)
+    torrent.generate()
+    torrent = torf.Torrent.read_stream(torrent.dump())
+
+    reports = list(torrent.iter_verify(content_path, batch_pieces=2))
+    assert reports[-1].pieces_done == reports[-1].pieces_total == 6
+    assert reports[-1].result is True
+    assert all(not progress.errors for progress in reports)
+
+    with open(content_path / 'a', 'r+b') as f:
+        f.seek(2**14 + 1)
+        f.write(b'x')
+    os.remove(content_path / 'b')
+    reports = list(torrent.iter_verify(content_path))
+    assert reports[-1].result is False
+    errors = [error for progress in reports for error in progress.errors]
+    assert {type(error) for error in errors} == {torf.VerifyContentError, torf.ReadError}
+
+@pytest.mark.parametrize(
+    argnames='kwargs, exp_pieces_total, exp_bytes_total',
+    argvalues=(
+        ({}, 6, 2**14 * 5 + 123),
+        ({'files': ['content/a']}, 3, 2**14 * 3),
+        ({'pieces': [1, 5]}, 2, 2**14 + 123),
+        ({'files': ['content/b'], 'pieces': [0]}, 4, 2**14 * 3 + 123),
+    ),
+)
+def test_iter_verify_with_selected_pieces(kwargs, exp_pieces_total, exp_bytes_total, create_dir):
+    content_path = create_dir('content',
+                              ('a', 2**14 * 3),
+                              ('b', 2**14 * 2 + 123))
+    torrent = torf.Torrent(content_path, piece_size=2**14)
+    torrent.generate()
+    torrent = torf.Torrent.read_stream(torrent.dump())
+
+    reports = list(torrent.iter_verify(content_path, **kwargs))
+    assert reports[-1].result is True
+    assert reports[-1].pieces_done == reports[-1].pieces_total == exp_pieces_total
+    assert reports[-1].bytes_done == reports[-1].bytes_total == exp_bytes_total
+
+def test_verify_content_with_stats(generated_multifile_torrent, multifile_content):
+    stats = torf.Stats()
+    assert generated_multifile_torrent.verify(multifile_content.path, stats=stats) is True
+    assert stats.bytes_read == generated_multifile_torrent.size
+    assert stats.pieces_read == generated_multifile_torrent.pieces
+    assert stats.seconds_elapsed > 0
+
+@pytest.mark.parametrize('read_kwargs', ({}, {'reuse_buffers': True}, {'readers': 2}, {'max_memory': 2**16}),
+                         ids=lambda v: ','.join(f'{k}={v}' for k, v in v.items()) or 'default')
+def test_verify_content_with_fail_fast_and_corruption(read_kwargs, create_dir):
+    content_path = create_dir('content', ('a', 2**14 * 500 + 123), ('b', 2**14 * 500))
+    torrent = torf.Torrent(content_path, piece_size=2**14)
+    torrent.generate()
+    torrent = torf.Torrent.read_stream(torrent.dump())
+    _corrupt(content_path / 'a', 2**14 * 3 + 1)
+
+    stats = torf.Stats()
+    bitfield = torf.Bitfield(torrent.pieces)
+    callback = mock.Mock(return_value=None)
+    assert torrent.verify(content_path, threads=1, callback=callback, bitfield=bitfield,
+                          stats=stats, fail_fast=True, **read_kwargs) is False
+    exceptions = [args[0][6] for args in callback.call_args_list if args[0][6] is not None]
+    assert [type(exception) for exception in exceptions] == [torf.VerifyContentError]
+    assert callback.call_args_list[-1][0][6] is exceptions[0]
+    assert bitfield.count(torf.Bitfield.FAILED) == 1
+    assert bitfield.count(torf.Bitfield.UNSEEN) > 0
+    assert stats.pieces_read < torrent.pieces / 2
+
+    with pytest.raises(torf.VerifyContentError):
+        torrent.verify(content_path, threads=1, fail_fast=True, **read_kwargs)
+
+def test_verify_content_with_fail_fast_and_missing_file(create_dir):
+    content_path = create_dir('content', ('a', 2**14 * 2 + 123), ('b', 2**14 * 500))
+    torrent = torf.Torrent(content_path, piece_size=2**14)
+    torrent.generate()
+    torrent = torf.Torrent.read_stream(torrent.dump())
+    os.remove(content_path / 'a')
+
+    stats = torf.Stats()
+    bitfield = torf.Bitfield(torrent.pieces)
+    callback = mock.Mock(return_value=None)
+    assert torrent.verify(content_path, threads=1, callback=callback, bitfield=bitfield,
+                          stats=stats, fail_fast=True) is False
+    exceptions = [args[0][6] for args in callback.call_args_list if args[0][6] is not None]
+    assert [type(exception) for exception in exceptions] == [torf.ReadError]
+    assert bitfield.count(torf.Bitfield.MISSING) == 1
+    assert stats.pieces_read < torrent.pieces / 2
+
+@pytest.mark.parametrize('readers', (None, 3), ids=lambda v: f'readers={v}')
+def test_verify_content_with_fail_fast_and_missing_middle_file(readers, create_dir):
+    content_path = create_dir('content',
+                              ('a', 2**14 * 5 + 123),
+                              ('b', 2**14 * 5),
+                              ('c', 2**14 * 5 + 7))
+    torrent = torf.Torrent(content_path, piece_size=2**14)
+    torrent.generate()
+    torrent = torf.Torrent.read_stream(torrent.dump())
+    os.remove(content_path / 'b')
+
+    # Pieces of "b" without the exception may be collected before the piece
+    # with the exception if they are read by different readers
+    for _ in range(10):
+        with pytest.raises(torf.ReadError, match=rf'^{re.escape(str(content_path / "b"))}: '):
+            torrent.verify(content_path, readers=readers, fail_fast=True)
+
+        callback = mock.Mock(return_value=None)
+        assert torrent.verify(content_path, readers=readers, callback=callback, fail_fast=True) is False
+        exceptions = [args[0][6] for args in callback.call_args_list if args[0][6] is not None]
+        assert [type(exception) for exception in exceptions] == [torf.ReadError]
+
+def _create_partial_verify_content(create_dir):
+    #  piece: 0     1     2     3     4     5     6     7     8     9
+    #  files: aaaaaaaaaaaaaaaaaaaabbbbbbbbbbbbcccccccccccccccccccccccc
+    content_path = create_dir('content',
+                              ('a', 2**14 * 3 + 100),
+                              ('b', 2**14 * 2),
+                              ('c', 2**14 * 4 + 5))
+    torrent = torf.Torrent(content_path, piece_size=2**14)
+    torrent.generate()
+    return torf.Torrent.read_stream(torrent.dump()), content_path
+
+def _corrupt(filepath, pos):
+    with open(filepath, 'r+b') as f:
+        f.seek(pos)
+        byte = f.read(1)
+        f.seek(pos)
+        f.write(bytes((byte[0] ^ 0xff,)))
+
+@pytest.mark.parametrize(
+    argnames='files, pieces, exp_piece_indexes',
+    argvalues=(
+        (['content/a'], None, [0, 1, 2, 3]),
+        (['content/b'], None, [3, 4, 5]),
+        ([Path('content', 'c')], None, [5, 6, 7, 8, 9]),
+        (['content/a', 'content/c'], None, [0, 1, 2, 3, 5, 6, 7, 8, 9]),
+        (None, range(2, 5), [2, 3, 4]),
+        (None, [9, 0], [0, 9]),
+        (['content/b'], [0], [0, 3, 4, 5]),
+        ([], None, []),
+    ),
+    ids=lambda v: repr(v),
+)
+def test_verify_content_with_files_and_pieces(files, pieces, exp_piece_indexes, create_dir):
+    torrent, content_path = _create_partial_verify_content(create_dir)
+    stats = torf.Stats()
+    bitfield = torf.Bitfield(torrent.pieces)
+    callback = mock.Mock(return_value=None)
+    assert torrent.verify(content_path, files=files, pieces=pieces, bitfield=bitfield,
+                          stats=stats, callback=callback) is True
+    assert list(bitfield.indexes(torf.Bitfield.OK)) == exp_piece_indexes
+    assert stats.pieces_read == len(exp_piece_indexes)
+    assert sorted(args[0][4] for args in callback.call_args_list) == exp_piece_indexes
+    assert [args[0][2:4] for args in callback.call_args_list] == [
+        (i, len(exp_piece_indexes)) for i in range(1, len(exp_piece_indexes) + 1)
+    ]
+
+def test_verify_content_with_files_ignores_corruption_in_other_files(create_dir):
+    torrent, content_path = _create_partial_verify_content(create_dir)
+    _corrupt(content_path / 'c', 2**14 * 2)
+    assert torrent.verify(content_path, files=['content/a', 'content/b']) is True
+    with pytest.raises(torf.VerifyContentError):
+        torrent.verify(content_path, files=['content/c'])
+
+def test_verify_content_with_unknown_file(create_dir):
+    torrent, content_path = _create_partial_verify_content(create_dir)
+    with pytest.raises(ValueError, match=r'^File not specified: content/d$'):
+        torrent.verify(content_path, files=['content/d'])
+
+@pytest.mark.parametrize('piece_index', (-1, 10))
+def test_verify_content_with_invalid_piece_index(piece_index, create_dir):
+    torrent, content_path = _create_partial_verify_content(create_dir)
+    with pytest.raises(ValueError, match=rf'^Piece index out of range \(0 - 9\): {piece_index}$'):
+        torrent.verify(content_path, pieces=[0, piece_index])
+
+def test_verify_files(create_dir):
+    torrent, content_path = _create_partial_verify_content(create_dir)
+    a, b, c = torrent.files
+    assert torrent.verify_files(content_path) == {a: True, b: True, c: True}
+
+    # Corrupt piece 4, which only contains bytes of "b"
+    _corrupt(content_path / 'b', 2**14 + 1)
+    assert torrent.verify_files(content_path) == {a: True, b: False, c: True}
+    assert torrent.verify_files(content_path, files=['content/a', 'content/c']) == {a: True, c: True}
+
+    # Corrupt piece 3, which is shared by "a" and "b"
+    _corrupt(content_path / 'a', 2**14 * 3 + 1)
+    assert torrent.verify_files(content_path, files=['content/a']) == {a: False}
+
+    # Errors are passed to callback
+    callback = mock.Mock(return_value=None)
+    os.remove(content_path / 'c')
+    assert torrent.verify_files(content_path, callback=callback) == {a: False, b: False, c: False}
+    exceptions = [args[0][6] for args in callback.call_args_list if args[0][6] is not None]
+    assert {type(exception) for exception in exceptions} == {torf.VerifyContentError, torf.ReadError}
+
+def test_verify_content_with_fastresume(create_dir, tmp_path):
+    torrent, content_path = _create_partial_verify_content(create_dir)
+    # Corrupt piece 4
+    _corrupt(content_path / 'b', 2**14 + 1)
+    fastresume_path = tmp_path / 'content.fastresume'
+    bitfield = torf.Bitfield(torrent.pieces)
+    assert torrent.verify(content_path, callback=mock.Mock(return_value=None), bitfield=bitfield,
+                          fastresume=fastresume_path) is False
+    assert bitfield.to_have_bytes() == bytes((0b11110111, 0b11000000))
+
+    fastresume = bencode.decode(fastresume_path.read_bytes())
+    assert fastresume[b'file-format'] == b'libtorrent resume file'
+    assert fastresume[b'file-version'] == 1
+    assert fastresume[b'info-hash'] == bytes.fromhex(torrent.infohash)
+    assert fastresume[b'name'] == b'content'
+    assert fastresume[b'save_path'] == str(content_path.parent).encode()
+    assert fastresume[b'pieces'] == b'\x01\x01\x01\x01\x00\x01\x01\x01\x01\x01'
+    assert fastresume[b'file_sizes'] == [
+        [os.stat(content_path / name).st_size, int(os.stat(content_path / name).st_mtime)]
+        for name in ('a', 'b', 'c')
+    ]
+    assert b'mapped_files' not in fastresume
+
+    # Content with a different name than the torrent
+    renamed_path = content_path.parent / 'renamed'
+    os.rename(content_path, renamed_path)
+    os.remove(renamed_path / 'c')
+    torrent.verify(renamed_path, callback=mock.Mock(return_value=None), fastresume=fastresume_path)
+    fastresume = bencode.decode(fastresume_path.read_bytes())
+    assert fastresume[b'pieces'] == b'\x01\x01\x01\x01\x00\x00\x00\x00\x00\x00'
+    assert fastresume[b'file_sizes'][2] == [0, 0]
+    assert fastresume[b'mapped_files'] == [b'renamed/a', b'renamed/b', b'renamed/c']
+
+def test_verify_content_with_unwritable_fastresume(create_dir, tmp_path):
+    torrent, content_path = _create_partial_verify_content(create_dir)
+    fastresume_path = tmp_path / 'nonexisting' / 'content.fastresume'
+    with pytest.raises(torf.WriteError, match=rf'^{fastresume_path}: No such file or directory$'):
+        torrent.verify(content_path, fastresume=fastresume_path)
@@ -0,0 +1,144 @@
+import math
+import os
+from unittest import mock
+
+import pytest
+
+import torf
+from torf._sample import get_sample
+
+
+@pytest.fixture
+def content(create_dir):
+    content_path = create_dir('content',
+                              ('a', 2**14 * 100),
+                              ('b', 2**14 * 300 + 123),
+                              ('c', 2**14 * 2))
+    torrent = torf.Torrent(content_path, piece_size=2**14)
+    torrent.generate()
+    return torf.Torrent.read_stream(torrent.dump()), content_path
+
+
+def test_get_sample_is_reproducible_with_seed(content):
+    torrent, _ = content
+    sample = get_sample(torrent, 50, seed=123)
+    assert sample == get_sample(torrent, 50, seed=123)
+    assert sample != get_sample(torrent, 50, seed=124)
+    assert sample == sorted(set(sample))
+    assert len(sample) == 50
+
+
+def test_get_sample_is_stratified_by_file(content):
+    torrent, _ = content
+    for seed in range(10):
+        sample = get_sample(torrent, 40, seed=seed)
+        assert len(sample) == 40
+        assert 9 <= len([i for i in sample if i < 100]) <= 11
+        assert 29 <= len([i for i in sample if 100 <= i <= 400]) <= 31
+
+
+def test_get_sample_with_sample_size_not_smaller_than_pieces(content):
+    torrent, _ = content
+    assert get_sample(torrent, torrent.pieces) == list(range(torrent.pieces))
+    assert get_sample(torrent, torrent.pieces + 1) == list(range(torrent.pieces))
+
+
+def test_verify_sample_successfully(content):
+    torrent, content_path = content
+    callback = mock.Mock(return_value=None)
+    result = torrent.verify_sample(content_path, sample_size=20, seed=0, threads=3, callback=callback)
+    assert result.success is True
+    assert result.pieces_checked == 20
+    assert result.pieces_total == torrent.pieces
+    assert result.piece_indexes == tuple(get_sample(torrent, 20, seed=0))
+    assert set(result.bitfield.indexes(torf.Bitfield.OK)) == set(result.piece_indexes)
+    assert result.bitfield.count(torf.Bitfield.UNSEEN) == torrent.pieces - 20
+    assert callback.call_count == 20
+    assert sorted(args[0][4] for args in callback.call_args_list) == list(result.piece_indexes)
+    assert [args[0][2:4] for args in callback.call_args_list] == [(i, 20) for i in range(1, 21)]
+    assert all(args[0][6] is None for args in callback.call_args_list)
+
+
+def test_verify_sample_with_corruption(content):
+    torrent, content_path = content
+    piece_index = get_sample(torrent, 20, seed=0)[5]
+    with open(content_path / 'b', 'r+b') as f:
+        pos = piece_index * 2**14 - 2**14 * 100 + 10
+        f.seek(pos)
+        byte = f.read(1)
+        f.seek(pos)
+        f.write(bytes((byte[0] ^ 0xff,)))
+
+    callback = mock.Mock(return_value=None)
+    result = torrent.verify_sample(content_path, sample_size=20, seed=0, callback=callback)
+    assert result.success is False
+    assert result.pieces_checked == 20
+    assert list(result.bitfield.indexes(torf.Bitfield.FAILED)) == [piece_index]
+    exceptions = [args[0][6] for args in callback.call_args_list if args[0][6] is not None]
+    assert len(exceptions) == 1
+    assert isinstance(exceptions[0], torf.VerifyContentError)
+    assert exceptions[0].piece_index == piece_index
+
+    with pytest.raises(torf.VerifyContentError):
+        torrent.verify_sample(content_path, sample_size=20, seed=0)
+
+
+def test_verify_sample_with_missing_file(content):
+    torrent, content_path = content
+    os.remove(content_path / 'a')
+    callback = mock.Mock(return_value=None)
+    result = torrent.verify_sample(content_path, sample_size=40, seed=0, callback=callback)
+    assert result.success is False
+    assert result.pieces_checked == 40
+    assert result.bitfield.count(torf.Bitfield.MISSING) == 10
+    exceptions = [args[0][6] for args in callback.call_args_list if args[0][6] is not None]
+    assert {type(exception) for exception in exceptions} == {torf.ReadError}
+
+    with pytest.raises(torf.ReadError):
+        torrent.verify_sample(content_path, sample_size=40, seed=0)
+
+
+def test_verify_sample_with_cancelling_callback(content):
+    torrent, content_path = content
+    callback = mock.Mock(return_value='cancel')
+    result = torrent.verify_sample(content_path, sample_size=20, threads=2, callback=callback)
+    assert callback.call_count == 1
+    assert result.pieces_checked == 1
+    assert result.success is False
+
+
+def test_verify_sample_with_invalid_sample_size(content):
+    torrent, content_path = content
+    with pytest.raises(ValueError, match=r'^sample_size must be at least 1: 0$'):
+        torrent.verify_sample(content_path, sample_size=0)
+
+
+def test_verify_sample_multifile_torrent_with_file(content, create_file):
+    torrent, _ = content
+    path = create_file('file', 'foo')
+    callback = mock.Mock(return_value=None)
+    result = torrent.verify_sample(path, callback=callback)
+    assert result.success is False
+    assert result.pieces_checked == 0
+    exception = callback.call_args_list[0][0][6]
+    assert isinstance(exception, torf.VerifyNotDirectoryError)
+
+
+def test_confidence(content):
+    torrent, _ = content
+    bitfield = torf.Bitfield(100)
+    for i in range(10):
+        bitfield[i] = torf.Bitfield.OK
+    result = torf.SampleResult(bitfield, range(10))
+    assert result.success is True
+    exp_confidence = 1 - math.comb(90, 10) / math.comb(100, 10)
+    assert result.confidence(0.1) == pytest.approx(exp_confidence)
+    assert result.confidence(0.001) == pytest.approx(0.1)
+    assert result.confidence(0.95) == 1.0
+    for fraction in (0, -0.1, 1.1):
+        with pytest.raises(ValueError, match=r'^corrupt_fraction must be greater than 0 and at most 1: '):
+            result.confidence(fraction)
+
+    bitfield[3] = torf.Bitfield.FAILED
+    assert result.success is False
+    assert result.confidence(0.1) == 0.0
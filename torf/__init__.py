@@ -20,8 +20,15 @@ Create and parse torrent files and magnet URIs
 
 __version__ = '4.3.0'
 
+from ._async import AsyncJob
+from ._batch import TorrentBatch
+from ._bitfield import Bitfield
 from ._errors import *
 from ._magnet import Magnet
+from ._progress import Progress
+from ._sample import SampleResult
+from ._stats import Stats
 from ._stream import TorrentFileStream
+from ._throttle import Throttle
 from ._torrent import Torrent
 from ._utils import File, Filepath
@@ -16,9 +16,16 @@
 
 __version__: str = ...
 
+from ._async import AsyncJob as AsyncJob
+from ._batch import TorrentBatch as TorrentBatch
+from ._bitfield import Bitfield as Bitfield
 from ._errors import *
 from ._magnet import Magnet as Magnet
+from ._progress import Progress as Progress
+from ._sample import SampleResult as SampleResult
+from ._stats import Stats as Stats
 from ._stream import TorrentFileStream as TorrentFileStream
+from ._throttle import Throttle as Throttle
 from ._torrent import Torrent as Torrent
 from ._utils import File as File
 from ._utils import Filepath as Filepath
@@ -0,0 +1,147 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import logging
+import threading
+
+_debug = logging.getLogger('torf').debug
+
+_DONE = object()
+
+
+class AsyncJob:
+    """
+    Run blocking method in a thread without blocking the :mod:`asyncio` event
+    loop
+
+    Awaiting the instance returns the method's return value or raises its
+    exception.
+
+    The instance is also an asynchronous iterator over the positional
+    arguments of each call to the method's `callback`. Iteration stops when
+    the method returns. After iterating, the instance must still be awaited to
+    get the return value.
+
+    If the instance is awaited without iterating, any exception that is passed
+    to `callback` is raised as if the method was called without `callback`.
+
+    If the task that awaits or iterates is cancelled, the method is stopped
+    by returning a non-``None`` value from its `callback`.
+
+    The instance is not a coroutine, so :func:`asyncio.create_task` doesn't
+    accept it. Use :func:`asyncio.ensure_future` to run it in a task.
+
+    :param method: Callable that accepts a `callback` keyword argument
+    :param kwargs: Any other keyword arguments for `method`
+    """
+
+    def __init__(self, method, **kwargs):
+        self._method = method
+        self._kwargs = kwargs
+        self._cancelled = threading.Event()
+        self._loop = None
+        self._future = None
+        self._events = None
+
+    def _start(self):
+        if self._future is None:
+            self._loop = asyncio.get_running_loop()
+            self._future = self._loop.create_future()
+            self._future.add_done_callback(self._finished)
+            # Use a dedicated thread instead of the loop's default executor,
+            # which would limit the number of concurrent jobs
+            thread = threading.Thread(
+                name=f'async-{self._method.__name__}',
+                target=self._run,
+                daemon=True,
+            )
+            thread.start()
+        return self._future
+
+    def _run(self):
+        # Called in the method's thread
+        try:
+            result = self._method(callback=self._callback, **self._kwargs)
+        except BaseException as e:
+            self._call_in_loop(self._set_result, None, e)
+        else:
+            self._call_in_loop(self._set_result, result, None)
+
+    def _call_in_loop(self, func, *args):
+        try:
+            self._loop.call_soon_threadsafe(func, *args)
+        except RuntimeError:
+            # Event loop was closed
+            pass
+
+    def _set_result(self, result, exception):
+        if not self._future.done():
+            if exception is not None:
+                self._future.set_exception(exception)
+            else:
+                self._future.set_result(result)
+
+    def _callback(self, *args):
+        # Called in the method's thread
+        if self._events is not None:
+            self._call_in_loop(self._events.put_nowait, args)
+        else:
+            # Nobody gets the reported exceptions, so raise them like the
+            # method does if there is no callback
+            for arg in args:
+                if isinstance(arg, BaseException):
+                    raise arg
+        if self._cancelled.is_set():
+            return 'cancel'
+
+    def _finished(self, future):
+        if self._events is not None:
+            self._events.put_nowait(_DONE)
+
+    def cancel(self):
+        """Stop the method as soon as possible"""
+        self._cancelled.set()
+
+    async def _wait(self):
+        future = self._start()
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            _debug(f'Cancelling {self._method.__qualname__}()')
+            self.cancel()
+            # Don't leave the thread running behind our back
+            await asyncio.wait((future,))
+            raise
+
+    def __await__(self):
+        return self._wait().__await__()
+
+    def __aiter__(self):
+        if self._future is not None:
+            raise RuntimeError('Iteration must start before awaiting')
+        elif self._events is None:
+            self._events = asyncio.Queue()
+        return self
+
+    async def __anext__(self):
+        self._start()
+        try:
+            event = await self._events.get()
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        if event is _DONE:
+            raise StopAsyncIteration
+        return event
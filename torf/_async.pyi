@@ -0,0 +1,14 @@
+from collections.abc import Generator
+from typing import Any, Callable, Generic, TypeVar
+
+from typing_extensions import Self
+
+_Event = TypeVar("_Event", bound=tuple[Any, ...])
+_Result = TypeVar("_Result")
+
+class AsyncJob(Generic[_Event, _Result]):
+    def __init__(self, method: Callable[..., _Result], **kwargs: Any) -> None: ...
+    def cancel(self) -> None: ...
+    def __await__(self) -> Generator[Any, None, _Result]: ...
+    def __aiter__(self) -> Self: ...
+    async def __anext__(self) -> _Event: ...
@@ -0,0 +1,213 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import queue
+import threading
+
+from . import _errors as error
+from . import _generate as generate
+from . import _utils as utils
+from ._stream import TorrentFileStream
+from ._torrent import NCORES
+
+_debug = logging.getLogger('torf').debug
+
+_STOP = object()
+
+
+class _Job:
+    """Piece hashes and state of one torrent in a :class:`TorrentBatch`"""
+
+    def __init__(self, torrent, completed):
+        self.torrent = torrent
+        self.hashes = bytearray(torrent.pieces * 20)
+        self.cancelled = False
+        self._completed = completed
+        self._pieces_left = torrent.pieces
+        self._finished = False
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return not self._finished and not self.cancelled
+
+    def add_hash(self, piece_index, piece_hash):
+        pos = piece_index * 20
+        self.hashes[pos:pos + 20] = piece_hash
+        with self._lock:
+            self._pieces_left -= 1
+            done = self._pieces_left == 0
+        if done:
+            self.finish()
+
+    def finish(self, exception=None):
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        if exception is None:
+            self.torrent.metainfo['info']['pieces'] = bytes(self.hashes)
+        self._completed.put((self.torrent, exception))
+
+
+class TorrentBatch:
+    """
+    Hash pieces of many torrents with long-lived threads
+
+    :meth:`.Torrent.generate` starts and stops reader and hasher threads for
+    each torrent, which can take longer than hashing a small torrent. A
+    :class:`TorrentBatch` starts its threads once and feeds the pieces of all
+    torrents through them until :meth:`close` is called. Threads that are
+    still running when the interpreter exits are killed.
+
+    :param int threads: How many threads to use for hashing pieces or ``None``
+        to use one thread per available CPU core
+    :param int readers: How many threads to use for reading pieces
+
+        Each reader reads one torrent at a time, so multiple readers can
+        read multiple torrents concurrently.
+
+    >>> with torf.TorrentBatch() as batch:
+    ...     for torrent, exception in batch.generate(torrents):
+    ...         if exception:
+    ...             print(f'{torrent.name}: {exception}')
+    ...         else:
+    ...             torrent.write(f'{torrent.name}.torrent')
+    """
+
+    def __init__(self, threads=None, readers=1):
+        self._closed = False
+        self._torrent_queue = queue.Queue()
+        self._piece_queue = queue.Queue(maxsize=(threads or NCORES) * 3)
+        # Threads are daemonic so a batch that is never closed doesn't keep the
+        # interpreter alive
+        self._readers = [
+            generate.Worker(name=f'batch-reader{i}', worker=self._read_torrents, daemon=True)
+            for i in range(1, max(1, readers) + 1)
+        ]
+        self._hashers = [
+            generate.Worker(name=f'batch-hasher{i}', worker=self._hash_pieces, daemon=True)
+            for i in range(1, (threads or NCORES) + 1)
+        ]
+
+    def generate(self, torrents):
+        """
+        Hash pieces of each torrent in `torrents`
+
+        Each torrent must have a :attr:`~.Torrent.path`. Its
+        :attr:`~.Torrent.metainfo`\\ ``['info']``\\ ``['pieces']`` is set when
+        all of its pieces are hashed.
+
+        Reading starts immediately in the background. This method may be
+        called again (e.g. from another thread) before the previous torrents
+        are finished.
+
+        :raises RuntimeError: if :meth:`close` was called or any torrent's
+            :attr:`~.Torrent.path` is ``None``
+        :raises PathError: if any torrent's :attr:`~.Torrent.path` contains
+            only empty files/directories
+
+        :return: Iterator over `(torrent, exception)` tuples in the order in
+            which the torrents are finished
+
+            `exception` is ``None`` if the torrent was successfully hashed or
+            a :class:`~.TorfError` (e.g. :class:`~.ReadError`) otherwise.
+
+            If iteration is stopped early, any unfinished torrents are
+            cancelled.
+        """
+        if self._closed:
+            raise RuntimeError('TorrentBatch is closed')
+
+        completed = queue.Queue()
+        jobs = []
+        for torrent in torrents:
+            if torrent.path is None:
+                raise RuntimeError('generate() called with no path specified')
+            elif sum(utils.real_size(fp) for fp in torrent.filepaths) < 1:
+                raise error.PathError(torrent.path, msg='Empty or all files excluded')
+            jobs.append(_Job(torrent, completed))
+
+        for job in jobs:
+            job.torrent._remove_v2_metainfo()
+            self._torrent_queue.put(job)
+        return self._iter_completed(jobs, completed)
+
+    @staticmethod
+    def _iter_completed(jobs, completed):
+        try:
+            for _ in range(len(jobs)):
+                yield completed.get()
+        finally:
+            for job in jobs:
+                job.cancelled = True
+
+    def _read_torrents(self):
+        while True:
+            job = self._torrent_queue.get()
+            if job is _STOP:
+                break
+            elif self._closed:
+                job.finish(RuntimeError('TorrentBatch is closed'))
+            elif job.active:
+                try:
+                    self._read_pieces(job)
+                except BaseException as e:
+                    _debug(f'{threading.current_thread().name}: Failed to read {job.torrent.path}: {e!r}')
+                    job.finish(e)
+
+    def _read_pieces(self, job):
+        with TorrentFileStream(job.torrent) as stream:
+            for piece_index, (piece, filepath, exceptions) in enumerate(stream.iter_pieces()):
+                if exceptions:
+                    raise exceptions[0]
+                elif not job.active:
+                    break
+                elif self._closed:
+                    raise RuntimeError('TorrentBatch is closed')
+                self._piece_queue.put((job, piece_index, piece))
+
+    def _hash_pieces(self):
+        while True:
+            item = self._piece_queue.get()
+            if item is _STOP:
+                break
+            job, piece_index, piece = item
+            if job.active:
+                job.add_hash(piece_index, generate.sha1_digest(piece))
+
+    def close(self):
+        """
+        Stop all threads
+
+        Torrents that are not finished yet are reported with a
+        :class:`RuntimeError`.
+        """
+        if not self._closed:
+            self._closed = True
+            for _ in self._readers:
+                self._torrent_queue.put(_STOP)
+            for reader in self._readers:
+                reader.join()
+            for _ in self._hashers:
+                self._piece_queue.put(_STOP)
+            for hasher in self._hashers:
+                hasher.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,15 @@
+from collections.abc import Iterable, Iterator
+from types import TracebackType
+
+from typing_extensions import Self
+
+from ._torrent import Torrent
+
+class TorrentBatch:
+    def __init__(self, threads: int | None = None, readers: int = 1) -> None: ...
+    def generate(self, torrents: Iterable[Torrent]) -> Iterator[tuple[Torrent, BaseException | None]]: ...
+    def close(self) -> None: ...
+    def __enter__(self) -> Self: ...
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None
+    ) -> None: ...
@@ -0,0 +1,172 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+
+
+class Bitfield:
+    """
+    State of each piece of a torrent
+
+    Each piece is in one of the states :attr:`UNSEEN`, :attr:`OK`,
+    :attr:`FAILED` or :attr:`MISSING`. States are stored with 2 bits per piece,
+    and getting or setting the state of a piece is O(1).
+
+    >>> bitfield = Bitfield(3)
+    >>> bitfield[1] = Bitfield.FAILED
+    >>> list(bitfield)
+    [0, 2, 0]
+    >>> bitfield.count(Bitfield.UNSEEN)
+    2
+
+    :param int pieces: Number of pieces
+    """
+
+    UNSEEN = 0
+    """Piece was not processed yet"""
+
+    OK = 1
+    """Piece was hashed successfully (and matches the expected hash when verifying)"""
+
+    FAILED = 2
+    """Piece was hashed, but it doesn't match the expected hash"""
+
+    MISSING = 3
+    """Piece could not be hashed, e.g. because a file is missing"""
+
+    _STATES = (UNSEEN, OK, FAILED, MISSING)
+
+    def __init__(self, pieces):
+        pieces = int(pieces)
+        if pieces < 0:
+            raise ValueError(f'Invalid number of pieces: {pieces}')
+        self._pieces = pieces
+        self._bytes = bytearray(math.ceil(pieces / 4))
+        self._counts = [pieces, 0, 0, 0]
+
+    def _check_index(self, index):
+        if not 0 <= index < self._pieces:
+            raise IndexError(f'Piece index out of range (0 - {self._pieces - 1}): {index}')
+
+    def __getitem__(self, index):
+        self._check_index(index)
+        byte_index, shift = divmod(index, 4)
+        return (self._bytes[byte_index] >> (shift * 2)) & 0b11
+
+    def __setitem__(self, index, state):
+        if state not in self._STATES:
+            raise ValueError(f'Invalid state: {state!r}')
+        old_state = self[index]
+        byte_index, shift = divmod(index, 4)
+        shift *= 2
+        self._bytes[byte_index] = (self._bytes[byte_index] & ~(0b11 << shift)) | (state << shift)
+        self._counts[old_state] -= 1
+        self._counts[state] += 1
+
+    def __len__(self):
+        return self._pieces
+
+    def __iter__(self):
+        for index in range(self._pieces):
+            yield self[index]
+
+    def __eq__(self, other):
+        if isinstance(other, type(self)):
+            return self._pieces == other._pieces and self._bytes == other._bytes
+        return NotImplemented
+
+    def __bytes__(self):
+        return bytes(self._bytes)
+
+    @classmethod
+    def from_bytes(cls, pieces, data):
+        """
+        Create instance from the return value of :class:`bytes` called with a
+        :class:`Bitfield` instance
+
+        :param int pieces: Number of pieces
+        :param bytes data: Piece states
+
+        :raise ValueError: if `data` is invalid
+        """
+        bitfield = cls(pieces)
+        if len(data) != len(bitfield._bytes):
+            raise ValueError(f'Expected {len(bitfield._bytes)} bytes for {pieces} pieces, not {len(data)}')
+        bitfield._bytes[:] = data
+        # Unused bits in the last byte must be UNSEEN
+        if pieces % 4 and bitfield._bytes[-1] >> ((pieces % 4) * 2):
+            raise ValueError(f'Invalid state after piece {pieces - 1}')
+        bitfield._counts = [0, 0, 0, 0]
+        for state in bitfield:
+            bitfield._counts[state] += 1
+        return bitfield
+
+    def to_have_bytes(self):
+        """
+        Return :attr:`OK` pieces as BitTorrent bitfield
+
+        This is the payload of the "bitfield" message from BEP 3 that clients
+        use to announce which pieces they have. Each piece is one bit, starting
+        with the most significant bit of the first byte. Bits of :attr:`OK`
+        pieces are set and all other bits are cleared.
+        """
+        have = bytearray(math.ceil(self._pieces / 8))
+        for index in self.indexes(self.OK):
+            have[index >> 3] |= 0x80 >> (index & 7)
+        return bytes(have)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self._pieces})'
+
+    def count(self, state):
+        """Return number of pieces in `state`"""
+        if state not in self._STATES:
+            raise ValueError(f'Invalid state: {state!r}')
+        return self._counts[state]
+
+    @property
+    def seen(self):
+        """Number of pieces that are not :attr:`UNSEEN`"""
+        return self._pieces - self._counts[self.UNSEEN]
+
+    def ranges(self, *states):
+        """Return list of contiguous :class:`range` objects of pieces in any of `states`"""
+        for state in states:
+            if state not in self._STATES:
+                raise ValueError(f'Invalid state: {state!r}')
+        ranges = []
+        start = None
+        for index, state in enumerate(self):
+            if state in states:
+                if start is None:
+                    start = index
+            elif start is not None:
+                ranges.append(range(start, index))
+                start = None
+        if start is not None:
+            ranges.append(range(start, self._pieces))
+        return ranges
+
+    def indexes(self, state):
+        """Iterate over the indexes of all pieces in `state`"""
+        if state not in self._STATES:
+            raise ValueError(f'Invalid state: {state!r}')
+        for index in range(self._pieces):
+            if self[index] == state:
+                yield index
+
+    def clear(self):
+        """Set all pieces to :attr:`UNSEEN`"""
+        self._bytes = bytearray(len(self._bytes))
+        self._counts = [self._pieces, 0, 0, 0]
@@ -0,0 +1,28 @@
+from collections.abc import Iterator
+from typing import Final, Literal
+
+from typing_extensions import Self
+
+_State = Literal[0, 1, 2, 3]
+
+class Bitfield:
+    UNSEEN: Final = 0
+    OK: Final = 1
+    FAILED: Final = 2
+    MISSING: Final = 3
+    def __init__(self, pieces: int) -> None: ...
+    def __getitem__(self, index: int) -> _State: ...
+    def __setitem__(self, index: int, state: _State) -> None: ...
+    def __len__(self) -> int: ...
+    def __iter__(self) -> Iterator[_State]: ...
+    def __eq__(self, other: object) -> bool: ...
+    def __bytes__(self) -> bytes: ...
+    @classmethod
+    def from_bytes(cls, pieces: int, data: bytes) -> Self: ...
+    def to_have_bytes(self) -> bytes: ...
+    def count(self, state: _State) -> int: ...
+    @property
+    def seen(self) -> int: ...
+    def ranges(self, *states: _State) -> list[range]: ...
+    def indexes(self, state: _State) -> Iterator[int]: ...
+    def clear(self) -> None: ...
@@ -0,0 +1,156 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import dbm
+import errno
+import logging
+import os
+from hashlib import sha1
+
+from . import _errors as error
+from ._bitfield import Bitfield
+
+_debug = logging.getLogger('torf').debug
+
+
+class PieceHashCache:
+    """
+    Persistent database of piece hashes
+
+    Each piece is identified by the piece size and the segments of files it
+    consists of. Each segment is identified by the file's device, inode, size
+    and modification time (see :func:`os.stat`) and the segment's offset and
+    length in the file. If any file changes, the pieces it is part of are no
+    longer found in the cache.
+
+    :param path: Path of the database file (see :mod:`dbm`)
+    :param torrent: :class:`~.Torrent` instance
+
+    :raise WriteError: if the database can't be opened
+    """
+
+    def __init__(self, path, torrent):
+        self._path = path
+        self._torrent = torrent
+        try:
+            self._db = dbm.open(str(path), 'c')
+        except OSError as e:
+            raise error.WriteError(e.errno or errno.EIO, str(path))
+        except dbm.error:
+            # File exists, but it is not a database
+            raise error.WriteError(errno.EINVAL, str(path))
+        self._keys = self._get_keys(torrent)
+
+    @staticmethod
+    def _get_identities(torrent):
+        # Return device, inode, size and modification time of each file or
+        # `None` if it doesn't exist or has the wrong size
+        identities = []
+        for file, filepath in zip(torrent.files, torrent.filepaths):
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                identities.append(None)
+            else:
+                if stat.st_size == file.size:
+                    identities.append((stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns))
+                else:
+                    identities.append(None)
+        return identities
+
+    @classmethod
+    def _get_keys(cls, torrent):
+        # Return cache key for each piece or `None` if it can't be cached
+        identities = cls._get_identities(torrent)
+        files = torrent.files
+        piece_size = torrent.piece_size
+        torrent_size = sum(file.size for file in files)
+        keys = []
+        file_index, file_start = 0, 0
+        for piece_index in range(torrent.pieces):
+            piece_start = piece_index * piece_size
+            piece_stop = min(piece_start + piece_size, torrent_size)
+
+            # Skip files that end before this piece
+            while file_start + files[file_index].size <= piece_start:
+                file_start += files[file_index].size
+                file_index += 1
+
+            # Find file segments in this piece
+            segments = []
+            cacheable = True
+            index, pos = file_index, file_start
+            while pos < piece_stop:
+                size = files[index].size
+                offset = max(piece_start - pos, 0)
+                length = min(piece_stop, pos + size) - pos - offset
+                if length > 0:
+                    identity = identities[index]
+                    if identity is None:
+                        cacheable = False
+                        break
+                    segments.append((*identity, offset, length))
+                pos += size
+                index += 1
+
+            if cacheable:
+                keys.append(sha1(repr((piece_size, segments)).encode('ascii')).digest())
+            else:
+                keys.append(None)
+        return keys
+
+    @property
+    def path(self):
+        """Path of the database file"""
+        return self._path
+
+    def lookup(self, bitfield, hashes):
+        """
+        Copy known piece hashes to `hashes`
+
+        Pieces are only copied if they are :attr:`~.Bitfield.UNSEEN` in
+        `bitfield` and they are marked as :attr:`~.Bitfield.OK` after copying.
+
+        :param bitfield: :class:`~.Bitfield` instance
+        :param hashes: :class:`bytearray` of concatenated piece hashes
+
+        :return: number of copied piece hashes
+        """
+        found = 0
+        for piece_index, key in enumerate(self._keys):
+            if key is not None and bitfield[piece_index] == Bitfield.UNSEEN:
+                piece_hash = self._db.get(key)
+                if piece_hash is not None and len(piece_hash) == 20:
+                    pos = piece_index * 20
+                    hashes[pos:pos + 20] = piece_hash
+                    bitfield[piece_index] = Bitfield.OK
+                    found += 1
+        _debug(f'Found {found} piece hashes in {self._path}')
+        return found
+
+    def add(self, piece_index, piece_hash):
+        """Store hash of the piece at `piece_index`"""
+        key = self._keys[piece_index]
+        if key is not None:
+            self._db[key] = piece_hash
+
+    def close(self):
+        """Close the database"""
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,19 @@
+from types import TracebackType
+
+from _typeshed import StrPath
+from typing_extensions import Self
+
+from ._bitfield import Bitfield
+from ._torrent import Torrent
+
+class PieceHashCache:
+    def __init__(self, path: StrPath, torrent: Torrent) -> None: ...
+    @property
+    def path(self) -> StrPath: ...
+    def lookup(self, bitfield: Bitfield, hashes: bytearray) -> int: ...
+    def add(self, piece_index: int, piece_hash: bytes) -> None: ...
+    def close(self) -> None: ...
+    def __enter__(self) -> Self: ...
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None
+    ) -> None: ...
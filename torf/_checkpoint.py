@@ -0,0 +1,145 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import os
+from hashlib import sha1
+from time import monotonic as time_monotonic
+
+import flatbencode as bencode
+
+from . import _errors as error
+from ._bitfield import Bitfield
+
+_debug = logging.getLogger('torf').debug
+
+
+class Checkpoint:
+    """
+    File that stores the progress of :meth:`~.Torrent.generate`
+
+    The file contains the state and hash of each piece and a fingerprint of
+    the content (relative file paths, file sizes, modification times and piece
+    size). If the content changes, the stored progress is ignored.
+
+    :param path: Path of the checkpoint file
+    :param torrent: :class:`~.Torrent` instance
+    :param float interval: Minimum number of seconds between writes by
+        :meth:`maybe_save`
+    """
+
+    def __init__(self, path, torrent, interval=10):
+        self._path = path
+        self._torrent = torrent
+        self._interval = interval
+        self._fingerprint = self._get_fingerprint(torrent)
+        self._prev_save_time = time_monotonic()
+
+    @staticmethod
+    def _get_fingerprint(torrent):
+        files = []
+        for file, filepath in zip(torrent.files, torrent.filepaths):
+            try:
+                mtime = os.stat(filepath).st_mtime_ns
+            except OSError:
+                mtime = -1
+            files.append([str(file).encode('utf-8', errors='replace'), file.size, mtime])
+        return sha1(bencode.encode([torrent.piece_size, files])).digest()
+
+    @property
+    def path(self):
+        """Path of the checkpoint file"""
+        return self._path
+
+    def load(self):
+        """
+        Read stored progress
+
+        :return: `(bitfield, hashes)` tuple or `None` if :attr:`path` doesn't
+            exist, can't be read or doesn't match the content
+
+            Only :attr:`~.Bitfield.OK` pieces in `bitfield` are relevant, and
+            `hashes` contains their concatenated piece hashes.
+        """
+        try:
+            with open(self._path, 'rb') as f:
+                checkpoint = bencode.decode(f.read())
+        except OSError as e:
+            _debug(f'Ignoring checkpoint {self._path}: {e!r}')
+            return None
+        except (bencode.DecodingError, ValueError):
+            _debug(f'Ignoring invalid checkpoint {self._path}')
+            return None
+
+        pieces = self._torrent.pieces
+        try:
+            fingerprint = checkpoint[b'fingerprint']
+            bitfield = Bitfield.from_bytes(pieces, checkpoint[b'bitfield'])
+            hashes = checkpoint[b'pieces']
+        except (KeyError, TypeError, ValueError):
+            _debug(f'Ignoring invalid checkpoint {self._path}')
+            return None
+
+        if fingerprint != self._fingerprint:
+            _debug(f'Ignoring checkpoint {self._path}: Content has changed')
+            return None
+        elif len(hashes) != pieces * 20:
+            _debug(f'Ignoring invalid checkpoint {self._path}')
+            return None
+
+        # Only successfully hashed pieces are useful
+        for state in (Bitfield.FAILED, Bitfield.MISSING):
+            for index in tuple(bitfield.indexes(state)):
+                bitfield[index] = Bitfield.UNSEEN
+
+        _debug(f'Loaded {bitfield.count(Bitfield.OK)} piece hashes from checkpoint {self._path}')
+        return bitfield, bytearray(hashes)
+
+    def save(self, bitfield, hashes):
+        """
+        Write piece states and hashes to :attr:`path`
+
+        :raise WriteError: if writing fails
+        """
+        checkpoint = {
+            b'bitfield': bytes(bitfield),
+            b'fingerprint': self._fingerprint,
+            b'pieces': bytes(hashes),
+        }
+        tmp_path = f'{self._path}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(bencode.encode(checkpoint))
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            raise error.WriteError(e.errno, self._path)
+        self._prev_save_time = time_monotonic()
+
+    def maybe_save(self, bitfield, hashes):
+        """Call :meth:`save` if `interval` seconds passed since the previous call"""
+        if time_monotonic() - self._prev_save_time >= self._interval:
+            self.save(bitfield, hashes)
+
+    def remove(self):
+        """
+        Remove :attr:`path`
+
+        :raise WriteError: if removing fails
+        """
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            raise error.WriteError(e.errno, self._path)
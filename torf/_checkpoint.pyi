@@ -0,0 +1,13 @@
+from _typeshed import StrPath
+
+from ._bitfield import Bitfield
+from ._torrent import Torrent
+
+class Checkpoint:
+    def __init__(self, path: StrPath, torrent: Torrent, interval: float = 10) -> None: ...
+    @property
+    def path(self) -> StrPath: ...
+    def load(self) -> tuple[Bitfield, bytearray] | None: ...
+    def save(self, bitfield: Bitfield, hashes: bytes | bytearray) -> None: ...
+    def maybe_save(self, bitfield: Bitfield, hashes: bytes | bytearray) -> None: ...
+    def remove(self) -> None: ...
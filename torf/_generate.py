@@ -14,14 +14,20 @@
 
 import errno
 import logging
+import math
+import multiprocessing
 import os
 import queue
+import struct
 import threading
-from hashlib import sha1
+from hashlib import md5, sha1
 from time import monotonic as time_monotonic
+from time import perf_counter, thread_time
 
 from . import _errors as errors
-from ._stream import TorrentFileStream
+from ._bitfield import Bitfield
+from ._stats import make_queue
+from ._stream import BufferPool, TorrentFileStream
 
 QUEUE_CLOSED = object()
 
@@ -42,13 +48,16 @@ class Worker:
     """
     :class:`threading.Thread` subclass that re-raises any exceptions from the
     thread when joined
+
+    If `daemon` is `True`, the thread doesn't prevent the interpreter from
+    exiting.
     """
 
-    def __init__(self, name, worker, start=True, fail_ok=False):
+    def __init__(self, name, worker, start=True, fail_ok=False, daemon=False):
         self._exception = None
         self._name = str(name)
         self._worker = worker
-        self._thread = threading.Thread(name=self._name, target=self._run_and_catch_exceptions)
+        self._thread = threading.Thread(name=self._name, target=self._run_and_catch_exceptions, daemon=daemon)
         if start:
             self.start(fail_ok=fail_ok)
 
@@ -94,45 +103,277 @@ class Reader(Worker):
     """
     :class:`Worker` subclass that reads files in pieces and pushes them to a
     queue
+
+    If `readers` is greater than 1, the pieces are split into that many
+    contiguous ranges that are read concurrently by separate threads. If
+    `readers` is `None`, there is one thread for each device (see
+    :meth:`~.TorrentFileStream.get_piece_ranges_by_device`).
+
+    `piece_ranges` is a sequence of :class:`range` objects of piece indexes to
+    read or `None` to read all pieces.
+
+    If `aligned` is `True`, each file starts with a new piece (see
+    :meth:`~.TorrentFileStream.iter_aligned_pieces`) and pieces are not grouped
+    by device.
+
+    `md5sums` is a :class:`Md5Sums` instance that gets each piece before it is
+    pushed to :attr:`piece_queue`. Pieces must be read in order, so `readers`
+    is ignored.
+
+    `stats` is a :class:`~.Stats` instance that gets the size and read time of
+    each piece and the blocking times of :attr:`piece_queue`. Its clock is
+    started here and stopped by :class:`Collector`.
+
+    `throttle` is a :class:`~.Throttle` instance that limits how fast pieces
+    are read.
+
+    `max_memory` is the maximum number of bytes of all pieces that are read,
+    queued or hashed at the same time (see :class:`MemoryBudget`). If it is
+    given, `queue_size` and `buffer_count` are adjusted to it.
+
+    Full pieces in holes of sparse files (see
+    :meth:`~.TorrentFileStream.get_zero_piece_ranges`) are not read. They are
+    pushed as :class:`ZeroPiece` instances instead, unless `aligned` is `True`
+    or `md5sums` is given.
     """
 
-    def __init__(self, *, torrent, queue_size, path=None):
+    def __init__(self, *, torrent, queue_size, path=None, buffer_count=0, use_mmap=False, readers=1,
+                 piece_ranges=None, aligned=False, md5sums=None, stats=None, throttle=None,
+                 max_memory=None):
         self._torrent = torrent
         self._path = path
-        self._piece_queue = queue.Queue(maxsize=queue_size)
+        self._use_mmap = use_mmap
+        self._aligned = aligned
+        self._md5sums = md5sums
+        self._skip_holes = not aligned and md5sums is None
+        self._zero_piece_ranges = ()
+        self._stats = stats
+        self._throttle = throttle
+        if stats is not None:
+            stats._start()
+        if max_memory is not None:
+            self._memory_budget = MemoryBudget(max_memory, torrent.piece_size)
+            # The budget limits the number of queued pieces
+            queue_size = 0
+            buffer_count = min(buffer_count, self._memory_budget.pieces)
+        else:
+            self._memory_budget = None
+        self._piece_queue = make_queue('piece_queue', maxsize=queue_size, stats=stats)
+        if buffer_count and not use_mmap:
+            self._buffer_pool = BufferPool(count=buffer_count, size=torrent.piece_size)
+        else:
+            self._buffer_pool = None
+        # Stream that is only used to find pieces; it lists the files only once
+        # for all streams of this reader
+        self._stream = TorrentFileStream(torrent, use_mmap=use_mmap)
+        if piece_ranges is None:
+            if aligned:
+                piece_ranges = (range(0, self._stream.aligned_pieces),)
+            else:
+                piece_ranges = (range(0, torrent.pieces),)
+        if md5sums is not None:
+            self._segments = self._get_segments(piece_ranges, 1)
+        elif readers is None:
+            if aligned or torrent.mode == 'singlefile':
+                self._segments = self._get_segments(piece_ranges, 1)
+            else:
+                self._segments = self._get_segments_by_device(self._stream, path, piece_ranges)
+        else:
+            self._segments = self._get_segments(piece_ranges, readers)
+        self._exceptions_reported = set()
+        self._exceptions_lock = threading.Lock()
         self._stop = False
         self._memory_error_timestamp = -1
         super().__init__(name='reader', worker=self._push_pieces)
 
+    @staticmethod
+    def _get_segments(piece_ranges, readers):
+        # Split `piece_ranges` into `readers` segments with roughly the same
+        # number of pieces
+        pieces_total = sum(len(piece_range) for piece_range in piece_ranges)
+        readers = max(1, min(readers, pieces_total))
+        segment_size, remainder = divmod(pieces_total, readers)
+        segments = []
+        piece_ranges = list(piece_ranges)
+        for i in range(readers):
+            pieces_wanted = segment_size + (1 if i < remainder else 0)
+            segment = []
+            while pieces_wanted > 0:
+                piece_range = piece_ranges.pop(0)
+                if len(piece_range) > pieces_wanted:
+                    # Put the rest of the range back for the next segment
+                    piece_ranges.insert(0, piece_range[pieces_wanted:])
+                    piece_range = piece_range[:pieces_wanted]
+                segment.append(piece_range)
+                pieces_wanted -= len(piece_range)
+            segments.append(tuple(segment))
+        return tuple(segments)
+
+    @staticmethod
+    def _get_segments_by_device(stream, path, piece_ranges):
+        # Read all pieces from the same device in one thread
+        ranges_by_device = stream.get_piece_ranges_by_device(path)
+        if len(ranges_by_device) <= 1:
+            return (tuple(piece_ranges),)
+        segments = []
+        for device_ranges in ranges_by_device.values():
+            segment = _intersect_ranges(device_ranges, piece_ranges)
+            if segment:
+                segments.append(tuple(segment))
+        if segments:
+            return tuple(segments)
+        else:
+            return (tuple(piece_ranges),)
+
     def _push_pieces(self):
-        stream = TorrentFileStream(self._torrent)
         try:
-            iter_pieces = stream.iter_pieces(self._path, oom_callback=self._handle_oom)
-            for piece_index, (piece, filepath, exceptions) in enumerate(iter_pieces):
-                # _debug(f'{_thread_name()}: Read #{piece_index}')
+            if self._skip_holes:
+                self._zero_piece_ranges = self._stream.get_zero_piece_ranges(self._path)
+                _debug(f'{_thread_name()}: Not reading zero pieces: {self._zero_piece_ranges}')
+
+            if len(self._segments) == 1:
+                self._push_segment(self._segments[0])
+            else:
+                segment_readers = [
+                    Worker(
+                        name=f'reader{i}',
+                        worker=lambda ranges=ranges: self._push_segment(ranges),
+                    )
+                    for i, ranges in enumerate(self._segments, start=1)
+                ]
+                # Wait for all readers before closing the piece queue and stop
+                # the other readers if one of them fails
+                exception = None
+                for segment_reader in segment_readers:
+                    try:
+                        segment_reader.join()
+                    except BaseException as e:
+                        if exception is None:
+                            exception = e
+                            self.stop()
+                if exception is not None:
+                    raise exception
+
+        finally:
+            self._piece_queue.put(QUEUE_CLOSED)
+            _debug(f'{_thread_name()}: Piece queue is now exhausted')
+
+    def _push_segment(self, ranges):
+        stream = TorrentFileStream.from_stream(self._stream)
+        iter_func = stream.iter_aligned_pieces if self._aligned else stream.iter_pieces
+        try:
+            for piece_range, is_zero in self._split_zero_pieces(ranges):
                 if self._stop:
-                    _debug(f'{_thread_name()}: Stopped reading')
                     break
-                elif exceptions:
-                    self._push_piece(piece_index=piece_index, filepath=filepath, exceptions=exceptions)
-                elif piece:
-                    self._push_piece(piece_index=piece_index, filepath=filepath, piece=piece)
+                elif is_zero:
+                    iter_pieces = self._iter_zero_pieces(stream, piece_range)
                 else:
-                    # `piece` is None because of missing file, and the exception
-                    # was already sent for the first `piece_index` of that file
-                    self._push_piece(piece_index=piece_index, filepath=filepath)
-
-                # _debug(f'{_thread_name()}: {self._piece_queue.qsize()} pieces queued')
+                    iter_pieces = iter_func(
+                        self._path,
+                        oom_callback=self._handle_oom,
+                        buffer_pool=self._buffer_pool,
+                        start=piece_range.start,
+                        stop=piece_range.stop,
+                    )
+                if self._stats is not None:
+                    iter_pieces = self._measure_reads(iter_pieces)
+                if self._memory_budget is not None:
+                    iter_pieces = self._budget_reads(iter_pieces)
+                self._push_range(iter_pieces, start=piece_range.start)
 
         except BaseException as e:
             _debug(f'{_thread_name()}: Exception while reading: {e!r}')
             raise
 
         finally:
-            self._piece_queue.put(QUEUE_CLOSED)
-            _debug(f'{_thread_name()}: Piece queue is now exhausted')
             stream.close()
 
+    def _split_zero_pieces(self, ranges):
+        # Yield `(piece_range, is_zero)` tuples that cover all `ranges`
+        for piece_range in ranges:
+            pos = piece_range.start
+            for zero_range in self._zero_piece_ranges:
+                start = max(pos, zero_range.start)
+                stop = min(piece_range.stop, zero_range.stop)
+                if start < stop:
+                    if pos < start:
+                        yield range(pos, start), False
+                    yield range(start, stop), True
+                    pos = stop
+            if pos < piece_range.stop:
+                yield range(pos, piece_range.stop), False
+
+    def _iter_zero_pieces(self, stream, piece_range):
+        # All pieces in `piece_range` are in the same file
+        filepath = stream.get_files_at_piece_index(piece_range.start, content_path=self._path)[0]
+        piece = ZeroPiece(self._torrent.piece_size)
+        for _ in piece_range:
+            yield (piece, filepath, ())
+
+    def _budget_reads(self, iter_pieces):
+        # Don't read the next piece before there is room for it in the budget.
+        # HasherPool releases the room after the piece is hashed.
+        while True:
+            if not self._memory_budget.acquire(is_stopped=self._is_stopped):
+                break
+            try:
+                item = next(iter_pieces)
+            except StopIteration:
+                self._memory_budget.release()
+                break
+            yield item
+
+    def _measure_reads(self, iter_pieces):
+        # Report how long it took to get each piece from `iter_pieces`
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iter_pieces)
+            except StopIteration:
+                break
+            piece = item[0]
+            if not isinstance(piece, ZeroPiece):
+                self._stats._add_read(len(piece) if piece else 0, perf_counter() - start)
+            yield item
+
+    def _push_range(self, iter_pieces, start):
+        for piece_index, (piece, filepath, exceptions) in enumerate(iter_pieces, start=start):
+            # _debug(f'{_thread_name()}: Read #{piece_index}')
+            if exceptions:
+                exceptions = self._get_unreported_exceptions(exceptions)
+
+            if self._stop:
+                _debug(f'{_thread_name()}: Stopped reading')
+                break
+            elif exceptions:
+                self._push_piece(piece_index=piece_index, filepath=filepath, exceptions=exceptions)
+            elif piece:
+                if self._md5sums is not None:
+                    self._md5sums.update(piece)
+                if self._throttle is not None and not isinstance(piece, ZeroPiece):
+                    self._throttle.consume(len(piece), is_stopped=self._is_stopped)
+                self._push_piece(piece_index=piece_index, filepath=filepath, piece=piece)
+            else:
+                # `piece` is None because of missing file, and the exception
+                # was already sent for the first `piece_index` of that file
+                self._push_piece(piece_index=piece_index, filepath=filepath)
+
+            # _debug(f'{_thread_name()}: {self._piece_queue.qsize()} pieces queued')
+
+    def _get_unreported_exceptions(self, exceptions):
+        # A missing file that spans multiple ranges is reported for each range,
+        # but we only want to report it once
+        if len(self._segments) == 1 and len(self._segments[0]) == 1 and not self._zero_piece_ranges:
+            return exceptions
+        with self._exceptions_lock:
+            unreported = []
+            for exception in exceptions:
+                key = (type(exception), str(exception))
+                if key not in self._exceptions_reported:
+                    self._exceptions_reported.add(key)
+                    unreported.append(exception)
+            return tuple(unreported)
+
     def _push_piece(self, *, piece_index, filepath, piece=None, exceptions=()):
         # _debug(f'{_thread_name()}: Pushing #{piece_index}: {filepath}: {_pretty_bytes(piece)}, {exceptions!r}')
         self._piece_queue.put((piece_index, filepath, piece, exceptions))
@@ -151,6 +392,9 @@ class Reader(Worker):
             else:
                 raise errors.ReadError(errno.ENOMEM, exception)
 
+    def _is_stopped(self):
+        return self._stop
+
     def stop(self):
         """Stop reading and close the piece queue"""
         if not self._stop:
@@ -165,18 +409,193 @@ class Reader(Worker):
         """
         return self._piece_queue
 
+    @property
+    def memory_budget(self):
+        """
+        :class:`MemoryBudget` that is acquired for each piece in
+        :attr:`piece_queue` or `None`
+
+        Each piece must be released after it is hashed.
+        """
+        return self._memory_budget
+
+    @property
+    def buffer_pool(self):
+        """
+        :class:`~.BufferPool` that pieces are read into or `None`
+
+        Pieces from :attr:`piece_queue` are :class:`memoryview` objects that
+        must be released back into the pool after they are hashed.
+        """
+        return self._buffer_pool
+
+
+class ZeroPiece:
+    """
+    Placeholder for a piece of `size` null bytes that was not read from disk
+
+    :class:`HasherPool` hashes null bytes only once for all instances of the
+    same size.
+    """
+
+    __slots__ = ('size',)
+
+    def __init__(self, size):
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.size!r})'
+
+
+class MemoryBudget:
+    """
+    Limit the number of bytes of pieces that exist at the same time
+
+    `max_memory` is divided into slots of `piece_size` bytes. At least one
+    slot is always available, even if `max_memory` is smaller than
+    `piece_size`.
+    """
+
+    def __init__(self, max_memory, piece_size):
+        self._pieces = max(1, max_memory // piece_size)
+        self._available = self._pieces
+        self._condition = threading.Condition()
+
+    @property
+    def pieces(self):
+        """Maximum number of pieces"""
+        return self._pieces
+
+    def acquire(self, is_stopped=None):
+        """
+        Block until a slot is available and take it
+
+        :param is_stopped: Callable that returns whether to stop waiting or
+            `None`
+
+        :return: `True` if a slot was taken, `False` if `is_stopped` returned
+            `True` first
+        """
+        with self._condition:
+            while self._available <= 0:
+                if is_stopped is not None and is_stopped():
+                    return False
+                # Wake up regularly to check `is_stopped`
+                self._condition.wait(0.1)
+            self._available -= 1
+            return True
+
+    def release(self):
+        """Return a slot"""
+        with self._condition:
+            self._available += 1
+            self._condition.notify()
+
+
+class Md5Sums:
+    """
+    Calculate the MD5 sum of each file in `torrent` from consecutive pieces
+
+    Pieces may be from the stream of concatenated files or from the stream of
+    file-aligned pieces (see :meth:`~.TorrentFileStream.iter_aligned_pieces`).
+    Either way, they contain the same bytes in the same order.
+    """
+
+    def __init__(self, torrent):
+        self._file_sizes = [file.size for file in torrent.files]
+        self._md5sums = []
+        self._md5 = md5()
+        self._file_pos = 0
+        self._finish_files()
+
+    def _finish_files(self):
+        # Finish the current file if we got all of its bytes and any empty
+        # files after it
+        while (len(self._md5sums) < len(self._file_sizes)
+               and self._file_pos >= self._file_sizes[len(self._md5sums)]):
+            self._md5sums.append(self._md5.hexdigest())
+            self._md5 = md5()
+            self._file_pos = 0
+
+    def update(self, piece):
+        """Feed the next piece"""
+        view = memoryview(piece)
+        pos = 0
+        while pos < len(view):
+            if len(self._md5sums) >= len(self._file_sizes):
+                raise RuntimeError('Got more bytes than expected')
+            remaining = self._file_sizes[len(self._md5sums)] - self._file_pos
+            chunk = view[pos:pos + remaining]
+            self._md5.update(chunk)
+            self._file_pos += len(chunk)
+            pos += len(chunk)
+            self._finish_files()
+
+    @property
+    def md5sums(self):
+        """
+        List of hexadecimal MD5 sums of all files or `None` if not all pieces
+        were passed to :meth:`update`
+        """
+        if len(self._md5sums) == len(self._file_sizes):
+            return list(self._md5sums)
+
+
+def _intersect_ranges(ranges_a, ranges_b):
+    # Return list of ranges that are in both `ranges_a` and `ranges_b`, which
+    # must be sorted and must not overlap
+    intersection = []
+    a, b = 0, 0
+    while a < len(ranges_a) and b < len(ranges_b):
+        start = max(ranges_a[a].start, ranges_b[b].start)
+        stop = min(ranges_a[a].stop, ranges_b[b].stop)
+        if start < stop:
+            intersection.append(range(start, stop))
+        if ranges_a[a].stop < ranges_b[b].stop:
+            a += 1
+        else:
+            b += 1
+    return intersection
+
+
+class HasherError:
+    """Exception from a hasher thread that is sent through the hash queue"""
+
+    __slots__ = ('exception',)
+
+    def __init__(self, exception):
+        self.exception = exception
+
 
 class HasherPool:
     """
     Wrapper around one or more :class:`Worker` instances that each read a piece
     from :attr:`Reader.piece_queue`, feed it to :func:`~.hashlib.sha1`, and push
     the resulting hash to :attr:`hash_queue`
+
+    `hash_func` is a callable that gets a piece and returns its hash. The
+    default is the SHA1 digest.
+
+    `stats` is a :class:`~.Stats` instance that gets the hashing time of each
+    piece and the blocking times of :attr:`hash_queue`.
+
+    `memory_budget` is :attr:`Reader.memory_budget`.
     """
 
-    def __init__(self, hasher_threads, piece_queue):
+    def __init__(self, hasher_threads, piece_queue, buffer_pool=None, hash_func=None, stats=None,
+                 memory_budget=None):
         self._piece_queue = piece_queue
-        self._hash_queue = queue.Queue()
+        self._buffer_pool = buffer_pool
+        self._memory_budget = memory_budget
+        self._hash_func = hash_func if hash_func is not None else sha1_digest
+        self._stats = stats
+        self._zero_piece_hashes = {}
+        self._hash_queue = make_queue('hash_queue', stats=stats)
         self._finalize_event = threading.Event()
+        self._discard = False
 
         # Janitor takes care of closing the hash queue, removing idle hashers, etc
         self._janitor = Worker(
@@ -217,12 +636,13 @@ class HasherPool:
     def _hasher_thread(self, is_vital=True):
         piece_queue = self._piece_queue
         handle_piece = self._handle_piece
+        exception = None
         while True:
             # _debug(f'{_thread_name()}: Waiting for next task')
             try:
                 task = piece_queue.get(timeout=0.5)
             except queue.Empty:
-                if not is_vital:
+                if not is_vital and exception is None:
                     _debug(f'{_thread_name()}: I am bored, byeee!')
                     break
                 else:
@@ -239,15 +659,44 @@ class HasherPool:
                     self._finalize_event.set()
                     break
                 else:
-                    handle_piece(*task)
+                    try:
+                        if self._discard or exception is not None:
+                            self._discard_piece(task[2])
+                        else:
+                            handle_piece(*task)
+                    except BaseException as e:
+                        # Tell Collector to stop the Reader, but keep draining
+                        # piece_queue so the Reader doesn't block forever if
+                        # all hashers failed. The exception is raised when
+                        # this thread terminates so the janitor doesn't prune
+                        # us and join() re-raises it.
+                        _debug(f'{_thread_name()}: Failed to hash #{task[0]}: {e!r}')
+                        exception = e
+                        self._hash_queue.put(HasherError(e))
+                        self._discard_piece(task[2])
+                    finally:
+                        if self._memory_budget is not None:
+                            self._memory_budget.release()
+
+        if exception is not None:
+            raise exception
 
     def _handle_piece(self, piece_index, filepath, piece, exceptions):
         if exceptions:
             # _debug(f'{_thread_name()}: Forwarding exceptions for #{piece_index}: {exceptions!r}')
             self._hash_queue.put((piece_index, filepath, None, exceptions))
 
+        elif isinstance(piece, ZeroPiece):
+            self._hash_queue.put((piece_index, filepath, self._hash_zero_piece(len(piece)), ()))
+
         elif piece:
-            piece_hash = sha1(piece).digest()
+            if self._stats is not None:
+                piece_hash, seconds = self._hash_piece_timed(piece)
+                self._stats._add_hash(_thread_name(), seconds)
+            else:
+                piece_hash = self._hash_piece(piece)
+            if self._buffer_pool is not None:
+                self._buffer_pool.release(piece)
             # _debug(f'{_thread_name()}: Hashed #{piece_index}: '
             #        f'{_pretty_bytes(piece)} [{len(piece)} bytes] -> {piece_hash}')
             self._hash_queue.put((piece_index, filepath, piece_hash, ()))
@@ -256,6 +705,26 @@ class HasherPool:
             # _debug(f'{_thread_name()}: Nothing to hash for #{piece_index}: {piece!r}')
             self._hash_queue.put((piece_index, filepath, None, ()))
 
+    def _discard_piece(self, piece):
+        if self._buffer_pool is not None and piece and not isinstance(piece, ZeroPiece):
+            self._buffer_pool.release(piece)
+
+    def _hash_piece(self, piece):
+        return self._hash_func(piece)
+
+    def _hash_piece_timed(self, piece):
+        # Return piece hash and CPU time spent hashing it
+        start = thread_time()
+        piece_hash = self._hash_piece(piece)
+        return piece_hash, thread_time() - start
+
+    def _hash_zero_piece(self, size):
+        # Multiple threads may hash the same size, but that's harmless
+        piece_hash = self._zero_piece_hashes.get(size)
+        if piece_hash is None:
+            piece_hash = self._zero_piece_hashes[size] = self._hash_piece(bytes(size))
+        return piece_hash
+
     def _janitor_thread(self):
         while True:
             _debug(f'{_thread_name()}: Waiting for finalize event')
@@ -267,9 +736,10 @@ class HasherPool:
                 break
 
             else:
-                # Remove terminated idle hashers
+                # Remove terminated idle hashers, but keep failed hashers so
+                # join() can raise their exception
                 for hasher in tuple(self._hashers):
-                    if not hasher.is_running:
+                    if not hasher.is_running and hasher.exception is None:
                         _debug(f'{_thread_name()}: Pruning {hasher.name}')
                         self._hashers.remove(hasher)
 
@@ -282,6 +752,15 @@ class HasherPool:
                 _debug(f'{_thread_name()}: All hashers terminated')
                 break
 
+    def discard(self):
+        """
+        Stop hashing and drop all pieces from :attr:`Reader.piece_queue`
+        without pushing anything to :attr:`hash_queue`
+
+        Threads keep running until the piece queue is closed.
+        """
+        self._discard = True
+
     def join(self):
         """Block until all threads have terminated"""
         for hasher in self._hashers:
@@ -299,27 +778,277 @@ class HasherPool:
         return self._hash_queue
 
 
+class ProcessHasherPool(HasherPool):
+    """
+    :class:`HasherPool` subclass that offloads SHA1 calculation to worker
+    processes
+
+    Each hasher thread owns one worker process and a shared memory buffer that
+    can hold one piece. The hasher thread copies the piece into the buffer and
+    only sends its length to the worker process, which sends back the piece
+    hash. Pieces are never pickled and hasher threads don't hold the GIL while
+    they wait for the worker process.
+    """
+
+    def __init__(self, hasher_threads, piece_queue, piece_size, buffer_pool=None, hash_func=None, stats=None,
+                 memory_budget=None):
+        self._piece_size = piece_size
+        self._local = threading.local()
+        super().__init__(hasher_threads=hasher_threads, piece_queue=piece_queue,
+                         buffer_pool=buffer_pool, hash_func=hash_func, stats=stats,
+                         memory_budget=memory_budget)
+
+    def _hasher_thread(self, is_vital=True):
+        # If the worker process can't be started, the exception is raised by
+        # the first piece so it is handled like any other hashing error
+        self._local.process = self._local.exception = None
+        try:
+            self._local.process = _HashProcess(buffer_size=self._piece_size, hash_func=self._hash_func)
+        except Exception as e:
+            self._local.exception = e
+        try:
+            super()._hasher_thread(is_vital=is_vital)
+        finally:
+            if self._local.process is not None:
+                self._local.process.close()
+
+    def _hash_piece(self, piece):
+        return self._hash_piece_timed(piece)[0]
+
+    def _hash_piece_timed(self, piece):
+        # Measuring CPU time in this thread would only measure waiting for the
+        # worker process, which measures its own CPU time instead
+        if self._local.exception is not None:
+            raise self._local.exception
+        return self._local.process.hash(piece)
+
+
+def _get_mp_context():
+    # Forking a multithreaded process may deadlock the child, so we prefer a
+    # fork server and fall back to spawning on platforms that don't have one
+    try:
+        return multiprocessing.get_context('forkserver')
+    except ValueError:
+        return multiprocessing.get_context('spawn')
+
+
+class _HashProcess:
+    """
+    Worker process that hashes pieces from a shared memory buffer
+
+    `hash_func` must be picklable.
+    """
+
+    def __init__(self, buffer_size, hash_func=None):
+        context = _get_mp_context()
+        self._buffer = context.RawArray('B', buffer_size)
+        self._view = memoryview(self._buffer).cast('B')
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(
+            name=f'{_thread_name()}-process',
+            target=_hash_process,
+            args=(child_connection, self._buffer, hash_func or sha1_digest),
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+        _debug(f'{_thread_name()}: Started {self._process.name} [{self._process.pid}]')
+
+    def hash(self, piece):
+        """
+        Copy `piece` into the shared buffer and return its hash and the CPU
+        time the worker process spent hashing it
+
+        :raise RuntimeError: if the worker process died
+        """
+        length = len(piece)
+        self._view[:length] = piece
+        try:
+            self._connection.send(length)
+            data = self._connection.recv_bytes()
+            return data[:-_CPU_TIME.size], _CPU_TIME.unpack(data[-_CPU_TIME.size:])[0]
+        except (EOFError, OSError):
+            self._process.join()
+            raise RuntimeError(f'{self._process.name} terminated unexpectedly '
+                               f'with exit code {self._process.exitcode}')
+
+    def close(self):
+        """Tell the worker process to terminate and wait for it"""
+        try:
+            self._connection.send(None)
+        except OSError:
+            # Worker process is already dead
+            pass
+        self._process.join()
+        self._connection.close()
+        _debug(f'{_thread_name()}: Terminated {self._process.name} [{self._process.pid}]')
+
+
+# CPU time that is appended to each hash from the worker process
+_CPU_TIME = struct.Struct('d')
+
+def _hash_process(connection, buffer, hash_func):
+    # Main function of worker process
+    view = memoryview(buffer).cast('B')
+    while True:
+        length = connection.recv()
+        if length is None:
+            break
+        else:
+            start = thread_time()
+            piece_hash = hash_func(view[:length])
+            connection.send_bytes(piece_hash + _CPU_TIME.pack(thread_time() - start))
+
+
+def sha1_digest(piece):
+    """Return SHA1 digest of `piece`"""
+    return sha1(piece).digest()
+
+
+class SplittingHasher:
+    """
+    Callable that splits a piece into smaller pieces and returns their
+    concatenated SHA1 digests
+
+    This allows hashing the same content for multiple piece sizes while reading
+    it only once in pieces of `piece_size` bytes.
+
+    The return value contains one group of digests for each of `piece_sizes`,
+    which must evenly divide `piece_size`. Each group is padded with null bytes
+    to its length for a full piece so that all return values are
+    :attr:`hash_size` bytes long.
+    """
+
+    def __init__(self, piece_size, piece_sizes):
+        for size in piece_sizes:
+            if size <= 0 or piece_size % size != 0:
+                raise ValueError(f'Piece size {size} does not divide {piece_size}')
+        self._piece_sizes = tuple(piece_sizes)
+        self._group_sizes = tuple(piece_size // size * 20 for size in self._piece_sizes)
+
+    @property
+    def hash_size(self):
+        """Length of each return value"""
+        return sum(self._group_sizes)
+
+    def __call__(self, piece):
+        view = memoryview(piece)
+        length = len(view)
+        groups = []
+        for size, group_size in zip(self._piece_sizes, self._group_sizes):
+            group = b''.join(
+                sha1(view[pos:pos + size]).digest()
+                for pos in range(0, length, size)
+            )
+            groups.append(group.ljust(group_size, b'\0'))
+        return b''.join(groups)
+
+    def split(self, hashes, size):
+        """
+        Return concatenated SHA1 digests for each piece size
+
+        :param hashes: Concatenated return values of all pieces
+        :param int size: Total number of bytes in all pieces
+        """
+        hash_size = self.hash_size
+        split_hashes = []
+        group_start = 0
+        for piece_size, group_size in zip(self._piece_sizes, self._group_sizes):
+            group_end = group_start + group_size
+            split_hashes.append(b''.join(
+                hashes[pos + group_start:pos + group_end]
+                for pos in range(0, len(hashes), hash_size)
+            )[:math.ceil(size / piece_size) * 20])
+            group_start = group_end
+        return split_hashes
+
+
+BACKENDS = ('thread', 'process')
+
+def get_hasher_pool(backend, *, hasher_threads, reader, piece_size, hash_func=None, stats=None):
+    """
+    Return :class:`HasherPool` or :class:`ProcessHasherPool` instance that
+    hashes pieces from `reader`
+
+    :param backend: ``"thread"`` or ``"process"``
+
+    :raise ValueError: if `backend` is not known
+    """
+    if backend == 'thread':
+        return HasherPool(hasher_threads=hasher_threads, piece_queue=reader.piece_queue,
+                          buffer_pool=reader.buffer_pool, hash_func=hash_func, stats=stats,
+                          memory_budget=reader.memory_budget)
+    elif backend == 'process':
+        return ProcessHasherPool(hasher_threads=hasher_threads, piece_queue=reader.piece_queue,
+                                 piece_size=piece_size, buffer_pool=reader.buffer_pool,
+                                 hash_func=hash_func, stats=stats,
+                                 memory_budget=reader.memory_budget)
+    else:
+        raise ValueError(f'Invalid backend: {backend!r}')
+
+
 class Collector:
     """
     Consume items from :attr:`HasherPool.hash_queue` and ensure proper
     termination of all threads if anything goes wrong or the user cancels the
     operation
+
+    `bitfield` and `hashes` may be provided with the states and hashes of pieces
+    that are already known. Those pieces must not be read by `reader`.
+
+    `pieces_total` is the number of pieces that are reported as total to
+    `callback`. It defaults to the length of `bitfield` and must be given if
+    `reader` doesn't read all of the pieces that are not known yet.
+
+    `checkpoint` is a :class:`~.Checkpoint` instance that is updated regularly
+    and when collecting is finished.
+
+    `cache` is a :class:`~.PieceHashCache` instance that gets each
+    successfully hashed piece.
+
+    `hash_size` is the length of each piece hash (see `hash_func` argument of
+    :class:`HasherPool`).
+
+    `stats` is a :class:`~.Stats` instance that gets the time spent in
+    `callback`. Its clock is stopped when collecting is finished.
+
+    If `fail_fast` is `True`, collecting stops after the first piece that is
+    :attr:`~.Bitfield.FAILED` or that is :attr:`~.Bitfield.MISSING` and comes
+    with exceptions. Pieces that are already read are dropped without hashing
+    them.
+
+    `batch_pieces` is the number of pieces between calls to `callback` or
+    `None` to call it for every piece. Pieces with exceptions, failed pieces
+    and the final piece are always reported.
     """
 
-    def __init__(self, torrent, reader, hashers, callback=None):
+    def __init__(self, torrent, reader, hashers, callback=None, bitfield=None, exp_hashes=None,
+                 hashes=None, checkpoint=None, cache=None, hash_size=20, stats=None, fail_fast=False,
+                 pieces_total=None, batch_pieces=None):
         self._reader = reader
         self._hashers = hashers
+        self._fail_fast = fail_fast
+        self._failed = False
+        self._stats = stats
+        if callback is not None and stats is not None:
+            callback = self._measure_callback(callback)
         self._callback = callback
-        self._hashes_unsorted = []
-        self._pieces_seen = []
-        self._pieces_total = torrent.pieces
+        self._bitfield = bitfield if bitfield is not None else Bitfield(torrent.pieces)
+        self._pieces_total = pieces_total if pieces_total is not None else len(self._bitfield)
+        self._hash_size = hash_size
+        self._hashes = hashes if hashes is not None else bytearray(len(self._bitfield) * hash_size)
+        self._exp_hashes = exp_hashes
+        self._checkpoint = checkpoint
+        self._cache = cache
+        self._batch_pieces = batch_pieces
+        self._reported = 0
 
     def collect(self):
         """
         Read piece hashes from :attr:`HasherPool.hash_queue`
 
-        When this method returns, :attr:`hashes` is an ordered sequence of
-        collected piece hashes.
+        When this method returns, :attr:`hashes` contains the concatenated
+        piece hashes.
 
         Exceptions from :class:`Reader`, :class:`HasherPool` or the provided
         callback are raised after all threads are terminated and joined.
@@ -334,15 +1063,22 @@ class Collector:
                 # _debug(f'{_thread_name()}: Got task: {task}')
                 if task is QUEUE_CLOSED:
                     break
+                elif isinstance(task, HasherError):
+                    raise task.exception
                 else:
                     self._collect(*task)
+                    if self._failed:
+                        _debug(f'{_thread_name()}: Failing fast at piece #{task[0]}')
+                        self._cancel()
+                        break
 
         except BaseException as e:
             _debug(f'{_thread_name()}: Exception while dequeueing piece hashes: {e!r}')
             self._cancel()
+            self._finalize(exception=e)
             raise
 
-        finally:
+        else:
             self._finalize()
 
         return self.hashes
@@ -350,13 +1086,29 @@ class Collector:
     def _collect(self, piece_index, filepath, piece_hash, exceptions):
         # _debug(f'{_thread_name()}: Collecting #{piece_index}: {_pretty_bytes(piece_hash)}, {exceptions}')
 
-        # Remember which pieces where hashed to count them and for sanity checking
-        assert piece_index not in self._pieces_seen
-        self._pieces_seen.append(piece_index)
+        # Remember the state of each piece to count them and for sanity checking
+        bitfield = self._bitfield
+        assert bitfield[piece_index] == Bitfield.UNSEEN
+        if exceptions or not piece_hash:
+            bitfield[piece_index] = Bitfield.MISSING
+            # A missing file is only reported once, and that piece may be read
+            # by another reader and arrive later
+            self._failed = self._fail_fast and bool(exceptions)
+        else:
+            # Collect piece
+            hash_size = self._hash_size
+            pos = piece_index * hash_size
+            self._hashes[pos:pos + hash_size] = piece_hash
+            if self._exp_hashes is not None and piece_hash != self._exp_hashes[pos:pos + hash_size]:
+                bitfield[piece_index] = Bitfield.FAILED
+                self._failed = self._fail_fast
+            else:
+                bitfield[piece_index] = Bitfield.OK
+                if self._cache is not None:
+                    self._cache.add(piece_index, piece_hash)
 
-        # Collect piece
-        if not exceptions and piece_hash:
-            self._hashes_unsorted.append((piece_index, piece_hash))
+        if self._checkpoint is not None:
+            self._checkpoint.maybe_save(bitfield, self._hashes)
 
         # If there is no callback, raise first exception
         if exceptions and not self._callback:
@@ -364,14 +1116,33 @@ class Collector:
 
         # Report progress/exceptions and allow callback to cancel
         if self._callback:
-            # _debug(f'{_thread_name()}: Collector callback: {self._callback}')
-            maybe_cancel = self._callback(
-                piece_index, len(self._pieces_seen), self._pieces_total,
-                filepath, piece_hash, exceptions,
-            )
-            # _debug(f'{_thread_name()}: Collector callback return value: {maybe_cancel}')
-            if maybe_cancel is not None:
-                self._cancel()
+            pieces_done = bitfield.seen
+            if (
+                self._batch_pieces is None
+                or exceptions
+                or bitfield[piece_index] == Bitfield.FAILED
+                or pieces_done - self._reported >= self._batch_pieces
+                or pieces_done >= self._pieces_total
+            ):
+                self._reported = pieces_done
+                # _debug(f'{_thread_name()}: Collector callback: {self._callback}')
+                maybe_cancel = self._callback(
+                    piece_index, pieces_done, self._pieces_total,
+                    filepath, piece_hash, exceptions,
+                )
+                # _debug(f'{_thread_name()}: Collector callback return value: {maybe_cancel}')
+                if maybe_cancel is not None:
+                    self._cancel()
+
+    def _measure_callback(self, callback):
+        def measured_callback(*args):
+            start = perf_counter()
+            try:
+                return callback(*args)
+            finally:
+                self._stats._add_callback(perf_counter() - start)
+
+        return measured_callback
 
     def _cancel(self):
         # NOTE: We don't need to stop HasherPool or Collector.collect() because
@@ -379,18 +1150,46 @@ class Collector:
         #       They will process the pieces in the queue, but that shouldn't
         #       take long unless the Reader's queue size is too big.
         self._reader.stop()
+        if self._fail_fast:
+            self._hashers.discard()
 
-    def _finalize(self):
+    def _finalize(self, exception=None):
+        # `exception` is being raised by collect() and must not be replaced by
+        # a failure to save the checkpoint
         _debug(f'{_thread_name()}: Joining {self._reader}')
         self._reader.join()
         _debug(f'{_thread_name()}: Joining {self._hashers}')
         self._hashers.join()
         _debug(f'{_thread_name()}: hash_queue has {self._hashers.hash_queue.qsize()} items left')
+        if self._stats is not None:
+            self._stats._stop()
+        if self._checkpoint is not None:
+            try:
+                self._checkpoint.save(self._bitfield, self._hashes)
+            except Exception as e:
+                if exception is None:
+                    raise
+                _debug(f'{_thread_name()}: Failed to save checkpoint while raising {exception!r}: {e!r}')
+
+    @property
+    def bitfield(self):
+        """
+        :class:`~.Bitfield` with the state of each piece
+
+        If `exp_hashes` (concatenated expected piece hashes) is given, pieces
+        with a different hash are :attr:`~.Bitfield.FAILED`.
+        """
+        return self._bitfield
 
     @property
     def hashes(self):
-        """Ordered sequence of piece hashes"""
-        return tuple(hash for index, hash in sorted(self._hashes_unsorted))
+        """
+        :class:`bytearray` of concatenated piece hashes
+
+        Pieces that were not hashed (see :attr:`bitfield`) are filled with null
+        bytes.
+        """
+        return self._hashes
 
 
 class _IntervaledCallback:
@@ -404,6 +1203,9 @@ class _IntervaledCallback:
         self._prev_call_time = -1
 
     def __call__(self, *args, force=False):
+        if self._interval <= 0:
+            # Don't bother with the clock if every call is passed through
+            return self._callback(*args)
         now = time_monotonic()
         diff = now - self._prev_call_time
         # _debug(f'{_thread_name()}: Callback? {force=} or {diff=} >= {self._interval=}')
@@ -413,6 +1215,17 @@ class _IntervaledCallback:
             return self._callback(*args)
 
 
+class BatchingCallback:
+    """
+    Base class for callbacks that only want to be called every
+    :attr:`batch_pieces` pieces and for errors
+    """
+
+    @property
+    def batch_pieces(self):
+        raise NotImplementedError('You must implement this property!')
+
+
 class _TranslatingCallback:
     def __init__(self, callback, interval, torrent):
         self._callback = callback
@@ -422,6 +1235,15 @@ class _TranslatingCallback:
             interval=interval,
         )
 
+    @property
+    def batch_pieces(self):
+        """
+        Number of pieces between progress reports if `callback` is a
+        :class:`BatchingCallback` (see :class:`Collector`), `None` otherwise
+        """
+        if isinstance(self._callback, BatchingCallback):
+            return self._callback.batch_pieces
+
     def __call__(self, piece_index, pieces_done, pieces_total, filepath, piece_hash, exceptions):
         force = self._force_callback(piece_index, pieces_done, pieces_total,
                                      filepath, piece_hash, exceptions)
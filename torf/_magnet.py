@@ -12,10 +12,13 @@
 # You should have received a copy of the GNU General Public License
 # along with torf.  If not, see <https://www.gnu.org/licenses/>.
 
+import asyncio
 import base64
 import binascii
+import functools
 import io
 import re
+import threading
 import time
 import urllib
 from collections import abc, defaultdict
@@ -286,6 +289,10 @@ class Magnet():
         :return: ``True`` if the "info" section was successfully downloaded,
             ``False`` otherwise
         """
+        return self._get_info(validate=validate, timeout=timeout, callback=callback)
+
+    def _get_info(self, validate=True, timeout=60, callback=None, stop=None):
+        # `stop` is a threading.Event that prevents trying any more sources
         def success():
             return hasattr(self, '_info')
 
@@ -303,6 +310,8 @@ class Magnet():
 
         start = time.monotonic()
         for url in torrent_urls:
+            if stop is not None and stop.is_set():
+                break
             to = timeout - (time.monotonic() - start)
             try:
                 torrent = utils.download(url, timeout=to)
@@ -316,6 +325,31 @@ class Magnet():
 
         return success()
 
+    async def aget_info(self, validate=True, timeout=60, callback=None):
+        """
+        Same as :meth:`get_info`, but for :mod:`asyncio` applications
+
+        :meth:`get_info` runs in the event loop's default executor. `callback`
+        is called in the event loop's thread.
+
+        If the awaiting task is cancelled, the current download is finished in
+        the background, but no other sources are tried.
+        """
+        loop = asyncio.get_running_loop()
+        if callback is not None:
+            def threadsafe_callback(exception):
+                loop.call_soon_threadsafe(callback, exception)
+        else:
+            threadsafe_callback = None
+        stop = threading.Event()
+        try:
+            return await loop.run_in_executor(None, functools.partial(
+                self._get_info, validate=validate, timeout=timeout, callback=threadsafe_callback, stop=stop,
+            ))
+        except asyncio.CancelledError:
+            stop.set()
+            raise
+
     def _set_info_from_torrent(self, torrent_data, validate=True, callback=False):
         """Extract "info" section from `torrent_data` for :meth:`torrent`"""
         # Prevent circular import issues
@@ -67,6 +67,9 @@ class Magnet:
     def get_info(
         self, validate: bool = True, timeout: int = 60, callback: Callable[[TorfError], None] | None = None
     ) -> bool: ...
+    async def aget_info(
+        self, validate: bool = True, timeout: int = 60, callback: Callable[[TorfError], None] | None = None
+    ) -> bool: ...
 
     _KNOWN_PARAMETERS: tuple[str, ...] = ...
     @classmethod
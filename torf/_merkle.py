@@ -0,0 +1,159 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+from hashlib import sha1, sha256
+
+BLOCK_SIZE = 16 * 1024
+"""Number of bytes in each leaf of a merkle tree"""
+
+ZERO_HASH = bytes(32)
+"""Leaf hash that is used for padding"""
+
+
+def get_width(count):
+    """Return smallest power of 2 that is greater than or equal to `count`"""
+    return 1 << max(count - 1, 0).bit_length()
+
+
+def get_pad_hash(width):
+    """Return root hash of a tree with `width` :data:`ZERO_HASH` leaves"""
+    pad_hash = ZERO_HASH
+    while width > 1:
+        pad_hash = sha256(pad_hash + pad_hash).digest()
+        width //= 2
+    return pad_hash
+
+
+def get_root(hashes, width=None, pad_hash=ZERO_HASH):
+    """
+    Return root hash of a merkle tree
+
+    :param hashes: Sequence of leaf hashes
+    :param width: Number of leaves (must be a power of 2) or `None` to use
+        the smallest possible width
+    :param pad_hash: Hash of missing leaves
+    """
+    if width is None:
+        width = get_width(len(hashes))
+    layer = list(hashes)
+    while width > 1:
+        if len(layer) % 2 != 0:
+            layer.append(pad_hash)
+        layer = [sha256(layer[i] + layer[i + 1]).digest()
+                 for i in range(0, len(layer), 2)]
+        pad_hash = sha256(pad_hash + pad_hash).digest()
+        width //= 2
+    return layer[0] if layer else pad_hash
+
+
+class PieceHasher:
+    """
+    Callable that returns the SHA1 and merkle hashes of a file-aligned piece
+
+    The return value is :attr:`hash_size` bytes long and contains:
+
+        1. SHA1 digest of the piece
+        2. SHA1 digest of the piece padded with null bytes to `piece_size`
+        3. Merkle root of the piece's 16 KiB blocks
+        4. Merkle root of the piece's 16 KiB blocks padded to `piece_size`
+
+    The unpadded merkle root is the ``pieces root`` of files that are not
+    larger than `piece_size`. The padded merkle root is the piece's hash in the
+    ``piece layers``.
+    """
+
+    hash_size = 20 + 20 + 32 + 32
+
+    def __init__(self, piece_size):
+        self._piece_size = piece_size
+        self._piece_width = piece_size // BLOCK_SIZE
+
+    def __call__(self, piece):
+        view = memoryview(piece)
+        length = len(view)
+
+        v1_hash = sha1(view)
+        v1_digest = v1_hash.digest()
+        if length < self._piece_size:
+            v1_hash.update(bytes(self._piece_size - length))
+        v1_padded_digest = v1_hash.digest()
+
+        leaves = [sha256(view[pos:pos + BLOCK_SIZE]).digest()
+                  for pos in range(0, length, BLOCK_SIZE)]
+        width = get_width(len(leaves))
+        root = get_root(leaves, width=width)
+        padded_root = get_root([root], width=self._piece_width // width, pad_hash=get_pad_hash(width))
+        return v1_digest + v1_padded_digest + root + padded_root
+
+
+def get_file_tree_and_piece_layers(files, piece_size, hashes):
+    """
+    Return ``file tree`` and ``piece layers`` as specified by BEP 52
+
+    :param files: Sequence of `(path, size)` tuples where `path` is a sequence
+        of path components
+    :param int piece_size: Number of bytes in each piece
+    :param hashes: Concatenated return values of :class:`PieceHasher` for
+        each file-aligned piece
+    """
+    hash_size = PieceHasher.hash_size
+    piece_pad_hash = get_pad_hash(piece_size // BLOCK_SIZE)
+    file_tree = {}
+    piece_layers = {}
+    piece_index = 0
+    for path, size in files:
+        pieces = math.ceil(size / piece_size)
+        records = [hashes[pos:pos + hash_size]
+                   for pos in range(piece_index * hash_size, (piece_index + pieces) * hash_size, hash_size)]
+        piece_index += pieces
+
+        fileinfo = {'length': size}
+        if size > piece_size:
+            piece_layer = [bytes(record[72:104]) for record in records]
+            pieces_root = get_root(piece_layer, pad_hash=piece_pad_hash)
+            piece_layers[pieces_root] = b''.join(piece_layer)
+            fileinfo['pieces root'] = pieces_root
+        elif size > 0:
+            fileinfo['pieces root'] = bytes(records[0][40:72])
+
+        node = file_tree
+        for part in path:
+            node = node.setdefault(part, {})
+        node[''] = fileinfo
+    return file_tree, piece_layers
+
+
+def get_v1_hashes(hashes, files, piece_size):
+    """
+    Return concatenated SHA1 digests of file-aligned pieces with padding files
+    between them
+
+    Every file except for the last one is padded to the next piece boundary.
+
+    :param hashes: Concatenated return values of :class:`PieceHasher` for
+        each file-aligned piece
+    :param files: Sequence of `(path, size)` tuples (see
+        :func:`get_file_tree_and_piece_layers`)
+    :param int piece_size: Number of bytes in each piece
+    """
+    hash_size = PieceHasher.hash_size
+    pieces = sum(math.ceil(size / piece_size) for _, size in files)
+    v1_hashes = [hashes[pos + 20:pos + 40] for pos in range(0, pieces * hash_size, hash_size)]
+    # There is no padding after the last file. If it is empty, the last piece
+    # belongs to a previous file, which is padded.
+    if files[-1][1] > 0:
+        last_pos = (pieces - 1) * hash_size
+        v1_hashes[-1] = hashes[last_pos:last_pos + 20]
+    return b''.join(v1_hashes)
@@ -0,0 +1,21 @@
+from collections.abc import Sequence
+from typing import Any
+
+BLOCK_SIZE: int
+ZERO_HASH: bytes
+
+_Files = Sequence[tuple[Sequence[str], int]]
+
+def get_width(count: int) -> int: ...
+def get_pad_hash(width: int) -> bytes: ...
+def get_root(hashes: Sequence[bytes], width: int | None = None, pad_hash: bytes = ...) -> bytes: ...
+
+class PieceHasher:
+    hash_size: int
+    def __init__(self, piece_size: int) -> None: ...
+    def __call__(self, piece: bytes | bytearray | memoryview) -> bytes: ...
+
+def get_file_tree_and_piece_layers(
+    files: _Files, piece_size: int, hashes: bytes | bytearray
+) -> tuple[dict[str, Any], dict[bytes, bytes]]: ...
+def get_v1_hashes(hashes: bytes | bytearray, files: _Files, piece_size: int) -> bytes: ...
@@ -0,0 +1,241 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import math
+import threading
+import time
+
+from . import _generate as generate
+
+_debug = logging.getLogger('torf').debug
+
+
+class Progress:
+    """
+    Batched progress report from :meth:`~.Torrent.iter_generate` or
+    :meth:`~.Torrent.iter_verify`
+
+    `bytes_total` defaults to :attr:`~.Torrent.size`.
+    """
+
+    def __init__(self, torrent, filepath, pieces_done, pieces_total, seconds_elapsed,
+                 errors=(), result=None, bytes_total=None):
+        self._torrent = torrent
+        self._filepath = filepath
+        self._pieces_done = pieces_done
+        self._pieces_total = pieces_total
+        self._seconds_elapsed = seconds_elapsed
+        self._errors = tuple(errors)
+        self._result = result
+        self._bytes_total = bytes_total if bytes_total is not None else torrent.size
+
+    @property
+    def torrent(self):
+        """:class:`~.Torrent` instance"""
+        return self._torrent
+
+    @property
+    def filepath(self):
+        """Path of the most recently hashed file or ``None``"""
+        return self._filepath
+
+    @property
+    def pieces_done(self):
+        """Number of hashed pieces"""
+        return self._pieces_done
+
+    @property
+    def pieces_total(self):
+        """Total number of pieces"""
+        return self._pieces_total
+
+    @property
+    def bytes_done(self):
+        """Approximate number of hashed bytes"""
+        return min(self._pieces_done * self._torrent.piece_size, self.bytes_total)
+
+    @property
+    def bytes_total(self):
+        """Total number of bytes in all pieces that are hashed"""
+        return self._bytes_total
+
+    @property
+    def seconds_elapsed(self):
+        """Number of seconds since hashing started"""
+        return self._seconds_elapsed
+
+    @property
+    def bytes_per_second(self):
+        """Average throughput since hashing started"""
+        if self._seconds_elapsed > 0:
+            return self.bytes_done / self._seconds_elapsed
+        else:
+            return 0
+
+    @property
+    def errors(self):
+        """
+        Sequence of :class:`~.TorfError` instances that occurred since the
+        previous report
+        """
+        return self._errors
+
+    @property
+    def result(self):
+        """
+        Return value of :meth:`~.Torrent.generate` or :meth:`~.Torrent.verify`
+        in the final report, ``None`` in all other reports
+        """
+        return self._result
+
+    def __repr__(self):
+        return (f'{type(self).__name__}(pieces_done={self._pieces_done}, '
+                f'pieces_total={self._pieces_total}, errors={self._errors!r}, '
+                f'result={self._result!r})')
+
+
+class ProgressBatcher(generate.BatchingCallback):
+    """
+    Run :meth:`~.Torrent.generate` or :meth:`~.Torrent.verify` in a separate
+    thread and iterate over :class:`Progress` instances
+
+    The instance is passed as `callback` to `method`. Its :attr:`batch_pieces`
+    tells :class:`~._generate.Collector` to only call it every `batch_pieces`
+    pieces or every `batch_bytes` bytes, whichever comes first, or if an error
+    occurs. If neither is given, it is called for every percent of progress.
+
+    If the iterator is consumed slower than reports are made, reports are
+    merged and no errors are lost. The final batch is always merged into the
+    last report, which also provides the result.
+
+    If iteration is stopped early, `method` is cancelled.
+    """
+
+    def __init__(self, torrent, method, batch_pieces=None, batch_bytes=None, **kwargs):
+        self._torrent = torrent
+        self._method = method
+        self._kwargs = kwargs
+
+        # verify() may only hash some pieces
+        files, pieces = kwargs.get('files'), kwargs.get('pieces')
+        if files is not None or pieces is not None:
+            if files is not None:
+                files = kwargs['files'] = tuple(files)
+            if pieces is not None:
+                pieces = kwargs['pieces'] = tuple(pieces)
+            piece_ranges = torrent._get_piece_ranges(files, pieces)
+        else:
+            piece_ranges = (range(0, torrent.pieces),)
+        self._pieces_total = sum(len(piece_range) for piece_range in piece_ranges)
+        self._bytes_total = self._get_bytes_total(piece_ranges)
+        self._batch_pieces = self._get_batch_pieces(batch_pieces, batch_bytes)
+
+        self._condition = threading.Condition()
+        self._state = None
+        self._errors = []
+        self._finished = False
+        self._result = None
+        self._exception = None
+        self._cancelled = False
+
+    def _get_bytes_total(self, piece_ranges):
+        torrent = self._torrent
+        bytes_total = sum(len(piece_range) for piece_range in piece_ranges) * torrent.piece_size
+        if piece_ranges and piece_ranges[-1][-1] == torrent.pieces - 1:
+            # Final piece is usually shorter
+            bytes_total -= torrent.pieces * torrent.piece_size - torrent.size
+        return bytes_total
+
+    def _get_batch_pieces(self, batch_pieces, batch_bytes):
+        sizes = []
+        if batch_pieces is not None:
+            sizes.append(batch_pieces)
+        if batch_bytes is not None:
+            sizes.append(math.ceil(batch_bytes / self._torrent.piece_size))
+        if not sizes:
+            sizes.append(self._pieces_total // 100)
+        return max(1, min(sizes))
+
+    @property
+    def batch_pieces(self):
+        """Number of pieces between progress reports"""
+        return self._batch_pieces
+
+    def __call__(self, torrent, filepath, pieces_done, pieces_total,
+                 piece_index=None, piece_hash=None, exception=None):
+        # Called in the method's thread with the arguments of generate()'s or
+        # verify()'s callback every `batch_pieces` pieces and for each error
+        with self._condition:
+            if exception is not None:
+                self._errors.append(exception)
+            self._state = (filepath, pieces_done, pieces_total)
+            self._condition.notify()
+        if self._cancelled:
+            return 'cancel'
+
+    def _run(self):
+        # Called in the method's thread
+        try:
+            result = self._method(callback=self, interval=0, **self._kwargs)
+        except BaseException as e:
+            _debug(f'{self._method.__qualname__}() raised {e!r}')
+            exception, result = e, None
+        else:
+            exception = None
+        with self._condition:
+            self._finished = True
+            self._result = result
+            self._exception = exception
+            self._condition.notify()
+
+    def _has_news(self):
+        return self._finished or self._state is not None or self._errors
+
+    def __iter__(self):
+        thread = threading.Thread(
+            name=f'iter-{self._method.__name__}',
+            target=self._run,
+            daemon=True,
+        )
+        start_time = time.monotonic()
+        thread.start()
+        try:
+            state = (None, 0, self._pieces_total)
+            errors = []
+            while True:
+                with self._condition:
+                    self._condition.wait_for(self._has_news)
+                    if self._state is not None:
+                        state = self._state
+                        self._state = None
+                    errors.extend(self._errors)
+                    self._errors = []
+                    finished = self._finished
+
+                if finished:
+                    if self._exception is not None:
+                        raise self._exception
+                    yield Progress(self._torrent, *state, time.monotonic() - start_time,
+                                   errors=errors, result=self._result, bytes_total=self._bytes_total)
+                    break
+                elif state[1] < state[2]:
+                    yield Progress(self._torrent, *state, time.monotonic() - start_time,
+                                   errors=errors, bytes_total=self._bytes_total)
+                    errors = []
+                # The report for the final batch is merged into the report with
+                # the result
+        finally:
+            self._cancelled = True
+            thread.join()
@@ -0,0 +1,38 @@
+from collections.abc import Sequence
+from pathlib import Path
+
+from ._errors import TorfError
+from ._torrent import Torrent
+
+class Progress:
+    def __init__(
+        self,
+        torrent: Torrent,
+        filepath: Path | str | None,
+        pieces_done: int,
+        pieces_total: int,
+        seconds_elapsed: float,
+        errors: Sequence[TorfError] = (),
+        result: bool | None = None,
+        bytes_total: int | None = None,
+    ) -> None: ...
+    @property
+    def torrent(self) -> Torrent: ...
+    @property
+    def filepath(self) -> Path | str | None: ...
+    @property
+    def pieces_done(self) -> int: ...
+    @property
+    def pieces_total(self) -> int: ...
+    @property
+    def bytes_done(self) -> int: ...
+    @property
+    def bytes_total(self) -> int: ...
+    @property
+    def seconds_elapsed(self) -> float: ...
+    @property
+    def bytes_per_second(self) -> float: ...
+    @property
+    def errors(self) -> tuple[TorfError, ...]: ...
+    @property
+    def result(self) -> bool | None: ...
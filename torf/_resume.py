@@ -0,0 +1,93 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+import flatbencode as bencode
+
+from . import _errors as error
+from . import _utils as utils
+from ._bitfield import Bitfield
+
+
+def get_fastresume(torrent, content_path, bitfield):
+    """
+    Return libtorrent fast-resume data as bencodable :class:`dict`
+
+    :param torrent: :class:`~.Torrent` instance
+    :param content_path: Path to the verified content
+    :param bitfield: :class:`~.Bitfield` from :meth:`~.Torrent.verify`
+
+    Only :attr:`~.Bitfield.OK` pieces are marked as downloaded. If the base
+    name of `content_path` differs from :attr:`~.Torrent.name`, the file paths
+    are mapped to the actual content.
+    """
+    content_path = os.path.abspath(content_path)
+    basename = os.path.basename(content_path)
+    if torrent.mode == 'singlefile':
+        filepaths = [content_path]
+        mapped_files = [basename]
+    else:
+        # Padding files (BEP 47) have file indexes in libtorrent, so they must
+        # be listed even though they don't exist
+        mapped_files = [
+            os.path.join(basename, *(utils.force_as_string(part) for part in fileinfo['path']))
+            for fileinfo in torrent.metainfo['info']['files']
+        ]
+        filepaths = [os.path.join(os.path.dirname(content_path), mapped_file) for mapped_file in mapped_files]
+
+    # Clients may compare these to the content to detect changes since
+    # verification
+    file_sizes = []
+    for filepath in filepaths:
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            file_sizes.append([0, 0])
+        else:
+            file_sizes.append([stat.st_size, int(stat.st_mtime)])
+
+    fastresume = {
+        b'file-format': b'libtorrent resume file',
+        b'file-version': 1,
+        b'info-hash': bytes.fromhex(torrent.infohash),
+        b'name': torrent.name.encode('utf-8'),
+        b'save_path': os.path.dirname(content_path).encode('utf-8', errors='surrogateescape'),
+        # One byte per piece with the lowest bit set if the piece is complete
+        b'pieces': bytes(state == Bitfield.OK for state in bitfield),
+        b'file_sizes': file_sizes,
+        b'seed_mode': 0,
+    }
+    if basename != torrent.name:
+        fastresume[b'mapped_files'] = [
+            mapped_file.encode('utf-8', errors='surrogateescape')
+            for mapped_file in mapped_files
+        ]
+    return fastresume
+
+
+def write_fastresume(filepath, torrent, content_path, bitfield):
+    """
+    Write :func:`get_fastresume` to `filepath`
+
+    :raise WriteError: if writing fails
+    """
+    data = bencode.encode(get_fastresume(torrent, content_path, bitfield))
+    tmp_path = f'{filepath}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, filepath)
+    except OSError as e:
+        raise error.WriteError(e.errno, filepath)
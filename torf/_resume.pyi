@@ -0,0 +1,9 @@
+from typing import Any
+
+from _typeshed import StrPath
+
+from ._bitfield import Bitfield
+from ._torrent import Torrent
+
+def get_fastresume(torrent: Torrent, content_path: StrPath, bitfield: Bitfield) -> dict[bytes, Any]: ...
+def write_fastresume(filepath: StrPath, torrent: Torrent, content_path: StrPath, bitfield: Bitfield) -> None: ...
@@ -112,7 +112,7 @@ def _get_filepaths_and_sizes(info):
         raise RuntimeError(f'Unable to find files: {info!r}')
 
 
-def is_content_match(torrent, candidate):
+def is_content_match(torrent, candidate, use_mmap=False):
     """
     Whether `torrent` contains the same files as `candidate`
 
@@ -124,12 +124,15 @@ def is_content_match(torrent, candidate):
 
     This is relatively slow and should only be used after :func:`is_file_match`
     returned `True`.
+
+    If `use_mmap` is `True`, files are memory-mapped (see
+    :class:`~.TorrentFileStream`).
     """
     if not torrent.path:
         raise RuntimeError(f'Torrent does not have a file system path: {torrent!r}')
 
     # Compare some piece hashes for each file
-    with stream.TorrentFileStream(candidate, content_path=torrent.path) as tfs:
+    with stream.TorrentFileStream(candidate, content_path=torrent.path, use_mmap=use_mmap) as tfs:
         check_piece_indexes = set()
         for file in torrent.files:
             all_file_piece_indexes = tfs.get_piece_indexes_of_file(file)
@@ -173,6 +176,82 @@ def copy(from_torrent, to_torrent):
         to_torrent.metainfo['info']['files'] = source_files
 
 
+def copy_unchanged_pieces(from_torrent, to_torrent, bitfield, hashes):
+    """
+    Copy piece hashes from `from_torrent` to `hashes` for each piece of
+    `to_torrent` that only contains unchanged files
+
+    A file is unchanged if `from_torrent` contains a file with the same relative
+    path (ignoring the torrent name), the same size and the same position in the
+    stream of concatenated files, and the file in the file system is not
+    modified at or after `from_torrent`'s :attr:`~.Torrent.creation_date`.
+    Without a :attr:`~.Torrent.creation_date`, no file is unchanged because
+    rewriting a file with the same size can't be detected.
+
+    Pieces are only copied if they are :attr:`~.Bitfield.UNSEEN` in `bitfield`
+    and they are marked as :attr:`~.Bitfield.OK` after copying.
+
+    :param bitfield: :class:`~.Bitfield` instance with `to_torrent`'s number of
+        pieces
+    :param hashes: :class:`bytearray` of `to_torrent`'s concatenated piece
+        hashes
+
+    :return: number of copied piece hashes
+    """
+    piece_size = to_torrent.piece_size
+    from_hashes = from_torrent.metainfo['info'].get('pieces', b'')
+    if from_torrent.piece_size != piece_size or not from_hashes:
+        return 0
+
+    # Map relative file paths without torrent name to stream positions and sizes
+    # (positions include padding files (BEP 47) of hybrid torrents)
+    from_files = {}
+    with stream.TorrentFileStream(from_torrent) as tfs:
+        for file in from_torrent.files:
+            from_files[file.parts[1:]] = (tfs.get_file_position(file), file.size)
+    from_size = from_torrent.size
+
+    if from_torrent.creation_date is not None:
+        from_timestamp = from_torrent.creation_date.timestamp()
+    else:
+        from_timestamp = None
+
+    # Find pieces that contain at least one byte of a new, moved or modified file
+    changed_piece_indexes = set()
+    with stream.TorrentFileStream(to_torrent) as tfs:
+        for file, filepath in zip(to_torrent.files, to_torrent.filepaths):
+            to_pos = tfs.get_file_position(file)
+            if from_files.get(file.parts[1:]) != (to_pos, file.size) or _is_modified(filepath, from_timestamp):
+                changed_piece_indexes.update(tfs.get_piece_indexes_of_file(file))
+    to_size = to_torrent.size
+
+    copied = 0
+    from_pieces = len(from_hashes) // 20
+    for piece_index in range(min(to_torrent.pieces, from_pieces)):
+        # The final piece of either torrent may be shorter
+        piece_start = piece_index * piece_size
+        from_piece_size = min(piece_size, from_size - piece_start)
+        to_piece_size = min(piece_size, to_size - piece_start)
+        if (
+            piece_index not in changed_piece_indexes
+            and from_piece_size == to_piece_size
+            and bitfield[piece_index] == bitfield.UNSEEN
+        ):
+            pos = piece_index * 20
+            hashes[pos:pos + 20] = from_hashes[pos:pos + 20]
+            bitfield[piece_index] = bitfield.OK
+            copied += 1
+    return copied
+
+def _is_modified(filepath, timestamp):
+    if timestamp is None:
+        return True
+    try:
+        return os.path.getmtime(filepath) >= timestamp
+    except OSError:
+        return True
+
+
 class ReuseCallback(generate._IntervaledCallback):
     def __init__(self, *args, torrent, torrent_files_total, **kwargs):
         super().__init__(*args, **kwargs)
@@ -0,0 +1,244 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import math
+import queue
+import random
+import threading
+
+from . import _errors as error
+from . import _generate as generate
+from ._bitfield import Bitfield
+from ._stream import TorrentFileStream
+
+_debug = logging.getLogger('torf').debug
+
+
+class SampleResult:
+    """
+    Result of :meth:`~.Torrent.verify_sample`
+
+    :param bitfield: :class:`~.Bitfield` with the state of each piece
+    :param piece_indexes: Sequence of indexes of the sampled pieces
+    """
+
+    def __init__(self, bitfield, piece_indexes):
+        self._bitfield = bitfield
+        self._piece_indexes = tuple(piece_indexes)
+
+    @property
+    def bitfield(self):
+        """
+        :class:`~.Bitfield` with the state of each piece
+
+        Pieces that were not sampled or not checked (e.g. because verification
+        was stopped) are :attr:`~.Bitfield.UNSEEN`.
+        """
+        return self._bitfield
+
+    @property
+    def piece_indexes(self):
+        """Sorted indexes of the sampled pieces"""
+        return self._piece_indexes
+
+    @property
+    def pieces_checked(self):
+        """Number of sampled pieces that were checked"""
+        return self._bitfield.seen
+
+    @property
+    def pieces_total(self):
+        """Number of pieces in the torrent"""
+        return len(self._bitfield)
+
+    @property
+    def success(self):
+        """Whether all sampled pieces were checked and none of them is bad"""
+        return self._bitfield.count(Bitfield.OK) == len(self._piece_indexes)
+
+    def confidence(self, corrupt_fraction):
+        """
+        Return the probability that the sample would have contained a bad
+        piece if `corrupt_fraction` of all pieces were bad
+
+        Bad pieces are assumed to be randomly distributed. For example, if
+        ``confidence(0.001)`` returns 0.99 and :attr:`success` is ``True``,
+        you can be 99 % certain that less than 0.1 % of all pieces are bad.
+
+        :param float corrupt_fraction: Fraction of bad pieces between 0
+            (exclusive) and 1 (inclusive)
+
+        :raises ValueError: if `corrupt_fraction` is out of range
+
+        :return: Number from 0 to 1; always 0 if :attr:`success` is ``False``
+        """
+        if not 0 < corrupt_fraction <= 1:
+            raise ValueError(f'corrupt_fraction must be greater than 0 and at most 1: {corrupt_fraction!r}')
+        elif not self.success:
+            return 0.0
+
+        # Hypergeometric probability of not drawing any of `bad` pieces
+        pieces_total = self.pieces_total
+        bad = max(1, math.ceil(corrupt_fraction * pieces_total))
+        probability_missed = 1.0
+        for i in range(len(self._piece_indexes)):
+            probability_missed *= (pieces_total - bad - i) / (pieces_total - i)
+            if probability_missed <= 0:
+                return 1.0
+        return 1.0 - probability_missed
+
+    def __repr__(self):
+        return (f'{type(self).__name__}(pieces_checked={self.pieces_checked}, '
+                f'pieces_total={self.pieces_total}, success={self.success!r})')
+
+
+def get_sample(torrent, sample_size, seed=None):
+    """
+    Return sorted list of `sample_size` random piece indexes
+
+    Pieces are sampled from each file in proportion to its number of pieces
+    (see :meth:`~.TorrentFileStream.get_piece_indexes_of_file`). Files that
+    don't get a full piece at their share draw lots for the remaining pieces.
+
+    :param seed: Seed for :class:`random.Random`; the same seed always
+        returns the same sample for the same torrent
+    """
+    rng = random.Random(seed)
+    pieces_total = torrent.pieces
+    if sample_size >= pieces_total:
+        return list(range(pieces_total))
+
+    # Piece indexes of each file; this is the same as
+    # TorrentFileStream.get_piece_indexes_of_file() for every file without
+    # creating a list of all piece indexes. The stream knows the positions of
+    # files after padding files (BEP 47).
+    piece_size = torrent.piece_size
+    strata = []
+    with TorrentFileStream(torrent) as stream:
+        for file in torrent.files:
+            if file.size > 0:
+                file_start = stream.get_file_position(file)
+                strata.append(range(file_start // piece_size, (file_start + file.size - 1) // piece_size + 1))
+
+    # Largest remainder method with random tie breaking
+    stratum_sizes = sum(len(stratum) for stratum in strata)
+    shares = [sample_size * len(stratum) / stratum_sizes for stratum in strata]
+    quotas = [int(share) for share in shares]
+    remainders = sorted(
+        range(len(strata)),
+        key=lambda i: (shares[i] - quotas[i], rng.random()),
+        reverse=True,
+    )
+    for i in remainders[:sample_size - sum(quotas)]:
+        quotas[i] += 1
+
+    piece_indexes = set()
+    for stratum, quota in zip(strata, quotas):
+        if quota > 0:
+            piece_indexes.update(rng.sample(stratum, min(quota, len(stratum))))
+
+    # Pieces that span multiple files may have been sampled more than once
+    while len(piece_indexes) < sample_size:
+        piece_indexes.add(rng.randrange(pieces_total))
+
+    return sorted(piece_indexes)
+
+
+class PieceChecker:
+    """
+    Read and hash pieces at `piece_indexes` from `path` with random access in
+    `threads` threads
+
+    Each thread has its own :class:`~.TorrentFileStream`. Results are reported
+    to `callback` (see :class:`~.VerifyCallback`) in the order they are
+    finished.
+    """
+
+    _STOP = object()
+
+    def __init__(self, torrent, path, piece_indexes, threads, callback):
+        self._torrent = torrent
+        self._path = path
+        self._piece_indexes = piece_indexes
+        self._callback = callback
+        self._exp_hashes = torrent.metainfo['info']['pieces']
+        self._bitfield = Bitfield(torrent.pieces)
+        self._task_queue = queue.Queue()
+        for piece_index in piece_indexes:
+            self._task_queue.put(piece_index)
+        self._result_queue = queue.Queue()
+        self._stop = False
+        self._threads = [
+            generate.Worker(name=f'checker{i}', worker=self._check_pieces)
+            for i in range(1, max(1, min(threads, len(piece_indexes))) + 1)
+        ]
+
+    def _check_pieces(self):
+        try:
+            with TorrentFileStream(self._torrent, content_path=self._path) as stream:
+                while not self._stop:
+                    try:
+                        piece_index = self._task_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    filepath = stream.get_files_at_piece_index(piece_index, content_path=self._path)[0]
+                    try:
+                        piece = stream.get_piece(piece_index)
+                    except error.TorfError as e:
+                        self._result_queue.put((piece_index, filepath, None, (e,)))
+                    else:
+                        self._result_queue.put((piece_index, filepath, generate.sha1_digest(piece), ()))
+        except BaseException as e:
+            _debug(f'{threading.current_thread().name}: Exception while checking pieces: {e!r}')
+            # Don't let check() wait forever
+            self._result_queue.put(self._STOP)
+            raise
+
+    def check(self):
+        """
+        Block until all pieces are checked or `callback` cancels
+
+        Exceptions from threads or `callback` are raised after all threads
+        are joined.
+
+        :return: :class:`SampleResult` instance
+        """
+        bitfield = self._bitfield
+        pieces_total = len(self._piece_indexes)
+        try:
+            for _ in range(pieces_total):
+                result = self._result_queue.get()
+                if result is self._STOP:
+                    break
+                piece_index, filepath, piece_hash, exceptions = result
+                pos = piece_index * 20
+                if exceptions:
+                    bitfield[piece_index] = Bitfield.MISSING
+                elif piece_hash != self._exp_hashes[pos:pos + 20]:
+                    bitfield[piece_index] = Bitfield.FAILED
+                else:
+                    bitfield[piece_index] = Bitfield.OK
+                maybe_cancel = self._callback(
+                    piece_index, bitfield.seen, pieces_total,
+                    filepath, piece_hash, exceptions,
+                )
+                if maybe_cancel is not None:
+                    break
+        finally:
+            self._stop = True
+            for thread in self._threads:
+                thread.join()
+
+        return SampleResult(bitfield, self._piece_indexes)
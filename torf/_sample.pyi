@@ -0,0 +1,17 @@
+from collections.abc import Sequence
+
+from ._bitfield import Bitfield
+
+class SampleResult:
+    def __init__(self, bitfield: Bitfield, piece_indexes: Sequence[int]) -> None: ...
+    @property
+    def bitfield(self) -> Bitfield: ...
+    @property
+    def piece_indexes(self) -> tuple[int, ...]: ...
+    @property
+    def pieces_checked(self) -> int: ...
+    @property
+    def pieces_total(self) -> int: ...
+    @property
+    def success(self) -> bool: ...
+    def confidence(self, corrupt_fraction: float) -> float: ...
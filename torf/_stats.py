@@ -0,0 +1,221 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import array
+import math
+import queue
+import threading
+from time import perf_counter
+
+
+class Stats:
+    """
+    Performance statistics of :meth:`~.Torrent.generate` or
+    :meth:`~.Torrent.verify`
+
+    Pass an instance as the `stats` argument to collect statistics about
+    reading, hashing and reporting. If the same instance is passed to
+    multiple calls, the statistics are accumulated.
+
+    Reading, hashing and reporting run concurrently, so the slowest stage
+    determines the overall speed:
+
+    * If :attr:`piece_queue_put_seconds` is high, readers are waiting for
+      hashers (hash-bound).
+    * If :attr:`piece_queue_get_seconds` is high, hashers are waiting for
+      readers (disk-bound).
+    * If :attr:`callback_seconds` is a large fraction of
+      :attr:`seconds_elapsed`, progress reporting slows everything down
+      (callback-bound).
+
+    All times are wall-clock seconds except for :attr:`hash_seconds`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seconds_elapsed = 0.0
+        self._start_time = None
+        self._bytes_read = 0
+        self._read_latencies = array.array('d')
+        self._hash_seconds = {}
+        self._blocked_seconds = {}
+        self._max_sizes = {}
+        self._callback_seconds = 0.0
+
+    @property
+    def seconds_elapsed(self):
+        """Total duration of all calls"""
+        return self._seconds_elapsed
+
+    @property
+    def bytes_read(self):
+        """Number of bytes read from disk"""
+        return self._bytes_read
+
+    @property
+    def pieces_read(self):
+        """Number of pieces read from disk"""
+        return len(self._read_latencies)
+
+    @property
+    def bytes_per_second(self):
+        """Average throughput"""
+        if self._seconds_elapsed > 0:
+            return self._bytes_read / self._seconds_elapsed
+        else:
+            return 0.0
+
+    def read_latency(self, percentile):
+        """
+        Return the time it took to read a piece
+
+        :param percentile: Number from 0 to 100 (e.g. 50 for the median or 99
+            for the slowest 1 % of pieces)
+
+        :raises ValueError: if `percentile` is out of range
+
+        :return: Number of seconds or ``None`` if no pieces were read
+        """
+        if not 0 <= percentile <= 100:
+            raise ValueError(f'Invalid percentile: {percentile!r}')
+        with self._lock:
+            latencies = sorted(self._read_latencies)
+        if latencies:
+            # Nearest-rank method
+            rank = max(1, math.ceil(percentile / 100 * len(latencies)))
+            return latencies[rank - 1]
+
+    @property
+    def hash_seconds(self):
+        """
+        :class:`dict` that maps each hasher thread name to the CPU time it
+        spent hashing
+
+        With the ``"process"`` backend, this is the CPU time of the hasher
+        thread's worker process.
+        """
+        with self._lock:
+            return dict(self._hash_seconds)
+
+    @property
+    def piece_queue_put_seconds(self):
+        """Time readers were blocked because the piece queue was full"""
+        return self._blocked_seconds.get(('piece_queue', 'put'), 0.0)
+
+    @property
+    def piece_queue_get_seconds(self):
+        """Time hashers were blocked because the piece queue was empty"""
+        return self._blocked_seconds.get(('piece_queue', 'get'), 0.0)
+
+    @property
+    def hash_queue_get_seconds(self):
+        """Time the collector was blocked because the hash queue was empty"""
+        return self._blocked_seconds.get(('hash_queue', 'get'), 0.0)
+
+    @property
+    def piece_queue_max(self):
+        """Highest number of pieces in the piece queue"""
+        return self._max_sizes.get('piece_queue', 0)
+
+    @property
+    def hash_queue_max(self):
+        """Highest number of hashes in the hash queue"""
+        return self._max_sizes.get('hash_queue', 0)
+
+    @property
+    def callback_seconds(self):
+        """Time spent in `callback`"""
+        return self._callback_seconds
+
+    def as_dict(self):
+        """Return all statistics as a JSON-serializable :class:`dict`"""
+        return {
+            'seconds_elapsed': self.seconds_elapsed,
+            'bytes_read': self.bytes_read,
+            'pieces_read': self.pieces_read,
+            'bytes_per_second': self.bytes_per_second,
+            'read_latency': {
+                f'p{percentile}': self.read_latency(percentile)
+                for percentile in (50, 90, 99, 100)
+            },
+            'hash_seconds': self.hash_seconds,
+            'piece_queue_put_seconds': self.piece_queue_put_seconds,
+            'piece_queue_get_seconds': self.piece_queue_get_seconds,
+            'hash_queue_get_seconds': self.hash_queue_get_seconds,
+            'piece_queue_max': self.piece_queue_max,
+            'hash_queue_max': self.hash_queue_max,
+            'callback_seconds': self.callback_seconds,
+        }
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.as_dict()!r})'
+
+    def _start(self):
+        self._start_time = perf_counter()
+
+    def _stop(self):
+        self._seconds_elapsed += perf_counter() - self._start_time
+
+    def _add_read(self, size, seconds):
+        with self._lock:
+            self._bytes_read += size
+            self._read_latencies.append(seconds)
+
+    def _add_hash(self, thread_name, seconds):
+        with self._lock:
+            self._hash_seconds[thread_name] = self._hash_seconds.get(thread_name, 0.0) + seconds
+
+    def _add_blocked(self, queue_name, operation, seconds, size):
+        with self._lock:
+            key = (queue_name, operation)
+            self._blocked_seconds[key] = self._blocked_seconds.get(key, 0.0) + seconds
+            if size > self._max_sizes.get(queue_name, 0):
+                self._max_sizes[queue_name] = size
+
+    def _add_callback(self, seconds):
+        self._callback_seconds += seconds
+
+
+class MeasuredQueue(queue.Queue):
+    """
+    :class:`queue.Queue` subclass that reports blocking time and size to a
+    :class:`Stats` instance
+    """
+
+    def __init__(self, maxsize, stats, name):
+        super().__init__(maxsize=maxsize)
+        self._stats = stats
+        self._name = name
+
+    def put(self, item, block=True, timeout=None):
+        start = perf_counter()
+        try:
+            super().put(item, block=block, timeout=timeout)
+        finally:
+            self._stats._add_blocked(self._name, 'put', perf_counter() - start, self.qsize())
+
+    def get(self, block=True, timeout=None):
+        start = perf_counter()
+        try:
+            return super().get(block=block, timeout=timeout)
+        finally:
+            self._stats._add_blocked(self._name, 'get', perf_counter() - start, 0)
+
+
+def make_queue(name, maxsize=0, stats=None):
+    """Return :class:`MeasuredQueue` if `stats` is given, :class:`queue.Queue` otherwise"""
+    if stats is not None:
+        return MeasuredQueue(maxsize=maxsize, stats=stats, name=name)
+    else:
+        return queue.Queue(maxsize=maxsize)
@@ -0,0 +1,28 @@
+from typing import Any
+
+class Stats:
+    def __init__(self) -> None: ...
+    @property
+    def seconds_elapsed(self) -> float: ...
+    @property
+    def bytes_read(self) -> int: ...
+    @property
+    def pieces_read(self) -> int: ...
+    @property
+    def bytes_per_second(self) -> float: ...
+    def read_latency(self, percentile: float) -> float | None: ...
+    @property
+    def hash_seconds(self) -> dict[str, float]: ...
+    @property
+    def piece_queue_put_seconds(self) -> float: ...
+    @property
+    def piece_queue_get_seconds(self) -> float: ...
+    @property
+    def hash_queue_get_seconds(self) -> float: ...
+    @property
+    def piece_queue_max(self) -> int: ...
+    @property
+    def hash_queue_max(self) -> int: ...
+    @property
+    def callback_seconds(self) -> float: ...
+    def as_dict(self) -> dict[str, Any]: ...
@@ -1,10 +1,14 @@
 import errno
 import hashlib
+import io
 import itertools
 import math
+import mmap
 import os
+import queue
 
 from . import _errors as error
+from . import _utils as utils
 
 
 class TorrentFileStream:
@@ -12,6 +16,18 @@ class TorrentFileStream:
     Traverse concatenated files as they are described in a torrent
 
     :param torrent: :class:`~.torf.Torrent` object
+    :param content_path: Path to file or directory to read pieces from
+        (defaults to :attr:`~.Torrent.path`)
+    :param bool use_mmap: Whether to memory-map files instead of reading them
+
+        Pieces from :meth:`iter_pieces` are :class:`memoryview` slices of the
+        memory maps and only pieces that span multiple files are copied.
+        :meth:`get_piece` doesn't need any system calls for files that are
+        already mapped.
+
+        This should only be used for files on local disks. If a file is
+        truncated while it is mapped, reading from it can crash the
+        interpreter.
 
     Files are opened on demand and kept open for re-use. It is recommended to
     make use of the context manager protocol to make sure they are properly
@@ -25,10 +41,61 @@ class TorrentFileStream:
     >>>     piece = tfs.get_piece(29)
     """
 
-    def __init__(self, torrent, content_path=None):
+    def __init__(self, torrent, content_path=None, use_mmap=False):
         self._torrent = torrent
         self._content_path = content_path
+        self._use_mmap = use_mmap
         self._open_files = {}
+        self._open_maps = {}
+        self._layout = None
+
+    @classmethod
+    def from_stream(cls, stream):
+        """
+        Create instance for the same torrent as another instance
+
+        The new instance has the same `content_path` and `use_mmap` arguments
+        and shares the file layout of `stream`, which is slow to compute for
+        torrents with many files. Files are not shared, so each instance can be
+        used in its own thread.
+
+        :param stream: :class:`TorrentFileStream` instance
+        """
+        instance = cls(stream._torrent, content_path=stream._content_path, use_mmap=stream._use_mmap)
+        instance._layout = stream._get_layout()
+        return instance
+
+    def _get_layout(self):
+        # Return files, a map of each file to its position in the stream and the
+        # size of the stream. Torrent.files is slow for many files, so this is
+        # only done once.
+        if self._layout is None:
+            files = self._get_files_with_padding()
+            positions = {}
+            size = 0
+            for file in files:
+                positions.setdefault(file, size)
+                size += file.size
+            self._layout = (files, positions, size)
+        return self._layout
+
+    def _get_files_with_padding(self):
+        # Torrent.files doesn't include padding files (BEP 47), but their null
+        # bytes are part of the stream
+        files = tuple(self._torrent.files)
+        if self._torrent.mode != 'multifile':
+            return files
+        files_info = self._torrent.metainfo['info']['files']
+        if not any(utils.is_padding(fileinfo) for fileinfo in files_info):
+            return files
+        files_iter = iter(files)
+        return tuple(
+            _Padding(fileinfo['length']) if utils.is_padding(fileinfo) else next(files_iter)
+            for fileinfo in files_info
+        )
+
+    def _get_files(self):
+        return self._get_layout()[0]
 
     def _get_content_path(self, content_path, none_ok=False, file=None):
         # Get content_path argument from class or method call or from
@@ -81,6 +148,8 @@ class TorrentFileStream:
         This is called automatically when the instance is used as a context
         manager.
         """
+        for filepath in tuple(self._open_maps):
+            self._close_map(filepath)
         for filepath, fh in tuple(self._open_files.items()):
             fh.close()
             del self._open_files[filepath]
@@ -88,7 +157,8 @@ class TorrentFileStream:
     @property
     def max_piece_index(self):
         """Largest valid piece index (smallest is always 0)"""
-        return math.floor((self._torrent.size - 1) / self._torrent.piece_size)
+        size = self._get_layout()[2]
+        return math.floor((size - 1) / self._torrent.piece_size)
 
     def get_file_position(self, file):
         """
@@ -98,13 +168,15 @@ class TorrentFileStream:
 
         :raise ValueError: if `file` is not specified in the torrent
         """
+        files, positions, _ = self._get_layout()
         try:
-            file_index = self._torrent.files.index(file)
-        except ValueError:
+            return positions[file]
+        except (KeyError, TypeError):
+            # `file` may be equal to a file with a different hash
+            for f in files:
+                if f == file:
+                    return positions[f]
             raise ValueError(f'File not specified: {file}')
-        else:
-            stream_pos = sum(f.size for f in self._torrent.files[:file_index])
-            return stream_pos
 
     def get_file_at_position(self, position, content_path=None):
         """
@@ -116,17 +188,23 @@ class TorrentFileStream:
         :param content_path: Path to file or directory (defaults to class
             argument of the same name, :attr:`~.Torrent.path` or the file path
             from the torrent)
+
+        :return: :class:`~torf.File` object or `None` if `position` is in a
+            padding file (BEP 47)
         """
+        files, _, size = self._get_layout()
         if position >= 0:
             pos = 0
-            for file in self._torrent.files:
+            for file in files:
                 pos += file.size - 1
                 if pos >= position:
+                    if isinstance(file, _Padding):
+                        return None
                     return self._get_content_path(content_path, none_ok=True, file=file)
                 else:
                     pos += 1
 
-        raise ValueError(f'position is out of bounds (0 - {self._torrent.size - 1}): {position}')
+        raise ValueError(f'position is out of bounds (0 - {size - 1}): {position}')
 
     def get_piece_indexes_of_file(self, file, exclusive=False):
         """
@@ -157,20 +235,166 @@ class TorrentFileStream:
 
         return piece_indexes
 
+    def get_piece_ranges_by_device(self, content_path=None):
+        """
+        Return contiguous piece index ranges grouped by the device that stores
+        them
+
+        Each piece belongs to the device of the file that contains the piece's
+        first byte. Pieces that span multiple files on different devices are
+        still read from all of them.
+
+        :param content_path: Path to file or directory (defaults to class
+            argument of the same name or :attr:`~.Torrent.path`)
+
+        :return: :class:`dict` that maps device IDs (see :func:`os.stat`) to
+            lists of :class:`range` objects; files that can't be accessed
+            belong to the device of the previous accessible file (or the next
+            one if there is no previous one) so that they are read in order
+            with their neighbours, and to the device ID `None` if no file can
+            be accessed
+        """
+        piece_size = self._torrent.piece_size
+        file_ranges = []
+        devices = []
+        file_start = 0
+        for file in self._get_files():
+            file_end = file_start + file.size
+            # Pieces that start in this file
+            first_piece_index = math.ceil(file_start / piece_size)
+            stop_piece_index = math.ceil(file_end / piece_size)
+            file_start = file_end
+            if first_piece_index >= stop_piece_index or isinstance(file, _Padding):
+                continue
+
+            filepath = self._get_content_path(content_path, none_ok=False, file=file)
+            try:
+                device = os.stat(filepath).st_dev
+            except OSError:
+                device = None
+            file_ranges.append((first_piece_index, stop_piece_index))
+            devices.append(device)
+
+        # Inaccessible files belong to the device of their neighbours
+        prev_device = next((device for device in devices if device is not None), None)
+        for i, device in enumerate(devices):
+            if device is None:
+                devices[i] = prev_device
+            else:
+                prev_device = device
+
+        ranges_by_device = {}
+        prev_device = None
+        for (first_piece_index, stop_piece_index), device in zip(file_ranges, devices):
+            ranges = ranges_by_device.setdefault(device, [])
+            if ranges and device == prev_device and ranges[-1].stop == first_piece_index:
+                ranges[-1] = range(ranges[-1].start, stop_piece_index)
+            else:
+                ranges.append(range(first_piece_index, stop_piece_index))
+            prev_device = device
+
+        return ranges_by_device
+
+    def get_zero_piece_ranges(self, content_path=None):
+        """
+        Return contiguous ranges of indexes of pieces that only contain holes
+        of sparse files
+
+        Holes are detected with :data:`os.SEEK_HOLE` and :data:`os.SEEK_DATA`.
+        They are unallocated regions of a file that contain null bytes without
+        storing them on disk. Pieces in holes don't need to be read because
+        they consist of :attr:`~.Torrent.piece_size` null bytes.
+
+        Only pieces that are completely inside of one file are detected. Files
+        that are smaller than :attr:`~.Torrent.piece_size`, can't be accessed,
+        have an unexpected size or are not sparse are ignored.
+
+        :param content_path: Path to file or directory (defaults to class
+            argument of the same name or :attr:`~.Torrent.path`)
+
+        :return: :class:`list` of :class:`range` objects; this is always empty
+            if the platform doesn't support :data:`os.SEEK_HOLE`
+        """
+        if not hasattr(os, 'SEEK_HOLE'):
+            return []
+
+        piece_size = self._torrent.piece_size
+        ranges = []
+        file_start = 0
+        for file in self._get_files():
+            file_end = file_start + file.size
+            if file.size >= piece_size and not isinstance(file, _Padding):
+                filepath = self._get_content_path(content_path, none_ok=False, file=file)
+                for hole_start, hole_end in self._get_holes(filepath, file.size):
+                    # Pieces that start and end in this hole
+                    first_piece_index = math.ceil((file_start + hole_start) / piece_size)
+                    stop_piece_index = (file_start + hole_end) // piece_size
+                    if first_piece_index >= stop_piece_index:
+                        continue
+                    elif ranges and ranges[-1].stop == first_piece_index:
+                        ranges[-1] = range(ranges[-1].start, stop_piece_index)
+                    else:
+                        ranges.append(range(first_piece_index, stop_piece_index))
+            file_start = file_end
+        return ranges
+
+    @staticmethod
+    def _get_holes(filepath, size):
+        # Return list of `(start, end)` byte ranges of holes in `filepath`
+        try:
+            stat = os.stat(filepath)
+            # Files without holes usually have enough blocks allocated to store
+            # all of their bytes
+            if stat.st_size != size or stat.st_blocks * 512 >= size:
+                return []
+            fd = os.open(filepath, os.O_RDONLY)
+        except (OSError, AttributeError):
+            return []
+
+        holes = []
+        try:
+            pos = 0
+            while pos < size:
+                hole_start = os.lseek(fd, pos, os.SEEK_HOLE)
+                if hole_start >= size:
+                    break
+                try:
+                    hole_end = os.lseek(fd, hole_start, os.SEEK_DATA)
+                except OSError as e:
+                    if e.errno == errno.ENXIO:
+                        # No more data after `hole_start`
+                        hole_end = size
+                    else:
+                        raise
+                holes.append((hole_start, min(hole_end, size)))
+                pos = hole_end
+        except OSError:
+            return []
+        finally:
+            os.close(fd)
+        return holes
+
     def get_files_at_byte_range(self, first_byte_index, last_byte_index, content_path=None):
         """
         Return list of files that have at least one byte at `first_byte_index`,
         `last_byte_index` or between those two in the stream of concatenated
         files
 
+        Padding files (BEP 47) are not included.
+
         :param content_path: Path to file or directory (defaults to class
             argument of the same name, :attr:`~.Torrent.path` or the file path
             from the torrent)
         """
+        return self._get_files_at_byte_range(first_byte_index, last_byte_index, content_path=content_path)
+
+    def _get_files_at_byte_range(self, first_byte_index, last_byte_index, content_path=None, padding=False):
+        # Same as get_files_at_byte_range(), but if `padding` is `True`, padding
+        # files are included as _Padding instances
         assert first_byte_index <= last_byte_index, (first_byte_index, last_byte_index)
         pos = 0
         files = []
-        for file in self._torrent.files:
+        for file in self._get_files():
             file_first_byte_index = pos
             file_last_byte_index = pos + file.size - 1
             if (
@@ -181,8 +405,12 @@ class TorrentFileStream:
                 # Are all bytes of file inside of range?
                 (first_byte_index >= file_first_byte_index and last_byte_index <= file_last_byte_index)
             ):
-                content_file_path = self._get_content_path(content_path, none_ok=True, file=file)
-                files.append(content_file_path)
+                if isinstance(file, _Padding):
+                    if padding:
+                        files.append(file)
+                else:
+                    content_file_path = self._get_content_path(content_path, none_ok=True, file=file)
+                    files.append(content_file_path)
             pos += file.size
         return files
 
@@ -300,7 +528,7 @@ class TorrentFileStream:
         :raise VerifyFileSizeError: if a file has unexpected size
         """
         piece_size = self._torrent.piece_size
-        torrent_size = sum(f.size for f in self._torrent.files)
+        torrent_size = self._get_layout()[2]
 
         min_piece_index = 0
         max_piece_index = math.floor((torrent_size - 1) / piece_size)
@@ -316,11 +544,12 @@ class TorrentFileStream:
             first_byte_index_of_piece + piece_size - 1,
             torrent_size - 1,
         )
-        relevant_files = self.get_files_at_byte_range(
+        relevant_files = self._get_files_at_byte_range(
             first_byte_index_of_piece,
             last_byte_index_of_piece,
             # Ensure we get the torrent path, not the file system path
             content_path='',
+            padding=True,
         )
 
         # Find out where to start reading in the first relevant file
@@ -338,9 +567,17 @@ class TorrentFileStream:
         bytes_to_read = piece_size
         piece = bytearray()
         for file in relevant_files:
+            if isinstance(file, _Padding):
+                # Padding files are never the first file in a piece
+                content = bytes(min(bytes_to_read, file.size))
+                bytes_to_read -= len(content)
+                piece.extend(content)
+                continue
+
             # Translate path within torrent into path within file system
             filepath = self._get_content_path(content_path, none_ok=False, file=file)
             fh = self._get_open_file(filepath)
+            mapped_file = self._get_open_map(filepath) if self._use_mmap else None
 
             # Complain about wrong file size. It's theoretically possible that a
             # file with the wrong size can produce the correct pieces, but that
@@ -349,6 +586,17 @@ class TorrentFileStream:
             if actual_file_size != file.size:
                 raise error.VerifyFileSizeError(filepath, actual_file_size, file.size)
 
+            if mapped_file is not None:
+                content = mapped_file[seek_to:seek_to + bytes_to_read]
+                seek_to = 0
+                if len(relevant_files) == 1:
+                    # Don't copy the piece again
+                    piece = content
+                    break
+                bytes_to_read -= len(content)
+                piece.extend(content)
+                continue
+
             try:
                 fh.seek(seek_to)
                 seek_to = 0
@@ -367,7 +615,10 @@ class TorrentFileStream:
         else:
             exp_piece_size = piece_size
         assert len(piece) == exp_piece_size, (len(piece), exp_piece_size)
-        return bytes(piece)
+        if isinstance(piece, bytes):
+            return piece
+        else:
+            return bytes(piece)
 
     def _get_file_size_from_fs(self, filepath):
         if os.path.exists(filepath):
@@ -394,7 +645,34 @@ class TorrentFileStream:
 
         return self._open_files.get(filepath, None)
 
-    def iter_pieces(self, content_path=None, oom_callback=None):
+    def _get_open_map(self, filepath):
+        # Return memory map of `filepath` or `None` if it can't be mapped (e.g.
+        # because it is empty or the file system doesn't support it), in which
+        # case the caller should read from the file handle instead
+        if filepath not in self._open_maps:
+            # Each memory map keeps a duplicate of the file descriptor
+            while len(self._open_maps) > self.max_open_files:
+                self._close_map(tuple(self._open_maps)[0])
+
+            fh = self._get_open_file(filepath)
+            try:
+                self._open_maps[filepath] = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                self._open_maps[filepath] = None
+
+        return self._open_maps[filepath]
+
+    def _close_map(self, filepath):
+        mapped_file = self._open_maps.pop(filepath)
+        if mapped_file is not None:
+            try:
+                mapped_file.close()
+            except BufferError:
+                # Pieces from iter_pieces() are still referenced somewhere. The
+                # map is closed when the last piece is garbage collected.
+                pass
+
+    def iter_pieces(self, content_path=None, oom_callback=None, buffer_pool=None, start=0, stop=None):
         """
         Iterate over `(piece, filepath, (exception1, exception2, ...))`
 
@@ -430,42 +708,110 @@ class TorrentFileStream:
             callback to raise the exception or deal with it in some other way.
 
             If this is `None`, :class:`~.errors.MemoryError` is raised normally.
+        :param buffer_pool: :class:`BufferPool` instance or `None`
+
+            If this is not `None`, pieces are read into buffers from
+            `buffer_pool` and yielded as :class:`memoryview` objects. This
+            avoids allocating memory for each piece, but the caller must pass
+            each piece to :meth:`BufferPool.release` when it is no longer
+            needed. `oom_callback` is ignored.
+
+            This is ignored if files are memory-mapped (see `use_mmap`).
+        :param start: Index of the first piece to yield
+        :param stop: Index of the piece after the last piece to yield or `None`
+            to yield all pieces after `start`
+
+            Files that don't have any bytes in the piece range are not opened.
+            Exceptions for unreadable files that are partially in the piece
+            range are yielded with the first and last missing piece in the range.
 
         :raise ReadError: if file exists but is not readable
         :raise VerifyFileSizeError: if file has unexpected size
+        :raise ValueError: if `start` or `stop` is out of bounds
         """
+        pieces_total = self._torrent.pieces
+        if stop is None:
+            stop = pieces_total
+        if not 0 <= start <= stop <= pieces_total:
+            raise ValueError(f'Invalid piece range (0 - {pieces_total}): {start} - {stop}')
+
+        pieces = self._iter_pieces(
+            content_path=content_path,
+            oom_callback=oom_callback,
+            buffer_pool=buffer_pool,
+            start=start,
+        )
+        # Don't read anything after the last requested piece
+        return itertools.islice(pieces, stop - start)
+
+    def _iter_pieces(self, content_path, oom_callback, buffer_pool, start):
         trailing_bytes = b''
-        missing_pieces = _MissingPieces(torrent=self._torrent, stream=self)
+        missing_pieces = _MissingPieces(torrent=self._torrent, stream=self, first_piece_index=start)
+        # Stream index of the first byte we want
+        first_byte_index = start * self._torrent.piece_size
         skip_bytes = 0
+        if self._use_mmap:
+            buffer_pool = None
+
+        file_end = 0
+        filepath = None
+        for file in self._get_files():
+            file_start, file_end = file_end, file_end + file.size
+            if start > 0 and file_end <= first_byte_index:
+                # File is completely before the first piece
+                continue
+            elif file_start < first_byte_index:
+                # First piece starts in the middle of this file
+                skip_bytes = first_byte_index - file_start
 
-        for file in self._torrent.files:
             if file in missing_pieces.bycatch_files:
                 continue
 
-            # Get expected file system path
-            filepath = self._get_content_path(content_path, none_ok=False, file=file)
-
             # Get file handle or exception
-            fh = exception = None
-            actual_file_size = self._get_file_size_from_fs(filepath)
-            if actual_file_size is not None and file.size != actual_file_size:
-                exception = error.VerifyFileSizeError(filepath, actual_file_size, file.size)
+            fh = mapped_file = exception = None
+            if isinstance(file, _Padding):
+                # Padding files don't exist in the file system. Pieces that end
+                # with padding are reported with the path of the previous file.
+                fh = io.BytesIO(bytes(file.size))
             else:
-                try:
-                    fh = self._get_open_file(filepath)
-                except error.ReadError as e:
-                    exception = e
+                # Get expected file system path
+                filepath = self._get_content_path(content_path, none_ok=False, file=file)
+                actual_file_size = self._get_file_size_from_fs(filepath)
+                if actual_file_size is not None and file.size != actual_file_size:
+                    exception = error.VerifyFileSizeError(filepath, actual_file_size, file.size)
+                else:
+                    try:
+                        fh = self._get_open_file(filepath)
+                        if self._use_mmap:
+                            mapped_file = self._get_open_map(filepath)
+                    except error.ReadError as e:
+                        exception = e
 
             # Make generator that yields `(piece, filepath, exceptions)` tuples
             if fh:
                 # _debug(f'{file}: Reading {filepath}')
                 # Read pieces from opened file
-                pieces, skip_bytes = self._iter_from_file_handle(
-                    fh,
-                    prepend=trailing_bytes,
-                    skip_bytes=skip_bytes,
-                    oom_callback=oom_callback,
-                )
+                if mapped_file is not None:
+                    pieces, skip_bytes = self._iter_from_map(
+                        mapped_file,
+                        prepend=trailing_bytes,
+                        skip_bytes=skip_bytes,
+                    )
+                elif buffer_pool is not None:
+                    pieces, skip_bytes = self._iter_into_buffers_from_file_handle(
+                        fh,
+                        prepend=trailing_bytes,
+                        skip_bytes=skip_bytes,
+                        buffer_pool=buffer_pool,
+                    )
+                else:
+                    pieces, skip_bytes = self._iter_from_file_handle(
+                        fh,
+                        # Previous file may have been memory-mapped
+                        prepend=bytes(trailing_bytes),
+                        skip_bytes=skip_bytes,
+                        oom_callback=oom_callback,
+                    )
                 trailing_bytes = b''
                 piece_size = self._torrent.piece_size
                 for piece in pieces:
@@ -477,6 +823,8 @@ class TorrentFileStream:
             else:
                 # _debug(f'{file}: Faking {filepath}')
                 # We can't complete the current piece
+                if trailing_bytes and buffer_pool is not None:
+                    buffer_pool.release(trailing_bytes)
                 trailing_bytes = b''
                 # Opening file failed
                 items, skip_bytes = missing_pieces(file, content_path, reason=exception)
@@ -488,6 +836,106 @@ class TorrentFileStream:
         if trailing_bytes:
             yield (trailing_bytes, filepath, ())
 
+    @property
+    def aligned_pieces(self):
+        """
+        Number of pieces if each file starts with a new piece (see
+        :meth:`iter_aligned_pieces`)
+        """
+        piece_size = self._torrent.piece_size
+        return sum(math.ceil(file.size / piece_size) for file in self._get_files()
+                   if not isinstance(file, _Padding))
+
+    def iter_aligned_pieces(self, content_path=None, oom_callback=None, buffer_pool=None, start=0, stop=None):
+        """
+        Same as :meth:`iter_pieces`, but each file starts with a new piece
+
+        This is how pieces are aligned in BitTorrent v2 and hybrid torrents (see
+        BEP 52). Pieces never contain bytes from multiple files. The last piece
+        of each file is shorter than :attr:`~.Torrent.piece_size` unless the file
+        size is divisible by it, and empty files don't have any pieces. Padding
+        files (BEP 47) are ignored.
+
+        If a file is not readable, the first piece of that file is `None` with
+        the exception and all other pieces are `None` without exceptions.
+
+        See :attr:`aligned_pieces` for the number of pieces.
+
+        :raise ReadError: if file exists but is not readable
+        :raise ValueError: if `start` or `stop` is out of bounds
+        """
+        pieces_total = self.aligned_pieces
+        if stop is None:
+            stop = pieces_total
+        if not 0 <= start <= stop <= pieces_total:
+            raise ValueError(f'Invalid piece range (0 - {pieces_total}): {start} - {stop}')
+        return self._iter_aligned_pieces(content_path, oom_callback, buffer_pool, start, stop)
+
+    def _iter_aligned_pieces(self, content_path, oom_callback, buffer_pool, start, stop):
+        piece_size = self._torrent.piece_size
+        if self._use_mmap:
+            buffer_pool = None
+
+        file_stop = 0
+        for file in self._get_files():
+            if isinstance(file, _Padding):
+                continue
+            file_start = file_stop
+            file_stop = file_start + math.ceil(file.size / piece_size)
+            if file_stop <= start or file_start == file_stop:
+                # File is completely before the first piece or empty
+                continue
+            elif file_start >= stop:
+                # File is completely after the last piece
+                break
+
+            # Pieces of this file to yield
+            first = max(start - file_start, 0)
+            count = min(stop, file_stop) - file_start - first
+
+            # Get expected file system path
+            filepath = self._get_content_path(content_path, none_ok=False, file=file)
+
+            # Get file handle or exception
+            fh = mapped_file = exception = None
+            actual_file_size = self._get_file_size_from_fs(filepath)
+            if actual_file_size is None:
+                exception = error.ReadError(errno.ENOENT, filepath)
+            elif file.size != actual_file_size:
+                exception = error.VerifyFileSizeError(filepath, actual_file_size, file.size)
+            else:
+                try:
+                    fh = self._get_open_file(filepath)
+                    if self._use_mmap:
+                        mapped_file = self._get_open_map(filepath)
+                except error.ReadError as e:
+                    exception = e
+
+            if fh:
+                skip_bytes = first * piece_size
+                if mapped_file is not None:
+                    pieces, _ = self._iter_from_map(mapped_file, prepend=b'', skip_bytes=skip_bytes)
+                elif buffer_pool is not None:
+                    pieces, _ = self._iter_into_buffers_from_file_handle(
+                        fh,
+                        prepend=b'',
+                        skip_bytes=skip_bytes,
+                        buffer_pool=buffer_pool,
+                    )
+                else:
+                    pieces, _ = self._iter_from_file_handle(
+                        fh,
+                        prepend=b'',
+                        skip_bytes=skip_bytes,
+                        oom_callback=oom_callback,
+                    )
+                for piece in itertools.islice(pieces, count):
+                    yield (piece, filepath, ())
+            else:
+                yield (None, filepath, (exception,))
+                for _ in range(count - 1):
+                    yield (None, filepath, ())
+
     def _iter_from_file_handle(self, fh, prepend, skip_bytes, oom_callback):
         # Read pieces from from file handle.
         # `prepend` is the incomplete piece from the previous file, i.e. the
@@ -495,9 +943,9 @@ class TorrentFileStream:
         # `skip_bytes` is the number of bytes from `fh` to dump before
         # reading the next piece.
 
-        if skip_bytes:
-            skipped = fh.seek(skip_bytes)
-            skip_bytes -= skipped
+        # File handle may have been used before
+        skipped = fh.seek(skip_bytes)
+        skip_bytes -= skipped
 
         def iter_pieces(fh, prepend):
             piece_size = self._torrent.piece_size
@@ -538,6 +986,73 @@ class TorrentFileStream:
 
         return iter_pieces(fh, prepend), skip_bytes
 
+    def _iter_into_buffers_from_file_handle(self, fh, prepend, skip_bytes, buffer_pool):
+        # Same as _iter_from_file_handle(), but read pieces into buffers from
+        # `buffer_pool`. `prepend` is a memoryview of a partially filled buffer
+        # from the previous file.
+
+        # File handle may have been used before
+        skipped = fh.seek(skip_bytes)
+        skip_bytes -= skipped
+
+        def iter_pieces(fh, prepend):
+            piece_size = self._torrent.piece_size
+
+            # Continue filling incomplete piece from previous file
+            if prepend:
+                buffer, pos = memoryview(prepend.obj), len(prepend)
+            else:
+                buffer, pos = memoryview(buffer_pool.acquire()), 0
+
+            try:
+                while True:
+                    bytes_read = fh.readinto(buffer[pos:piece_size])
+                    if not bytes_read:
+                        break  # EOF
+                    pos += bytes_read
+                    if pos >= piece_size:
+                        yield buffer[:piece_size]
+                        buffer, pos = memoryview(buffer_pool.acquire()), 0
+
+            except OSError as e:
+                raise error.ReadError(e.errno, fh.name)
+
+            if pos:
+                # Incomplete piece at the end of the file
+                yield buffer[:pos]
+            else:
+                buffer_pool.release(buffer)
+
+        return iter_pieces(fh, prepend), skip_bytes
+
+    def _iter_from_map(self, mapped_file, prepend, skip_bytes):
+        # Same as _iter_from_file_handle(), but yield memoryviews of the memory
+        # mapped file `mapped_file`. Only the piece that is completed with
+        # `prepend`ed bytes from the previous file is copied.
+
+        skipped = min(skip_bytes, len(mapped_file))
+        skip_bytes -= skipped
+
+        def iter_pieces(mapped_file, prepend, pos):
+            piece_size = self._torrent.piece_size
+            map_size = len(mapped_file)
+            view = memoryview(mapped_file)
+            if hasattr(mapped_file, 'madvise'):
+                mapped_file.madvise(mmap.MADV_SEQUENTIAL)
+
+            # Fill incomplete piece with first bytes from `mapped_file`
+            if prepend:
+                bytes_missing = piece_size - len(prepend)
+                yield b''.join((prepend, view[pos:pos + bytes_missing]))
+                pos += bytes_missing
+
+            # Iterate over `piece_size`ed slices of `mapped_file`
+            while pos < map_size:
+                yield view[pos:pos + piece_size]
+                pos += piece_size
+
+        return iter_pieces(mapped_file, prepend, skipped), skip_bytes
+
     def _read_from_fh(self, fh, size, oom_callback):
         while True:
             try:
@@ -603,27 +1118,94 @@ class TorrentFileStream:
             return stored_piece_hash == generated_piece_hash
 
 
+class BufferPool:
+    """
+    Fixed number of preallocated buffers that are reused
+
+    :param int count: Number of buffers
+    :param int size: Size of each buffer in bytes
+
+    Memory usage is limited to `count` * `size` bytes.
+    """
+
+    def __init__(self, count, size):
+        if count < 1:
+            raise ValueError(f'count must be positive: {count}')
+        self._size = size
+        self._buffers = queue.Queue()
+        for _ in range(count):
+            self._buffers.put(bytearray(size))
+
+    @property
+    def size(self):
+        """Size of each buffer in bytes"""
+        return self._size
+
+    def acquire(self):
+        """
+        Return unused :class:`bytearray`
+
+        Block until a buffer is released if all buffers are in use.
+        """
+        return self._buffers.get()
+
+    def release(self, buffer):
+        """
+        Make `buffer` available for :meth:`acquire` again
+
+        :param buffer: :class:`bytearray` from :meth:`acquire` or a
+            :class:`memoryview` of it
+        """
+        if isinstance(buffer, memoryview):
+            buffer = buffer.obj
+        self._buffers.put(buffer)
+
+
+class _Padding:
+    """
+    Null bytes between files that are specified as padding file (BEP 47)
+
+    Instances are only equal to themselves because they have no path.
+    """
+
+    __slots__ = ('size',)
+
+    def __init__(self, size):
+        self.size = size
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.size!r})'
+
+
 class _MissingPieces:
     """Calculate the missing pieces for a given file"""
 
-    def __init__(self, torrent, stream):
+    def __init__(self, torrent, stream, first_piece_index=0):
         self._torrent = torrent
         self._stream = stream
+        self._first_piece_index = first_piece_index
         self._piece_indexes_seen = set()
         self._bycatch_files = []
 
     def __call__(self, file, content_path, reason):
         # Get the number of pieces covered by `file` minus all pieces we have
-        # already reported due to overlaps
-        piece_indexes = self._stream.get_piece_indexes_of_file(file)
-        for piece_index in piece_indexes:
-            if piece_index in self._piece_indexes_seen:
-                piece_indexes.remove(piece_index)
+        # already reported due to overlaps or that are before the first piece
+        piece_indexes = [
+            piece_index
+            for piece_index in self._stream.get_piece_indexes_of_file(file)
+            if piece_index >= self._first_piece_index and piece_index not in self._piece_indexes_seen
+        ]
         self._piece_indexes_seen.update(piece_indexes)
 
         # Figure out which subsequent files are affected by the missing last
         # piece of `file`
-        affected_files = self._stream.get_files_at_piece_index(piece_indexes[-1], content_path='')
+        piece_size = self._torrent.piece_size
+        affected_files = self._stream._get_files_at_byte_range(
+            piece_indexes[-1] * piece_size,
+            (piece_indexes[-1] + 1) * piece_size - 1,
+            content_path='',
+            padding=True,
+        )
         affected_files.remove(file)
         # _debug(f'{affected_files=}')
 
@@ -718,6 +1300,8 @@ class _MissingPieces:
     def _get_bycatch_exceptions(self, bycatch_files, content_path):
         exceptions = []
         for bc_file in bycatch_files:
+            if isinstance(bc_file, _Padding):
+                continue
             bc_filepath = self._stream._get_content_path(content_path, none_ok=False, file=bc_file)
             actual_size = self._stream._get_file_size_from_fs(bc_filepath)
             if actual_size is None:
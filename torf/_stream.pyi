@@ -10,7 +10,9 @@ from ._torrent import Torrent
 from ._utils import File
 
 class TorrentFileStream:
-    def __init__(self, torrent: Torrent, content_path: StrPath | None = None) -> None: ...
+    def __init__(self, torrent: Torrent, content_path: StrPath | None = None, use_mmap: bool = False) -> None: ...
+    @classmethod
+    def from_stream(cls, stream: TorrentFileStream) -> Self: ...
     def __enter__(self) -> Self: ...
     def __exit__(
         self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None
@@ -19,8 +21,10 @@ class TorrentFileStream:
     @property
     def max_piece_index(self) -> int: ...
     def get_file_position(self, file: File) -> int: ...
-    def get_file_at_position(self, position: int, content_path: StrPath | None = None) -> File: ...
+    def get_file_at_position(self, position: int, content_path: StrPath | None = None) -> File | None: ...
     def get_piece_indexes_of_file(self, file: File, exclusive: bool = False) -> list[int]: ...
+    def get_piece_ranges_by_device(self, content_path: StrPath | None = None) -> dict[int | None, list[range]]: ...
+    def get_zero_piece_ranges(self, content_path: StrPath | None = None) -> list[range]: ...
     def get_files_at_byte_range(
         self, first_byte_index: int, last_byte_index: int, content_path: StrPath | None = None
     ) -> list[File]: ...
@@ -34,7 +38,29 @@ class TorrentFileStream:
 
     max_open_files: int = 10
     def iter_pieces(
-        self, content_path: StrPath | None = None, oom_callback: Callable[[MemoryError], None] | None = None
-    ) -> Iterator[tuple[bytes | None, File, tuple[TorfError, ...]]]: ...
+        self,
+        content_path: StrPath | None = None,
+        oom_callback: Callable[[MemoryError], None] | None = None,
+        buffer_pool: BufferPool | None = None,
+        start: int = 0,
+        stop: int | None = None,
+    ) -> Iterator[tuple[bytes | memoryview | None, File, tuple[TorfError, ...]]]: ...
+    @property
+    def aligned_pieces(self) -> int: ...
+    def iter_aligned_pieces(
+        self,
+        content_path: StrPath | None = None,
+        oom_callback: Callable[[MemoryError], None] | None = None,
+        buffer_pool: BufferPool | None = None,
+        start: int = 0,
+        stop: int | None = None,
+    ) -> Iterator[tuple[bytes | memoryview | None, File, tuple[TorfError, ...]]]: ...
     def get_piece_hash(self, piece_index: int, content_path: StrPath | None = None) -> bytes | None: ...
     def verify_piece(self, piece_index: int, content_path: StrPath | None = None) -> bool | None: ...
+
+class BufferPool:
+    def __init__(self, count: int, size: int) -> None: ...
+    @property
+    def size(self) -> int: ...
+    def acquire(self) -> bytearray: ...
+    def release(self, buffer: bytearray | memoryview) -> None: ...
@@ -0,0 +1,133 @@
+# This file is part of torf.
+#
+# torf is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# torf is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with torf.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+from time import monotonic as time_monotonic
+
+
+class Throttle:
+    """
+    Limit how fast :meth:`~.Torrent.generate` and :meth:`~.Torrent.verify`
+    read from disk
+
+    Pass an instance as the `throttle` argument. The limits may be changed
+    at any time (e.g. from another thread) and take effect immediately. The
+    same instance may be passed to multiple concurrent calls to share the
+    limits between them.
+
+    Limits are enforced with token buckets that can hold one second's worth
+    of bytes and reads. After an idle period, reading can briefly exceed the
+    limits until the buckets are empty.
+
+    :param max_bytes_per_second: Maximum average number of bytes read per
+        second or ``None`` for no limit
+    :param max_reads_per_second: Maximum average number of pieces read per
+        second or ``None`` for no limit
+
+    :raises ValueError: if any limit is not a positive number
+    """
+
+    def __init__(self, max_bytes_per_second=None, max_reads_per_second=None):
+        self._condition = threading.Condition()
+        self._max_bytes_per_second = self._validate('max_bytes_per_second', max_bytes_per_second)
+        self._max_reads_per_second = self._validate('max_reads_per_second', max_reads_per_second)
+        self._bytes = self._max_bytes_per_second or 0
+        self._reads = self._max_reads_per_second or 0
+        self._timestamp = time_monotonic()
+
+    @staticmethod
+    def _validate(name, value):
+        if value is None:
+            return None
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = 0
+        if not number > 0:
+            raise ValueError(f'{name} must be a positive number or None: {value!r}')
+        return number
+
+    @property
+    def max_bytes_per_second(self):
+        """Maximum average number of bytes read per second or ``None``"""
+        return self._max_bytes_per_second
+
+    @max_bytes_per_second.setter
+    def max_bytes_per_second(self, value):
+        value = self._validate('max_bytes_per_second', value)
+        with self._condition:
+            self._refill()
+            self._max_bytes_per_second = value
+            self._bytes = min(self._bytes, value or 0)
+            self._condition.notify_all()
+
+    @property
+    def max_reads_per_second(self):
+        """Maximum average number of pieces read per second or ``None``"""
+        return self._max_reads_per_second
+
+    @max_reads_per_second.setter
+    def max_reads_per_second(self, value):
+        value = self._validate('max_reads_per_second', value)
+        with self._condition:
+            self._refill()
+            self._max_reads_per_second = value
+            self._reads = min(self._reads, value or 0)
+            self._condition.notify_all()
+
+    def _refill(self):
+        now = time_monotonic()
+        elapsed = now - self._timestamp
+        self._timestamp = now
+        if self._max_bytes_per_second is not None:
+            self._bytes = min(self._bytes + elapsed * self._max_bytes_per_second,
+                              self._max_bytes_per_second)
+        if self._max_reads_per_second is not None:
+            self._reads = min(self._reads + elapsed * self._max_reads_per_second,
+                              self._max_reads_per_second)
+
+    def _get_delay(self):
+        delay = 0
+        if self._max_bytes_per_second is not None and self._bytes < 0:
+            delay = max(delay, -self._bytes / self._max_bytes_per_second)
+        if self._max_reads_per_second is not None and self._reads < 0:
+            delay = max(delay, -self._reads / self._max_reads_per_second)
+        return delay
+
+    def consume(self, size, is_stopped=None):
+        """
+        Take `size` bytes and one read from the buckets and block until they
+        are no longer overdrawn
+
+        :param int size: Number of bytes that were read
+        :param is_stopped: Callable that returns whether to stop blocking
+            early or ``None``
+        """
+        with self._condition:
+            self._refill()
+            if self._max_bytes_per_second is not None:
+                self._bytes -= size
+            if self._max_reads_per_second is not None:
+                self._reads -= 1
+            while True:
+                delay = self._get_delay()
+                if delay <= 0 or (is_stopped is not None and is_stopped()):
+                    break
+                # Wake up regularly to check `is_stopped`
+                self._condition.wait(min(delay, 0.1))
+                self._refill()
+
+    def __repr__(self):
+        return (f'{type(self).__name__}(max_bytes_per_second={self._max_bytes_per_second!r}, '
+                f'max_reads_per_second={self._max_reads_per_second!r})')
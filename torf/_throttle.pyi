@@ -0,0 +1,15 @@
+from typing import Callable
+
+class Throttle:
+    def __init__(
+        self, max_bytes_per_second: float | None = None, max_reads_per_second: float | None = None
+    ) -> None: ...
+    @property
+    def max_bytes_per_second(self) -> float | None: ...
+    @max_bytes_per_second.setter
+    def max_bytes_per_second(self, value: float | None) -> None: ...
+    @property
+    def max_reads_per_second(self) -> float | None: ...
+    @max_reads_per_second.setter
+    def max_reads_per_second(self, value: float | None) -> None: ...
+    def consume(self, size: int, is_stopped: Callable[[], bool] | None = None) -> None: ...
@@ -30,8 +30,17 @@ import flatbencode as bencode
 from . import __version__
 from . import _errors as error
 from . import _generate as generate
+from . import _merkle as merkle
 from . import _reuse as reuse
 from . import _utils as utils
+from ._async import AsyncJob
+from ._bitfield import Bitfield
+from ._cache import PieceHashCache
+from ._checkpoint import Checkpoint
+from ._progress import ProgressBatcher
+from ._resume import write_fastresume
+from ._sample import PieceChecker, SampleResult, get_sample
+from ._stream import TorrentFileStream
 
 _PACKAGE_NAME = __name__.split('.')[0]
 
@@ -200,7 +209,8 @@ class Torrent():
         List of relative paths in this torrent
 
         Paths are :class:`File` objects and items are automatically
-        deduplicated.  Every path starts with :attr:`name`.
+        deduplicated.  Every path starts with :attr:`name`.  Padding files (BEP
+        47) are not included.
 
         Setting or manipulating this property updates
         :attr:`metainfo`\\ ``['info']``:
@@ -235,6 +245,7 @@ class Torrent():
                     size=fileinfo['length'],
                 )
                 for fileinfo in info['files']
+                if not utils.is_padding(fileinfo)
             )
         else:
             files = ()
@@ -289,7 +300,8 @@ class Torrent():
             elif self.mode == 'multifile':
                 dirpath = self.path
                 filepaths = (os.path.join(dirpath, *fileinfo['path'])
-                             for fileinfo in self.metainfo['info']['files'])
+                             for fileinfo in self.metainfo['info']['files']
+                             if not utils.is_padding(fileinfo))
         return utils.Filepaths(filepaths, callback=self._filepaths_changed)
 
     def _filepaths_changed(self, filepaths):
@@ -320,8 +332,8 @@ class Torrent():
 
     def _set_files(self, files, basepath=None):
         """
-        Update ``name`` and ``files`` or ``length``, remove ``pieces`` and
-        ``md5sum`` in :attr:`metainfo`\\ ``['info']``
+        Update ``name`` and ``files`` or ``length``, remove ``pieces``,
+        ``md5sum`` and BitTorrent v2 metadata in :attr:`metainfo`\\ ``['info']``
 
         :param files: Sequence of :class:`File`
         :param basepath: path-like that all paths in `files` start with; may be
@@ -354,6 +366,7 @@ class Torrent():
                                    hidden=False, empty=False)
 
         info = self.metainfo['info']
+        self._remove_v2_metainfo()
         if not files or all(f.size <= 0 for f in files):
             info.pop('files', None)
             info.pop('length', None)
@@ -1071,13 +1084,29 @@ class Torrent():
         else:
             return True
 
-    def generate(self, threads=None, callback=None, interval=0):
+    def _remove_v2_metainfo(self):
+        # Remove padding files and BitTorrent v2 metadata from a hybrid torrent
+        info = self.metainfo['info']
+        if 'files' in info and any(utils.is_padding(fileinfo) for fileinfo in info['files']):
+            info['files'] = [fileinfo for fileinfo in info['files'] if not utils.is_padding(fileinfo)]
+            info.pop('pieces', None)
+        info.pop('meta version', None)
+        info.pop('file tree', None)
+        self.metainfo.pop('piece layers', None)
+
+    def generate(self, threads=None, callback=None, interval=0, backend='thread', reuse_buffers=False,
+                 use_mmap=False, readers=None, checkpoint=None, previous=None, cache=None, hybrid=False,
+                 md5sum=False, stats=None, throttle=None, max_memory=None):
         """
         Hash pieces and report progress to `callback`
 
         This method sets :attr:`metainfo`\\ ``['info']``\\ ``['pieces']`` after
         all pieces are hashed successfully.
 
+        Pieces in holes of sparse files are not read (see
+        :meth:`TorrentFileStream.get_zero_piece_ranges`) unless `hybrid` or
+        `md5sum` is used.
+
         :param int threads: How many threads to use for hashing pieces or
             ``None`` to use one thread per available CPU core
         :param callable callback: Callable to report progress and/or abort
@@ -1091,13 +1120,112 @@ class Torrent():
 
             If `callback` returns anything that is not ``None``, hashing is
             stopped.
+
+            Pieces from `checkpoint`, `previous` or `cache` are not reported
+            individually. If all pieces are known from them, `callback` is
+            called once with the number of hashed pieces equal to the total
+            number of pieces.
         :param float interval: Minimum number of seconds between calls to
             `callback`; if 0, `callback` is called once per hashed piece
+        :param str backend: ``"thread"`` to hash pieces in `threads` threads or
+            ``"process"`` to hash pieces in `threads` worker processes
+
+            Hashing threads can't use more than one CPU core at a time because
+            of the GIL. Worker processes don't have that limitation, but they
+            need some time to start.
+
+            Worker processes may import the main module of your program
+            (:mod:`multiprocessing` uses the "forkserver" or "spawn" start
+            method), so scripts must only call this method behind an ``if
+            __name__ == '__main__':`` guard.
+        :param bool reuse_buffers: Whether to read pieces into a fixed number
+            of preallocated buffers that are reused after each piece is hashed
+            instead of allocating memory for every piece
+
+            This limits memory usage to a few pieces per hashing thread and
+            avoids copying pieces that span multiple files.
+        :param bool use_mmap: Whether to memory-map files instead of reading
+            them (see :class:`TorrentFileStream`); this makes `reuse_buffers`
+            pointless
+        :param int readers: How many threads to use for reading pieces or
+            ``None`` to use one thread per device that stores any files
+
+            Pieces are split into `readers` contiguous ranges that are read
+            concurrently. This can be faster on storage that handles multiple
+            parallel reads well (e.g. SSDs or RAID arrays), but it is usually
+            slower on a single spinning disk.
+
+            If `readers` is ``None``, files are grouped by their device ID (see
+            :func:`os.stat`) and each device is read concurrently. Pieces that
+            span files on multiple devices are read by one of the threads. If
+            all files are stored on the same device, this is the same as
+            ``readers=1``.
+        :param checkpoint: Path of a file that stores the progress or ``None``
+
+            The hashes of all pieces that were hashed so far are written to
+            `checkpoint` every few seconds and when hashing stops for any
+            reason. If `checkpoint` exists, pieces from it are used instead of
+            hashing them again, unless any file was changed (see
+            :meth:`os.stat`) or :attr:`piece_size` is different.
+
+            `checkpoint` is removed after all pieces are hashed successfully.
+        :param previous: :class:`Torrent` instance of a previous version of
+            the same content or ``None``
+
+            Piece hashes are copied from `previous` if the piece only contains
+            files that have the same relative path, size and position as in
+            `previous` and that were not modified after its
+            :attr:`creation_date`. Only the remaining pieces are read and
+            hashed. If `previous` has no :attr:`creation_date`, all pieces are
+            read and hashed.
+        :param cache: Path of a database file (see :mod:`dbm`) that stores
+            piece hashes across calls or ``None``
+
+            Pieces are identified by the piece size and the device, inode,
+            size, modification time and offset of each file segment in the
+            piece. Pieces that are found in `cache` are not read, and new
+            pieces are added to it. This is useful for creating multiple
+            torrents from the same files (e.g. with different
+            :attr:`trackers`).
+        :param bool hybrid: Whether to create a hybrid torrent that also
+            contains BitTorrent v2 metadata (see BEP 52)
+
+            The v1 piece hashes, the v2 merkle trees (``file tree`` and
+            ``piece layers``) are calculated from the same pieces that are
+            read only once. Each file starts with a new piece, which requires
+            padding files (see BEP 47) between files in :attr:`metainfo`\\
+            ``['info']``\\ ``['files']``.
+
+            `hybrid` can't be combined with `checkpoint`, `previous` or
+            `cache`.
+        :param bool md5sum: Whether to calculate the MD5 sum of each file and
+            store it in :attr:`metainfo`\\ ``['info']``\\ ``['md5sum']`` or
+            :attr:`metainfo`\\ ``['info']``\\ ``['files'][i]['md5sum']``
+
+            MD5 sums are calculated from the same pieces that are read for
+            hashing, but all pieces are read by one thread (see `readers`).
+
+            `md5sum` can't be combined with `checkpoint`, `previous` or
+            `cache`.
+        :param stats: :class:`Stats` instance that gets performance statistics
+            or ``None``
+        :param throttle: :class:`Throttle` instance that limits how fast
+            pieces are read or ``None``
+        :param int max_memory: Maximum number of bytes of pieces that are
+            read, queued or hashed at the same time or ``None``
+
+            By default, the number of queued pieces depends on `threads`,
+            which can use a lot of memory with many threads and large pieces.
+            `max_memory` limits memory usage independently of `threads` and
+            :attr:`piece_size`. At least one piece is always allowed.
 
         :raises PathError: if :attr:`path` contains only empty files/directories
         :raises ReadError: if :attr:`path` or any file beneath it is not
             readable
-        :raises RuntimeError: if :attr:`path` is None
+        :raises WriteError: if `checkpoint` or `cache` is not writable
+        :raises RuntimeError: if :attr:`path` is None or a worker process died
+        :raises ValueError: if `backend` is invalid or `hybrid` or `md5sum` is
+            combined with `checkpoint`, `previous` or `cache`
 
         :return: ``True`` if all pieces were successfully hashed, ``False``
             otherwise
@@ -1106,17 +1234,89 @@ class Torrent():
             raise RuntimeError('generate() called with no path specified')
         elif sum(utils.real_size(fp) for fp in self.filepaths) < 1:
             raise error.PathError(self.path, msg='Empty or all files excluded')
-
+        elif backend not in generate.BACKENDS:
+            raise ValueError(f'Invalid backend: {backend!r}')
+        elif checkpoint is not None or previous is not None or cache is not None:
+            # These read only some pieces and use the unaligned piece indexes
+            for name, value in (('hybrid', hybrid), ('md5sum', md5sum)):
+                if value:
+                    raise ValueError(f'{name} can not be combined with checkpoint, previous or cache')
+
+        self._remove_v2_metainfo()
         hasher_threads = threads or NCORES
+        md5sums = generate.Md5Sums(self) if md5sum else None
+        if hybrid:
+            return self._generate_hybrid(
+                hasher_threads=hasher_threads,
+                callback=callback,
+                interval=interval,
+                backend=backend,
+                reuse_buffers=reuse_buffers,
+                use_mmap=use_mmap,
+                readers=readers,
+                md5sums=md5sums,
+                stats=stats,
+                throttle=throttle,
+                max_memory=max_memory,
+            )
+
+        # Get pieces that were hashed previously
+        bitfield = Bitfield(self.pieces)
+        piece_hashes = bytearray(self.pieces * 20)
+        if checkpoint is not None:
+            checkpoint = Checkpoint(checkpoint, torrent=self)
+            progress = checkpoint.load()
+            if progress is not None:
+                bitfield, piece_hashes = progress
+        if previous is not None:
+            reuse.copy_unchanged_pieces(previous, self, bitfield, piece_hashes)
+        if cache is not None:
+            cache = PieceHashCache(cache, torrent=self)
+            try:
+                cache.lookup(bitfield, piece_hashes)
+            except BaseException:
+                cache.close()
+                raise
+
+        generate_callback = generate.GenerateCallback(
+            callback=callback,
+            interval=interval,
+            torrent=self,
+        )
+
+        # Only read pieces we don't know yet
+        if bitfield.seen:
+            piece_ranges = bitfield.ranges(Bitfield.UNSEEN)
+            if not piece_ranges:
+                # Collector doesn't get any pieces, but `callback` must still
+                # be able to see that all pieces are done
+                last_file = utils.File(self.filepaths[-1], size=self.files[-1].size)
+                generate_callback(self.pieces - 1, self.pieces, self.pieces, last_file, None, ())
+        else:
+            piece_ranges = None
 
         # Read piece_size'd chunks from disk and send them to HasherPool
-        reader = generate.Reader(torrent=self, queue_size=hasher_threads * 3)
+        reader = generate.Reader(
+            torrent=self,
+            queue_size=hasher_threads * 3,
+            buffer_count=self._get_buffer_count(hasher_threads, readers) if reuse_buffers else 0,
+            use_mmap=use_mmap,
+            readers=readers,
+            piece_ranges=piece_ranges,
+            md5sums=md5sums,
+            stats=stats,
+            throttle=throttle,
+            max_memory=max_memory,
+        )
 
         # Multiple threads that get chunks from Reader, calculate the hashes,
         # and push them to a hash queue
-        hashers = generate.HasherPool(
+        hashers = generate.get_hasher_pool(
+            backend,
             hasher_threads=hasher_threads,
-            piece_queue=reader.piece_queue,
+            reader=reader,
+            piece_size=self.piece_size,
+            stats=stats,
         )
 
         # Collect piece hashes from HasherPool and call `callback` for status
@@ -1125,28 +1325,263 @@ class Torrent():
             torrent=self,
             reader=reader,
             hashers=hashers,
+            callback=generate_callback,
+            bitfield=bitfield,
+            hashes=piece_hashes,
+            checkpoint=checkpoint,
+            cache=cache,
+            stats=stats,
+            batch_pieces=generate_callback.batch_pieces,
+        )
+
+        # Collect piece hashes
+        try:
+            piece_hashes = collector.collect()
+        finally:
+            if cache is not None:
+                cache.close()
+        if collector.bitfield.count(Bitfield.OK) == self.pieces:
+            self.metainfo['info']['pieces'] = bytes(piece_hashes)
+            if md5sums is not None:
+                self._set_md5sums(md5sums.md5sums)
+            if checkpoint is not None:
+                checkpoint.remove()
+            return True
+        else:
+            # Hashing was cancelled
+            return False
+
+    def _set_md5sums(self, md5sums):
+        info = self.metainfo['info']
+        if self.mode == 'singlefile':
+            info['md5sum'] = md5sums[0]
+        else:
+            for fileinfo, md5sum in zip(info['files'], md5sums):
+                fileinfo['md5sum'] = md5sum
+
+    def _generate_hybrid(self, hasher_threads, callback, interval, backend, reuse_buffers, use_mmap, readers,
+                         md5sums, stats, throttle, max_memory):
+        # Read file-aligned pieces and calculate v1 and v2 hashes from them
+        with TorrentFileStream(self) as stream:
+            pieces = stream.aligned_pieces
+        piece_hasher = merkle.PieceHasher(self.piece_size)
+        reader = generate.Reader(
+            torrent=self,
+            queue_size=hasher_threads * 3,
+            buffer_count=self._get_buffer_count(hasher_threads, readers) if reuse_buffers else 0,
+            use_mmap=use_mmap,
+            readers=readers,
+            aligned=True,
+            md5sums=md5sums,
+            stats=stats,
+            throttle=throttle,
+            max_memory=max_memory,
+        )
+        hashers = generate.get_hasher_pool(
+            backend,
+            hasher_threads=hasher_threads,
+            reader=reader,
+            piece_size=self.piece_size,
+            hash_func=piece_hasher,
+            stats=stats,
+        )
+        generate_callback = generate.GenerateCallback(
+            callback=callback,
+            interval=interval,
+            torrent=self,
+        )
+        collector = generate.Collector(
+            torrent=self,
+            reader=reader,
+            hashers=hashers,
+            callback=generate_callback,
+            bitfield=Bitfield(pieces),
+            hash_size=piece_hasher.hash_size,
+            stats=stats,
+            batch_pieces=generate_callback.batch_pieces,
+        )
+
+        hashes = collector.collect()
+        if collector.bitfield.count(Bitfield.OK) != pieces:
+            # Hashing was cancelled
+            return False
+
+        if md5sums is not None:
+            self._set_md5sums(md5sums.md5sums)
+
+        info = self.metainfo['info']
+        piece_size = self.piece_size
+        if self.mode == 'singlefile':
+            files = [((info['name'],), info['length'])]
+        else:
+            files = [(fileinfo['path'], fileinfo['length']) for fileinfo in info['files']]
+            # Pad all files except the last one to the next piece boundary
+            files_info = []
+            for fileinfo in info['files'][:-1]:
+                files_info.append(fileinfo)
+                remainder = fileinfo['length'] % piece_size
+                if remainder:
+                    padding = piece_size - remainder
+                    files_info.append({'attr': 'p', 'length': padding, 'path': ['.pad', str(padding)]})
+            files_info.append(info['files'][-1])
+            info['files'] = files_info
+
+        file_tree, piece_layers = merkle.get_file_tree_and_piece_layers(files, piece_size, hashes)
+        info['pieces'] = merkle.get_v1_hashes(hashes, files, piece_size)
+        info['meta version'] = 2
+        info['file tree'] = file_tree
+        if piece_layers:
+            self.metainfo['piece layers'] = piece_layers
+        return True
+
+    def generate_piece_sizes(self, piece_sizes, threads=None, callback=None, interval=0, backend='thread',
+                             reuse_buffers=False, use_mmap=False, readers=None):
+        """
+        Hash pieces for multiple piece sizes in a single pass
+
+        Files are read once in pieces of the largest of `piece_sizes`, and each
+        piece is split for the other piece sizes. This is much faster than
+        calling :meth:`generate` for each piece size if reading is the
+        bottleneck.
+
+        This instance is not changed.
+
+        :param piece_sizes: Iterable of piece sizes (see :attr:`piece_size`)
+
+        All other arguments are the same as for :meth:`generate`, except that
+        the number of hashed pieces and the total number of pieces that are
+        passed to `callback` refer to pieces of the largest piece size.
+
+        :raises PieceSizeError: if any of `piece_sizes` is invalid
+        :raises PathError: if :attr:`path` contains only empty files/directories
+        :raises ReadError: if :attr:`path` or any file beneath it is not
+            readable
+        :raises RuntimeError: if :attr:`path` is None
+        :raises ValueError: if `backend` is invalid or `piece_sizes` is empty
+
+        :return: List of copies (see :meth:`copy`) of this torrent with
+            :attr:`piece_size` and :attr:`metainfo`\\ ``['info']``\\
+            ``['pieces']`` set for each of `piece_sizes` or ``None`` if
+            hashing was cancelled
+        """
+        if self.path is None:
+            raise RuntimeError('generate_piece_sizes() called with no path specified')
+        elif sum(utils.real_size(fp) for fp in self.filepaths) < 1:
+            raise error.PathError(self.path, msg='Empty or all files excluded')
+        elif backend not in generate.BACKENDS:
+            raise ValueError(f'Invalid backend: {backend!r}')
+
+        torrents = []
+        for piece_size in piece_sizes:
+            torrent = self.copy()
+            torrent._path = self._path
+            torrent.piece_size_min = self.piece_size_min
+            torrent.piece_size_max = self.piece_size_max
+            torrent.piece_size = piece_size
+            torrents.append(torrent)
+        if not torrents:
+            raise ValueError('No piece sizes specified')
+
+        # Read pieces of the largest piece size and split them
+        reader_torrent = max(torrents, key=lambda t: t.piece_size)
+        splitter = generate.SplittingHasher(
+            piece_size=reader_torrent.piece_size,
+            piece_sizes=[torrent.piece_size for torrent in torrents],
+        )
+        hasher_threads = threads or NCORES
+        reader = generate.Reader(
+            torrent=reader_torrent,
+            queue_size=hasher_threads * 3,
+            buffer_count=self._get_buffer_count(hasher_threads, readers) if reuse_buffers else 0,
+            use_mmap=use_mmap,
+            readers=readers,
+        )
+        hashers = generate.get_hasher_pool(
+            backend,
+            hasher_threads=hasher_threads,
+            reader=reader,
+            piece_size=reader_torrent.piece_size,
+            hash_func=splitter,
+        )
+        collector = generate.Collector(
+            torrent=reader_torrent,
+            reader=reader,
+            hashers=hashers,
             callback=generate.GenerateCallback(
                 callback=callback,
                 interval=interval,
                 torrent=self,
             ),
+            hash_size=splitter.hash_size,
         )
 
-        # Collect piece hashes
-        piece_hashes = collector.collect()
-        concatenated_piece_hashes = b''.join(piece_hashes)
-        hashes_count = len(concatenated_piece_hashes) / 20
-        if hashes_count == self.pieces:
-            self.metainfo['info']['pieces'] = concatenated_piece_hashes
-            return True
-        elif hashes_count < self.pieces:
-            # Hashing was cancelled
-            return False
+        hashes = collector.collect()
+        if collector.bitfield.count(Bitfield.OK) == reader_torrent.pieces:
+            for torrent, piece_hashes in zip(torrents, splitter.split(hashes, self.size)):
+                torrent.metainfo['info']['pieces'] = piece_hashes
+            return torrents
         else:
-            raise RuntimeError('Unexpected number of hashes generated: '
-                               f'{hashes_count} instead of {self.pieces}')
+            # Hashing was cancelled
+            return None
+
+    def agenerate(self, **kwargs):
+        """
+        Same as :meth:`generate`, but for :mod:`asyncio` applications
+
+        :meth:`generate` runs in a separate thread and gets all keyword
+        arguments except for `callback`.
+
+        :return: :class:`~.AsyncJob` instance
+
+            Awaiting it returns the return value of :meth:`generate`. It is also
+            an asynchronous iterator over the positional arguments that
+            :meth:`generate` would pass to `callback`.
+
+            If the awaiting or iterating task is cancelled, hashing is stopped.
 
-    def verify(self, path, threads=None, callback=None, interval=0):
+            The job is not a coroutine. Use :func:`asyncio.ensure_future`
+            instead of :func:`asyncio.create_task` to run it in a task.
+
+        >>> job = torrent.agenerate(interval=1)
+        >>> async for torrent, filepath, pieces_done, pieces_total in job:
+        ...     print(f'{pieces_done / pieces_total * 100:3.0f} % done')
+        >>> success = await job
+
+        >>> task = asyncio.ensure_future(torrent.agenerate())
+        """
+        return AsyncJob(self.generate, **kwargs)
+
+    def iter_generate(self, batch_pieces=None, batch_bytes=None, **kwargs):
+        """
+        Same as :meth:`generate`, but iterate over batched progress reports
+        instead of calling `callback`
+
+        :meth:`generate` runs in a separate thread and gets all keyword
+        arguments except for `callback` and `interval`.
+
+        :param int batch_pieces: Report progress every `batch_pieces` pieces
+        :param int batch_bytes: Report progress every `batch_bytes` bytes
+
+        If `batch_pieces` and `batch_bytes` are both ``None``, progress is
+        reported for every percent.
+
+        :return: Iterator over :class:`~.Progress` instances
+
+            The final :class:`~.Progress` instance provides the return value of
+            :meth:`generate` as :attr:`~.Progress.result`. Any exception from
+            :meth:`generate` is raised by the iterator.
+
+            If iteration is stopped early, hashing is cancelled.
+
+        >>> for progress in torrent.iter_generate(batch_bytes=100 * 2**20):
+        ...     print(f'{progress.bytes_per_second / 2**20:.1f} MiB/s')
+        """
+        return iter(ProgressBatcher(self, self.generate, batch_pieces=batch_pieces,
+                                    batch_bytes=batch_bytes, **kwargs))
+
+    def verify(self, path, threads=None, callback=None, interval=0, backend='thread', reuse_buffers=False,
+               use_mmap=False, readers=None, bitfield=None, stats=None, throttle=None, max_memory=None,
+               fail_fast=False, files=None, pieces=None, fastresume=None):
         """
         Check if `path` contains all the data specified in this torrent
 
@@ -1174,6 +1609,48 @@ class Torrent():
         :param float interval: Minimum number of seconds between calls to
             `callback` (if 0, `callback` is called once per piece); this is
             ignored if an error is found
+        :param str backend: ``"thread"`` or ``"process"``; see
+            :meth:`generate`
+        :param bool reuse_buffers: See :meth:`generate`
+        :param bool use_mmap: See :meth:`generate`
+        :param int readers: See :meth:`generate`
+        :param bitfield: :class:`Bitfield` instance with :attr:`pieces` pieces
+            that gets the state of each piece or ``None``
+
+            `bitfield` is cleared before verification starts. Afterwards, each
+            piece is :attr:`~Bitfield.OK`, :attr:`~Bitfield.FAILED` or
+            :attr:`~Bitfield.MISSING`. Pieces that were not checked (e.g.
+            because verification was stopped) are :attr:`~Bitfield.UNSEEN`.
+        :param stats: See :meth:`generate`
+        :param throttle: See :meth:`generate`
+        :param max_memory: See :meth:`generate`
+        :param bool fail_fast: Whether to stop at the first missing or corrupt
+            piece
+
+            Reading stops immediately and pieces that are already read are
+            dropped without hashing them, so a corrupt copy is rejected in
+            proportion to the position of its first bad piece. `callback` is
+            not called after the first error is reported.
+        :param files: Sequence of files to verify or ``None``
+
+            Files are items from :attr:`files` or relative paths within the
+            torrent, starting with :attr:`name`. Only the pieces that contain
+            bytes of these files are read, including the first and last piece
+            that may also contain bytes of neighbouring files (see
+            :meth:`TorrentFileStream.get_piece_indexes_of_file`).
+        :param pieces: Sequence of piece indexes to verify or ``None``
+
+            If `files` and `pieces` are both given, the pieces of `files` and
+            `pieces` are verified. If both are ``None``, all pieces are
+            verified. `callback` gets the number of selected pieces as the
+            total number of pieces. See also :meth:`verify_files`.
+        :param fastresume: Path of a libtorrent fast-resume file that is
+            written after verification or ``None``
+
+            Pieces that are :attr:`~Bitfield.OK` are marked as downloaded, so
+            a client that loads the file can seed `path` without checking it
+            again. Use :meth:`Bitfield.to_have_bytes` of `bitfield` to get the
+            same information as BitTorrent bitfield.
 
         If a callback is specified, exceptions are not raised but passed to
         `callback` instead.
@@ -1184,7 +1661,11 @@ class Torrent():
         :raises VerifyNotDirectoryError: if `path` is a file and this torrent
             contains a directory
         :raises ReadError: if a file is not readable
+        :raises WriteError: if `fastresume` is not writable
         :raises MetainfoError: if :meth:`validate` fails
+        :raises ValueError: if `backend` is invalid, `bitfield` has the wrong
+            number of pieces, any of `files` is not in :attr:`files` or any of
+            `pieces` is out of range
 
         :return: ``True`` if `path` is verified successfully, ``False``
             otherwise
@@ -1192,6 +1673,20 @@ class Torrent():
         # First make sure we are a valid torrent
         self.validate()
 
+        if backend not in generate.BACKENDS:
+            raise ValueError(f'Invalid backend: {backend!r}')
+        elif bitfield is not None:
+            if len(bitfield) != self.pieces:
+                raise ValueError(f'Expected bitfield with {self.pieces} pieces, not {len(bitfield)}')
+            bitfield.clear()
+
+        # Only read pieces of the requested files and piece indexes
+        if files is not None or pieces is not None:
+            piece_ranges = self._get_piece_ranges(files, pieces)
+        else:
+            piece_ranges = (range(0, self.pieces),)
+        pieces_total = sum(len(piece_range) for piece_range in piece_ranges)
+
         # Wrapper around callback function that compares hashes
         verify_callback = generate.VerifyCallback(
             callback=callback,
@@ -1203,7 +1698,6 @@ class Torrent():
         def early_exception(exception):
             piece_index = 0
             pieces_done = 0
-            pieces_total = self.pieces
             filepath = None
             piece_hash = None
             exceptions = (exception,)
@@ -1225,13 +1719,23 @@ class Torrent():
                 torrent=self,
                 queue_size=hasher_threads * 3,
                 path=path,
+                buffer_count=self._get_buffer_count(hasher_threads, readers) if reuse_buffers else 0,
+                use_mmap=use_mmap,
+                readers=readers,
+                piece_ranges=piece_ranges,
+                stats=stats,
+                throttle=throttle,
+                max_memory=max_memory,
             )
 
             # Multiple threads that get chunks from Reader, calculate the hashes,
             # and push them to a hash queue
-            hashers = generate.HasherPool(
+            hashers = generate.get_hasher_pool(
+                backend,
                 hasher_threads=hasher_threads,
-                piece_queue=reader.piece_queue,
+                reader=reader,
+                piece_size=self.piece_size,
+                stats=stats,
             )
 
             # Collect piece hashes from HasherPool and call `callback` for status
@@ -1241,10 +1745,191 @@ class Torrent():
                 reader=reader,
                 hashers=hashers,
                 callback=verify_callback,
+                bitfield=bitfield,
+                exp_hashes=self.metainfo['info']['pieces'],
+                stats=stats,
+                fail_fast=fail_fast,
+                pieces_total=pieces_total,
+                batch_pieces=verify_callback.batch_pieces,
             )
 
-            piece_hashes = collector.collect()
-            return piece_hashes == self.hashes
+            # All selected pieces must match the expected hashes
+            collector.collect()
+            if fastresume is not None:
+                write_fastresume(fastresume, self, path, collector.bitfield)
+            return collector.bitfield.count(Bitfield.OK) == pieces_total
+
+    def verify_files(self, path, files=None, callback=None, bitfield=None, **kwargs):
+        """
+        Same as :meth:`verify`, but return the result for each file
+
+        Errors are reported to `callback` if it is given and otherwise only
+        reflected in the return value.
+
+        A file is only verified successfully if all pieces that contain any of
+        its bytes are verified successfully. This includes pieces that are
+        shared with neighbouring files, so a corrupt file can also make its
+        neighbours fail.
+
+        :param str path: Directory or file to read from
+        :param files: Sequence of files to verify (see `files` argument of
+            :meth:`verify`) or ``None`` to verify all files
+        :param callable callback: See :meth:`verify`
+        :param bitfield: See :meth:`verify`
+
+        All other keyword arguments are passed to :meth:`verify`.
+
+        :return: :class:`dict` that maps each :class:`File` from :attr:`files`
+            to ``True`` if it is verified successfully, ``False`` otherwise
+        """
+        if callback is None:
+            # Don't raise the first error
+            def callback(*args):
+                pass
+        if bitfield is None:
+            bitfield = Bitfield(self.pieces)
+        self.verify(path, files=files, callback=callback, bitfield=bitfield, **kwargs)
+        if files is None:
+            files = self.files
+        return {
+            file: all(bitfield[piece_index] == Bitfield.OK for piece_index in piece_indexes)
+            for file, piece_indexes in self._get_piece_indexes_of_files(files).items()
+        }
+
+    def _get_piece_indexes_of_files(self, files):
+        # Map each File from `self.files` that matches any item in `files` to
+        # its piece indexes
+        torrent_files = self.files
+        piece_indexes = {}
+        with TorrentFileStream(self) as stream:
+            for file in files:
+                path = file if isinstance(file, os.PathLike) else pathlib.Path(file)
+                for torrent_file in torrent_files:
+                    if torrent_file == path:
+                        piece_indexes[torrent_file] = stream.get_piece_indexes_of_file(torrent_file)
+                        break
+                else:
+                    raise ValueError(f'File not specified: {file}')
+        return piece_indexes
+
+    def _get_piece_ranges(self, files, pieces):
+        # Return contiguous ranges of piece indexes of `files` and `pieces`
+        selection = Bitfield(self.pieces)
+        if files is not None:
+            for piece_indexes in self._get_piece_indexes_of_files(files).values():
+                for piece_index in piece_indexes:
+                    selection[piece_index] = Bitfield.OK
+        if pieces is not None:
+            for piece_index in pieces:
+                if not 0 <= piece_index < self.pieces:
+                    raise ValueError(f'Piece index out of range (0 - {self.pieces - 1}): {piece_index}')
+                selection[piece_index] = Bitfield.OK
+        return selection.ranges(Bitfield.OK)
+
+    def iter_verify(self, path, batch_pieces=None, batch_bytes=None, **kwargs):
+        """
+        Same as :meth:`verify`, but iterate over batched progress reports
+        instead of calling `callback`
+
+        Any exceptions that :meth:`verify` would pass to `callback` are
+        collected in :attr:`~.Progress.errors` of the next report.
+
+        See :meth:`iter_generate`.
+        """
+        return iter(ProgressBatcher(self, self.verify, path=path, batch_pieces=batch_pieces,
+                                    batch_bytes=batch_bytes, **kwargs))
+
+    def averify(self, path, **kwargs):
+        """
+        Same as :meth:`verify`, but for :mod:`asyncio` applications
+
+        See :meth:`agenerate`. If the returned job is awaited without iterating
+        over it, exceptions are raised like :meth:`verify` without `callback`
+        does. When iterating, they are reported as the last item of each
+        event and awaiting returns ``False``.
+        """
+        return AsyncJob(self.verify, path=path, **kwargs)
+
+    def verify_sample(self, path, sample_size=1000, seed=None, threads=None, callback=None):
+        """
+        Check a random sample of pieces in `path`
+
+        This is much faster than :meth:`verify` for large torrents and still
+        likely to find widespread corruption (e.g. bit rot). Use
+        :meth:`~.SampleResult.confidence` of the return value to find out how
+        likely.
+
+        Pieces are sampled from each file in proportion to its size. They are
+        read with random access (see :meth:`TorrentFileStream.get_piece`) in
+        `threads` threads.
+
+        :param str path: Directory or file to read from
+        :param int sample_size: Number of pieces to check; if this is not
+            smaller than :attr:`pieces`, all pieces are checked
+        :param seed: Seed for the random sample (see :class:`random.Random`)
+            or ``None`` to check different pieces each time
+        :param int threads: How many threads to use for reading and hashing
+            pieces or ``None`` to use one thread per available CPU core
+        :param callable callback: Callable to report progress and/or abort;
+            see :meth:`verify`
+
+            The total number of pieces is `sample_size`.
+
+        If a callback is specified, exceptions are not raised but passed to
+        `callback` instead.
+
+        :raises VerifyContentError: if a sampled piece contains unexpected data
+        :raises VerifyFileSizeError: if a file has an unexpected size
+        :raises VerifyIsDirectoryError: if `path` is a directory and this
+            torrent contains a single file
+        :raises VerifyNotDirectoryError: if `path` is a file and this torrent
+            contains a directory
+        :raises ReadError: if a file is not readable
+        :raises MetainfoError: if :meth:`validate` fails
+        :raises ValueError: if `sample_size` is smaller than 1
+
+        :return: :class:`~.SampleResult` instance
+
+        >>> result = torrent.verify_sample('path/to/content', sample_size=10_000)
+        >>> if not result.success or result.confidence(0.001) < 0.99:
+        ...     torrent.verify('path/to/content')
+        """
+        self.validate()
+        if sample_size < 1:
+            raise ValueError(f'sample_size must be at least 1: {sample_size!r}')
+
+        piece_indexes = get_sample(self, sample_size, seed=seed)
+        verify_callback = generate.VerifyCallback(
+            callback=callback,
+            interval=0,
+            torrent=self,
+            path=path,
+        )
+
+        if self.mode == 'singlefile' and os.path.isdir(path):
+            exception = error.VerifyIsDirectoryError(path)
+        elif self.mode == 'multifile' and not os.path.isdir(path):
+            exception = error.VerifyNotDirectoryError(path)
+        else:
+            exception = None
+        if exception is not None:
+            verify_callback(0, 0, len(piece_indexes), None, None, (exception,))
+            return SampleResult(Bitfield(self.pieces), piece_indexes)
+
+        checker = PieceChecker(
+            torrent=self,
+            path=path,
+            piece_indexes=piece_indexes,
+            threads=threads or NCORES,
+            callback=verify_callback,
+        )
+        return checker.check()
+
+    @staticmethod
+    def _get_buffer_count(hasher_threads, readers):
+        # Fill the piece queue (hasher_threads * 3) while each hasher is busy
+        # with one piece and each reader is reading another one
+        return hasher_threads * 4 + (readers or 1)
 
     def verify_filesize(self, path, callback=None):
         """
@@ -1443,6 +2128,8 @@ class Torrent():
                     raise error.MetainfoError(f"Metainfo includes {self.path} as directory, but it is not a directory")
 
                 for i,fileinfo in enumerate(info['files']):
+                    if utils.is_padding(fileinfo):
+                        continue
                     filepath = os.path.join(self.path, os.path.join(*fileinfo['path']))
 
                     # Check if filepath exists and is a file
@@ -1678,7 +2365,7 @@ class Torrent():
         cp._metainfo = deepcopy(self._metainfo)
         return cp
 
-    def reuse(self, path, callback=None, interval=0):
+    def reuse(self, path, callback=None, interval=0, use_mmap=False):
         """
         Copy ``pieces`` and ``piece length`` from existing torrent
 
@@ -1724,6 +2411,8 @@ class Torrent():
         :param float interval: Minimum number of seconds between calls to
             `callback`; if 0, `callback` is called for each torrent file;
             `callback` is always called if `exception` is not ``None``
+        :param bool use_mmap: Whether to memory-map files when comparing piece
+            hashes (see :class:`TorrentFileStream`)
 
         :raises ReadError: if reading a torrent file fails
         :raises BdecodeError: if parsing a torrent file fails
@@ -1773,7 +2462,7 @@ class Torrent():
                     if cancelled is not None:
                         break
 
-                    if reuse.is_content_match(self, candidate):
+                    if reuse.is_content_match(self, candidate, use_mmap=use_mmap):
                         maybe_call_callback(candidate_path, files_done, True, exception)
                         reuse.copy(candidate, self)
                         return True
@@ -1,6 +1,6 @@
 import sys
 from collections import OrderedDict
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 from datetime import datetime
 from pathlib import Path
 from re import Pattern
@@ -10,8 +10,14 @@ from _typeshed import StrPath
 from typing_extensions import Self
 
 from . import __version__
+from ._async import AsyncJob
+from ._bitfield import Bitfield
 from ._errors import TorfError
 from ._magnet import Magnet
+from ._progress import Progress
+from ._sample import SampleResult
+from ._stats import Stats
+from ._throttle import Throttle
 from ._utils import File, Filepath, Filepaths, Files, MonitoredList, Trackers, URLs
 
 if sys.version_info < (3, 11):
@@ -199,14 +205,153 @@ class Torrent:
         threads: int | None = None,
         callback: Callable[[Torrent, str, int, int], Any] | None = None,
         interval: float = 0,
+        backend: Literal["thread", "process"] = "thread",
+        reuse_buffers: bool = False,
+        use_mmap: bool = False,
+        readers: int | None = None,
+        checkpoint: StrPath | None = None,
+        previous: Torrent | None = None,
+        cache: StrPath | None = None,
+        hybrid: bool = False,
+        md5sum: bool = False,
+        stats: Stats | None = None,
+        throttle: Throttle | None = None,
+        max_memory: int | None = None,
     ) -> bool: ...
+    def generate_piece_sizes(
+        self,
+        piece_sizes: Iterable[int],
+        threads: int | None = None,
+        callback: Callable[[Torrent, str, int, int], Any] | None = None,
+        interval: float = 0,
+        backend: Literal["thread", "process"] = "thread",
+        reuse_buffers: bool = False,
+        use_mmap: bool = False,
+        readers: int | None = None,
+    ) -> list[Torrent] | None: ...
+    def iter_generate(
+        self,
+        batch_pieces: int | None = None,
+        batch_bytes: int | None = None,
+        *,
+        threads: int | None = None,
+        backend: Literal["thread", "process"] = "thread",
+        reuse_buffers: bool = False,
+        use_mmap: bool = False,
+        readers: int | None = None,
+        checkpoint: StrPath | None = None,
+        previous: Torrent | None = None,
+        cache: StrPath | None = None,
+        hybrid: bool = False,
+        md5sum: bool = False,
+        stats: Stats | None = None,
+        throttle: Throttle | None = None,
+        max_memory: int | None = None,
+    ) -> Iterator[Progress]: ...
+    def agenerate(
+        self,
+        *,
+        threads: int | None = None,
+        interval: float = 0,
+        backend: Literal["thread", "process"] = "thread",
+        reuse_buffers: bool = False,
+        use_mmap: bool = False,
+        readers: int | None = None,
+        checkpoint: StrPath | None = None,
+        previous: Torrent | None = None,
+        cache: StrPath | None = None,
+        hybrid: bool = False,
+        md5sum: bool = False,
+        stats: Stats | None = None,
+        throttle: Throttle | None = None,
+        max_memory: int | None = None,
+    ) -> AsyncJob[tuple[Torrent, str, int, int], bool]: ...
     def verify(
         self,
         path: StrPath,
         threads: int | None = None,
         callback: Callable[[Torrent, str, int, int, int, bytes | None, TorfError | None], Any] | None = None,
         interval: float = 0,
+        backend: Literal["thread", "process"] = "thread",
+        reuse_buffers: bool = False,
+        use_mmap: bool = False,
+        readers: int | None = None,
+        bitfield: Bitfield | None = None,
+        stats: Stats | None = None,
+        throttle: Throttle | None = None,
+        max_memory: int | None = None,
+        fail_fast: bool = False,
+        files: Iterable[File | StrPath] | None = None,
+        pieces: Iterable[int] | None = None,
+        fastresume: StrPath | None = None,
     ) -> bool: ...
+    def iter_verify(
+        self,
+        path: StrPath,
+        batch_pieces: int | None = None,
+        batch_bytes: int | None = None,
+        *,
+        threads: int | None = None,
+        backend: Literal["thread", "process"] = "thread",
+        reuse_buffers: bool = False,
+        use_mmap: bool = False,
+        readers: int | None = None,
+        bitfield: Bitfield | None = None,
+        stats: Stats | None = None,
+        throttle: Throttle | None = None,
+        max_memory: int | None = None,
+        fail_fast: bool = False,
+        files: Iterable[File | StrPath] | None = None,
+        pieces: Iterable[int] | None = None,
+        fastresume: StrPath | None = None,
+    ) -> Iterator[Progress]: ...
+    def averify(
+        self,
+        path: StrPath,
+        *,
+        threads: int | None = None,
+        interval: float = 0,
+        backend: Literal["thread", "process"] = "thread",
+        reuse_buffers: bool = False,
+        use_mmap: bool = False,
+        readers: int | None = None,
+        bitfield: Bitfield | None = None,
+        stats: Stats | None = None,
+        throttle: Throttle | None = None,
+        max_memory: int | None = None,
+        fail_fast: bool = False,
+        files: Iterable[File | StrPath] | None = None,
+        pieces: Iterable[int] | None = None,
+        fastresume: StrPath | None = None,
+    ) -> AsyncJob[tuple[Torrent, str, int, int, int, bytes | None, TorfError | None], bool]: ...
+    def verify_files(
+        self,
+        path: StrPath,
+        files: Iterable[File | StrPath] | None = None,
+        callback: Callable[[Torrent, str, int, int, int, bytes | None, TorfError | None], Any] | None = None,
+        bitfield: Bitfield | None = None,
+        *,
+        threads: int | None = None,
+        interval: float = 0,
+        backend: Literal["thread", "process"] = "thread",
+        reuse_buffers: bool = False,
+        use_mmap: bool = False,
+        readers: int | None = None,
+        stats: Stats | None = None,
+        throttle: Throttle | None = None,
+        max_memory: int | None = None,
+        fail_fast: bool = False,
+        pieces: Iterable[int] | None = None,
+        fastresume: StrPath | None = None,
+    ) -> dict[File, bool]: ...
+    def verify_sample(
+        self,
+        path: StrPath,
+        sample_size: int = 1000,
+        seed: int | str | bytes | None = None,
+        threads: int | None = None,
+        callback: Callable[[Torrent, str, int, int, int, bytes | None, TorfError | None], Any] | None = None,
+    ) -> SampleResult: ...
     def verify_filesize(
         self, path: StrPath, callback: Callable[[Torrent, str, str, int, int, TorfError | None], Any] | None = None
     ) -> bool: ...
@@ -229,6 +374,7 @@ class Torrent:
         path: StrPath,
         callback: Callable[[Torrent, str | None, int, int, bool | None, TorfError | None], Any] | None = None,
         interval: float = 0,
+        use_mmap: bool = False,
     ) -> bool: ...
     def __repr__(self) -> str: ...
     def __eq__(self, other: object) -> bool: ...
@@ -62,6 +62,11 @@ def is_md5sum(value):
     return bool(_md5sum_regex.match(value))
 
 
+def is_padding(fileinfo):
+    """Whether `fileinfo` from ``['info']['files']`` is a padding file (BEP 47)"""
+    return 'p' in (force_as_string(fileinfo.get('attr')) or '')
+
+
 def real_size(path):
     """
     Return size for `path`, which is a (link to a) file or directory
@@ -792,13 +797,19 @@ def encode_list(lst):
     return lst_enc
 
 def encode_dict(dct):
-    dct_enc = collections.OrderedDict()
-    for key,value in sorted(dct.items()):
-        if not isinstance(key, str):
+    items_enc = []
+    for key,value in dct.items():
+        if isinstance(key, str):
+            key_enc = key.encode('utf8')
+        elif isinstance(key, bytes):
+            # Binary keys (e.g. "piece layers" in BitTorrent v2)
+            key_enc = key
+        else:
             raise ValueError(f'Invalid key: {key!r}')
-        key_enc = str(key).encode('utf8')
-        value_enc = encode_value(value)
-        dct_enc[key_enc] = value_enc
+        items_enc.append((key_enc, value))
+    dct_enc = collections.OrderedDict()
+    for key_enc,value in sorted(items_enc, key=lambda item: item[0]):
+        dct_enc[key_enc] = encode_value(value)
     return dct_enc
 
 ENCODE_ALLOWED_TYPES = (bytes, int)